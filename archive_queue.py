@@ -0,0 +1,382 @@
+"""
+Write-behind archival of pipeline artefacts (parsed JSON, enriched JSON, final documents).
+
+Artefacts are queued in a local SQLite database and uploaded to the configured
+storage backend by background worker threads, so archiving never adds to the
+latency a user sees. Small files are copied into the database; larger ones are
+hard-linked into a spool directory, so queueing them writes no file data. Rows
+survive restarts: resume() is called at app and CLI startup and starts the
+workers if items are waiting, and uploads that were in progress when a process
+died are picked up again. Items that keep failing are parked as 'failed' and
+their spooled files removed.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Callable
+from dotenv import load_dotenv
+from logger import log_info, log_error, log_warning
+
+# Load environment variables
+load_dotenv('config.env')
+
+ARCHIVE_QUEUE_PATH = os.environ.get("ARCHIVE_QUEUE_PATH", "data/archive_queue.db")
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", "2"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "10"))
+ARCHIVE_MAX_PENDING = int(os.getenv("ARCHIVE_MAX_PENDING", "500"))
+ARCHIVE_MAX_ATTEMPTS = int(os.getenv("ARCHIVE_MAX_ATTEMPTS", "8"))
+ARCHIVE_ENQUEUE_TIMEOUT = float(os.getenv("ARCHIVE_ENQUEUE_TIMEOUT_SECONDS", "10"))
+ARCHIVE_SPOOL_DIR = os.environ.get("ARCHIVE_SPOOL_DIR", "data/archive_spool")
+# Files up to this size are copied into the queue database; larger ones are linked into the spool
+ARCHIVE_INLINE_MAX_BYTES = int(os.getenv("ARCHIVE_INLINE_MAX_BYTES", str(256 * 1024)))
+
+# Claimed rows older than this are assumed abandoned by a dead worker
+STALE_CLAIM_SECONDS = 300
+POLL_INTERVAL_SECONDS = 1.0
+
+def json_blob_name(destination_blob_name: str, folder: str = "parsed_jsons") -> str:
+    """Apply the same naming rules as upload_json_to_firebase: a .json extension under folder/."""
+    if not destination_blob_name.lower().endswith('.json'):
+        destination_blob_name = f"{destination_blob_name}.json"
+    if not destination_blob_name.startswith(f"{folder}/"):
+        destination_blob_name = f"{folder}/{destination_blob_name}"
+    return destination_blob_name
+
+class ArchiveQueue:
+    """Durable SQLite-backed queue drained by background upload workers."""
+
+    def __init__(self,
+                 db_path: str = ARCHIVE_QUEUE_PATH,
+                 upload_fn: Optional[Callable[..., Optional[str]]] = None,
+                 workers: int = ARCHIVE_WORKERS,
+                 batch_size: int = ARCHIVE_BATCH_SIZE,
+                 max_pending: int = ARCHIVE_MAX_PENDING,
+                 max_attempts: int = ARCHIVE_MAX_ATTEMPTS):
+        """
+        Args:
+            db_path: SQLite file holding queued artefacts
+            upload_fn: Called as upload_fn(blob_name, data=bytes) or upload_fn(blob_name, file_path=path);
+                defaults to the storage backend
+            workers: Number of background upload threads
+            batch_size: Maximum rows a worker claims at once
+            max_pending: Queue depth at which enqueue starts to block
+            max_attempts: Attempts before an item is parked as failed
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.spool_dir = Path(ARCHIVE_SPOOL_DIR)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_fn = upload_fn or self._upload_to_storage
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._wake = threading.Event()
+        self._space = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the queue database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS archive_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                blob_name TEXT NOT NULL,
+                data BLOB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_ready ON archive_items (status, next_attempt_at)")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(archive_items)")]
+        if 'spool_path' not in columns:
+            # Spooled items keep an empty data blob and point at their file instead
+            conn.execute("ALTER TABLE archive_items ADD COLUMN spool_path TEXT")
+
+    @staticmethod
+    def _upload_to_storage(blob_name: str, data: Optional[bytes] = None,
+                           file_path: Optional[str] = None) -> Optional[str]:
+        from storage import get_storage_backend
+        return get_storage_backend().upload(blob_name, file_path=file_path, data=data)
+
+    def _spool(self, file_path: str) -> str:
+        """Hard-link file_path into the spool directory, copying only if linking is impossible."""
+        spool_path = self.spool_dir / f"{uuid.uuid4().hex}{Path(file_path).suffix}"
+        try:
+            os.link(file_path, spool_path)
+        except OSError:
+            # Different filesystem, or links not supported
+            shutil.copyfile(file_path, spool_path)
+        return str(spool_path)
+
+    def pending_count(self) -> int:
+        """Number of items waiting to be uploaded (including those in progress)."""
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM archive_items WHERE status IN ('pending', 'in_progress')"
+        ).fetchone()
+        return row[0]
+
+    def enqueue(self, blob_name: str, data: Optional[bytes] = None, file_path: Optional[str] = None,
+                timeout: float = ARCHIVE_ENQUEUE_TIMEOUT) -> bool:
+        """
+        Queue content for upload to blob_name.
+
+        Small files are copied into the queue and larger ones hard-linked into the
+        spool directory, so the caller may delete or replace file_path afterwards
+        (but must not rewrite a large file in place). If the queue is full this
+        blocks for up to timeout seconds waiting for workers to make room.
+
+        Args:
+            blob_name: Destination name in storage
+            data: Bytes to upload (takes precedence over file_path)
+            file_path: Local file to upload
+            timeout: Seconds to wait for space when the queue is full
+
+        Returns:
+            bool: True if queued, False if the queue stayed full or the input was invalid
+        """
+        if data is None and file_path is None:
+            log_warning(f"Nothing to archive for {blob_name}")
+            return False
+
+        deadline = time.time() + timeout
+        with self._space:
+            while self.pending_count() >= self.max_pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    log_warning(f"Archive queue full ({self.max_pending} items), could not queue {blob_name}")
+                    return False
+                self._space.wait(min(remaining, POLL_INTERVAL_SECONDS))
+
+        spool_path = None
+        if data is None:
+            if os.path.getsize(file_path) > ARCHIVE_INLINE_MAX_BYTES:
+                spool_path = self._spool(file_path)
+                data = b''
+            else:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT INTO archive_items (blob_name, data, spool_path, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (blob_name, sqlite3.Binary(data), spool_path, now, now)
+            )
+        except Exception:
+            if spool_path:
+                os.unlink(spool_path)
+            raise
+        self.start()
+        self._wake.set()
+        return True
+
+    def archive(self, blob_name: str, data: Optional[bytes] = None, file_path: Optional[str] = None) -> bool:
+        """
+        Queue content for upload, falling back to a synchronous upload if the queue is full.
+
+        Returns:
+            bool: True if the content was queued or uploaded
+        """
+        try:
+            if self.enqueue(blob_name, data=data, file_path=file_path):
+                return True
+            log_warning(f"Uploading {blob_name} synchronously because the archive queue is full")
+            if data is not None:
+                return bool(self.upload_fn(blob_name, data=data))
+            return bool(self.upload_fn(blob_name, file_path=file_path))
+        except Exception as e:
+            log_error(f"Error archiving {blob_name}", e)
+            return False
+
+    def start(self) -> None:
+        """Start the background workers if they are not already running."""
+        if self._threads:
+            return
+        with self._space:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"archive-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            log_info(f"Started {self.workers} archive workers on {self.db_path}")
+
+    def resume(self) -> int:
+        """
+        Clean up after earlier processes and start the workers if items are waiting.
+
+        Spool files of parked items, and spool files older than STALE_CLAIM_SECONDS
+        that no item refers to (left by a process that died while queueing), are removed.
+
+        Returns:
+            int: Number of items waiting to be uploaded
+        """
+        conn = self._connect()
+        live = set()
+        for spool_path, status in conn.execute(
+                "SELECT spool_path, status FROM archive_items WHERE spool_path IS NOT NULL").fetchall():
+            if status == 'failed':
+                self._remove_spool(spool_path)
+            else:
+                live.add(os.path.abspath(spool_path))
+        conn.execute("UPDATE archive_items SET spool_path = NULL WHERE status = 'failed'")
+
+        cutoff = time.time() - STALE_CLAIM_SECONDS
+        for entry in os.scandir(self.spool_dir):
+            try:
+                if os.path.abspath(entry.path) not in live and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+        pending = self.pending_count()
+        if pending:
+            log_info(f"Resuming {pending} archive item(s) left by an earlier run")
+            self.start()
+            self._wake.set()
+        return pending
+
+    @staticmethod
+    def _remove_spool(spool_path: str) -> None:
+        try:
+            os.unlink(spool_path)
+        except OSError:
+            pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the workers to stop and wait for them to exit."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _claim_batch(self) -> List[tuple]:
+        """Atomically claim up to batch_size ready items for this worker."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE archive_items SET status = 'pending' WHERE status = 'in_progress' AND claimed_at < ?",
+                (now - STALE_CLAIM_SECONDS,)
+            )
+            rows = conn.execute(
+                "SELECT id, blob_name, data, spool_path, attempts FROM archive_items "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, self.batch_size)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE archive_items SET status = 'in_progress', claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows]
+                )
+            conn.execute("COMMIT")
+            return rows
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _process_batch(self, rows: List[tuple]) -> None:
+        """Upload a claimed batch, deleting successes and rescheduling failures."""
+        done = []
+        failed = []
+        spooled = []
+        for item_id, blob_name, data, spool_path, attempts in rows:
+            try:
+                if spool_path:
+                    uploaded = self.upload_fn(blob_name, file_path=spool_path)
+                else:
+                    uploaded = self.upload_fn(blob_name, data=bytes(data))
+                if uploaded:
+                    done.append((item_id,))
+                    if spool_path:
+                        spooled.append(spool_path)
+                    continue
+                error = "Upload returned no URL"
+            except Exception as e:
+                error = str(e)
+
+            attempts += 1
+            if attempts >= self.max_attempts:
+                log_error(f"Archiving {blob_name} failed after {attempts} attempts: {error}")
+                # Parked items are never retried, so their spooled file is no longer needed
+                failed.append(('failed', attempts, time.time(), error, None, item_id))
+                if spool_path:
+                    spooled.append(spool_path)
+            else:
+                backoff = min(2 ** attempts, 300)
+                log_warning(f"Archiving {blob_name} failed (attempt {attempts}), retrying in {backoff}s: {error}")
+                failed.append(('pending', attempts, time.time() + backoff, error, spool_path, item_id))
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("DELETE FROM archive_items WHERE id = ?", done)
+        conn.executemany(
+            "UPDATE archive_items SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, spool_path = ?, "
+            "claimed_at = NULL WHERE id = ?",
+            failed
+        )
+        conn.execute("COMMIT")
+        for spool_path in spooled:
+            self._remove_spool(spool_path)
+        if done:
+            log_info(f"Archived {len(done)} item(s)")
+        with self._space:
+            self._space.notify_all()
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                rows = self._claim_batch()
+                if rows:
+                    self._process_batch(rows)
+                    continue
+            except Exception as e:
+                log_error("Archive worker error", e)
+            self._wake.wait(POLL_INTERVAL_SECONDS)
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return item counts by status."""
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM archive_items GROUP BY status"
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+_archive_queue: Optional[ArchiveQueue] = None
+_archive_queue_lock = threading.Lock()
+
+def get_archive_queue() -> ArchiveQueue:
+    """Return the process-wide archive queue, creating it on first use."""
+    global _archive_queue
+    if _archive_queue is None:
+        with _archive_queue_lock:
+            if _archive_queue is None:
+                _archive_queue = ArchiveQueue()
+    return _archive_queue
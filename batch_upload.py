@@ -0,0 +1,248 @@
+"""
+Batch processing of CV packs.
+
+A batch arrives as a zip or as a multipart list of files. Each CV is validated and
+written to the batch's job directory, then run through the pipeline on the
+bounded executor. Generated documents are streamed back as a zip as they finish,
+followed by a manifest.json with a result for every file in the batch.
+"""
+
+import os
+import json
+import zipfile
+from dataclasses import dataclass
+from concurrent.futures import as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Set
+from dotenv import load_dotenv
+from werkzeug.utils import secure_filename
+from logger import log_info, log_error, log_warning
+from security import SecurityConfig, SecurityError
+from upload_store import save_upload_stream, read_upload_head
+from pipeline_executor import PipelineExecutor
+
+# Load environment variables
+load_dotenv('config.env')
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_SIZE_MB", "256")) * 1024 * 1024
+BATCH_MAX_UNCOMPRESSED_BYTES = int(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", "1024")) * 1024 * 1024
+
+# Members over RATIO_CHECK_MIN_BYTES that expand more than this are treated as zip bombs
+MAX_COMPRESSION_RATIO = 100
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+@dataclass
+class BatchItem:
+    """One CV in a batch: where it was saved, or why it was rejected"""
+    name: str
+    source_name: str
+    file_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    error: Optional[str] = None
+
+def unique_name(name: str, used: Set[str]) -> str:
+    """Return name, suffixed if needed so no two files in a batch share a name."""
+    stem, ext = os.path.splitext(name)
+    candidate = name
+    counter = 2
+    while candidate.lower() in used:
+        candidate = f"{stem}_{counter}{ext}"
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+def _save_item(stream, source_name: str, batch_dir: Path, used: Set[str]) -> BatchItem:
+    """Validate one CV and write it into the batch directory."""
+    filename = secure_filename(os.path.basename(source_name))
+    validation = SecurityConfig.validate_file(filename, 0)
+    if not validation["valid"]:
+        return BatchItem(filename or source_name, source_name, error=validation["message"])
+
+    validation = SecurityConfig.validate_file_head(filename, read_upload_head(stream))
+    if not validation["valid"]:
+        return BatchItem(filename, source_name, error=validation["message"])
+
+    name = unique_name(filename, used)
+    file_path = str(batch_dir / name)
+    try:
+        _, content_hash = save_upload_stream(stream, file_path, SecurityConfig.MAX_FILE_SIZE)
+    except SecurityError as e:
+        return BatchItem(name, source_name, error=str(e))
+    return BatchItem(name, source_name, file_path, content_hash)
+
+def extract_zip(zip_stream, batch_dir: Path) -> List[BatchItem]:
+    """
+    Validate and extract the CVs in a zip into batch_dir.
+
+    Only each member's base name is used, so paths inside the archive can never
+    escape batch_dir. Hidden files and folders are skipped.
+
+    Args:
+        zip_stream: Seekable binary stream containing the zip
+        batch_dir: Directory the CVs are written to
+
+    Returns:
+        List of BatchItem, one per CV found
+
+    Raises:
+        SecurityError: If the archive is not a valid zip, holds too many files, or expands too far
+    """
+    try:
+        archive = zipfile.ZipFile(zip_stream)
+    except zipfile.BadZipFile:
+        raise SecurityError("The batch file is not a valid zip archive.")
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not any(part.startswith(('.', '__MACOSX')) for part in info.filename.split('/'))
+        ]
+        if len(members) > BATCH_MAX_FILES:
+            raise SecurityError(f"Too many files in batch. Maximum is {BATCH_MAX_FILES}.")
+        if sum(info.file_size for info in members) > BATCH_MAX_UNCOMPRESSED_BYTES:
+            raise SecurityError("The batch archive expands beyond the allowed size.")
+
+        items = []
+        used: Set[str] = set()
+        for info in members:
+            source_name = info.filename
+            if info.file_size > SecurityConfig.MAX_FILE_SIZE:
+                items.append(BatchItem(os.path.basename(source_name), source_name,
+                                       error=f"File size exceeds maximum allowed size of {SecurityConfig.MAX_FILE_SIZE // (1024*1024)}MB"))
+                continue
+            if info.file_size > RATIO_CHECK_MIN_BYTES and info.file_size > info.compress_size * MAX_COMPRESSION_RATIO:
+                items.append(BatchItem(os.path.basename(source_name), source_name,
+                                       error="File is compressed suspiciously well and was skipped."))
+                continue
+            # save_upload_stream enforces the size limit on the bytes actually read,
+            # so a member that lies about its size is still caught
+            with archive.open(info) as member:
+                items.append(_save_item(_SeekableHead(member), source_name, batch_dir, used))
+        return items
+
+def save_files(files: Iterable, batch_dir: Path) -> List[BatchItem]:
+    """
+    Validate and save a multipart list of uploaded CVs into batch_dir.
+
+    Raises:
+        SecurityError: If more than BATCH_MAX_FILES files were sent
+    """
+    files = list(files)
+    if len(files) > BATCH_MAX_FILES:
+        raise SecurityError(f"Too many files in batch. Maximum is {BATCH_MAX_FILES}.")
+    used: Set[str] = set()
+    return [_save_item(file.stream, file.filename, batch_dir, used) for file in files if file.filename]
+
+class _SeekableHead:
+    """
+    Wrap a forward-only zip member so its head can be sniffed and then re-read.
+    Only a seek back to the start after the first read is supported.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._head = b''
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self._pos < len(self._head):
+            chunk = self._head[self._pos:] if size < 0 else self._head[self._pos:self._pos + size]
+            self._pos += len(chunk)
+            return chunk
+        data = self._stream.read(size)
+        if not self._head and self._pos == 0:
+            self._head = data
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int) -> None:
+        if offset != 0 or self._pos > len(self._head):
+            raise OSError("Zip members can only be rewound to the start after the first read")
+        self._pos = 0
+
+class _ZipStreamBuffer:
+    """Write-only sink that lets zipfile emit an archive piece by piece."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_batch_results(items: List[BatchItem], process_fn: Callable[[BatchItem], Dict[str, Any]],
+                         executor: PipelineExecutor, output_dir: str) -> Iterator[bytes]:
+    """
+    Run every valid item through process_fn and stream back a zip of the results.
+
+    Documents are added as soon as their pipeline finishes; manifest.json, with one
+    entry per item in the batch, is written last.
+
+    Args:
+        items: Items from extract_zip or save_files
+        process_fn: Runs the pipeline for one item and returns its response dict
+        executor: Executor that bounds how many pipelines run at once
+        output_dir: Folder the pipeline writes generated documents to
+
+    Yields:
+        Chunks of the zip archive
+    """
+    manifest = []
+    for item in items:
+        if item.error:
+            manifest.append({'file': item.source_name, 'success': False, 'message': item.error, 'output': None})
+
+    futures = {executor.submit(process_fn, item): item for item in items if not item.error}
+    log_info(f"Batch of {len(items)} file(s): {len(futures)} queued, {len(items) - len(futures)} rejected")
+
+    buffer = _ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED)
+    used: Set[str] = {'manifest.json'}
+    try:
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                log_error(f"Batch pipeline failed for {item.source_name}", e)
+                result = {'success': False, 'message': 'An error occurred while processing the file.'}
+
+            entry = {'file': item.source_name, 'success': bool(result.get('success')),
+                     'message': result.get('message'), 'output': None}
+            output_path = os.path.join(output_dir, result.get('download_file') or '')
+            if entry['success'] and os.path.isfile(output_path):
+                arcname = unique_name(os.path.basename(output_path), used)
+                archive.write(output_path, arcname)
+                entry['output'] = arcname
+            elif entry['success']:
+                log_warning(f"Generated document missing for {item.source_name}: {output_path}")
+                entry.update(success=False, message='Generated document could not be found.')
+            manifest.append(entry)
+            yield buffer.drain()
+
+        succeeded = sum(1 for entry in manifest if entry['success'])
+        archive.writestr('manifest.json', json.dumps({
+            'created': datetime.now().isoformat(),
+            'total': len(manifest),
+            'succeeded': succeeded,
+            'failed': len(manifest) - succeeded,
+            'files': manifest
+        }, indent=2))
+        archive.close()
+        log_info(f"Batch complete: {succeeded}/{len(manifest)} file(s) succeeded")
+        yield buffer.drain()
+    finally:
+        # Stop queued work if the client went away before the batch finished
+        for future in futures:
+            future.cancel()
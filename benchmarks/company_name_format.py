@@ -0,0 +1,187 @@
+"""
+Benchmark format_company_name against the previous implementation.
+
+The previous version rebuilt its lookup sets and inner functions on every call and
+tested each word against the suffix table with up to three join-and-lower passes.
+The compiled version uses frozen tables, a token trie for suffixes and an LRU memo.
+Both are run over the same names and their outputs must match exactly.
+
+Usage:
+    python benchmarks/company_name_format.py [names.txt] [--count N]
+
+names.txt holds one employer name per line (e.g. exported from parsed_jsons/);
+without it a realistic synthetic list is generated.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import doc_generator
+from doc_generator import format_company_name, _format_company_name_cached
+
+def legacy_format_company_name(name: str, suffixes: dict) -> str:
+    """format_company_name as it was before compilation, kept for comparison."""
+    if not name:
+        return ""
+
+    common_words = {
+        'and', 'of', 'the', 'in', 'on', 'at', 'to', 'for', 'with', 'by',
+        'de', 'van', 'der', 'den', 'von', 'und', 'les', 'la', 'el'
+    }
+
+    def is_acronym(word: str) -> bool:
+        clean_word = word.replace('.', '')
+        known_acronyms = {
+            'AE', 'IBM', 'ANZ', 'BNZ', 'MSS', 'LLC', 'LTD', 'INC', 'PTY',
+            'GmbH', 'AG', 'NV', 'SA', 'PLC', 'CO', 'W.I.I', 'UAE', 'KSA'
+        }
+        common_last_names = {
+            'SMITH', 'JONES', 'BROWN', 'WILSON', 'TAYLOR', 'JOHNSON',
+            'WHITE', 'MARTIN', 'ANDERSON', 'THOMPSON', 'WOOD'
+        }
+        if clean_word in known_acronyms:
+            return True
+        if clean_word in common_last_names:
+            return False
+        if '.' in word and all(c.isupper() or c == '.' for c in word):
+            return True
+        if len(clean_word) <= 3:
+            return clean_word in known_acronyms
+        return clean_word in known_acronyms
+
+    def format_part(text: str, is_in_parentheses: bool = False) -> str:
+        if not text:
+            return ""
+        text = text.replace('-', ' - ')
+        words = [w for w in text.split() if w]
+        formatted_words = []
+        i = 0
+        while i < len(words):
+            word = words[i]
+            word_lower = word.lower()
+            if word == '-':
+                formatted_words.append(word)
+                i += 1
+                continue
+            found_suffix = False
+            for j in range(min(3, len(words) - i), 0, -1):
+                potential_suffix = ' '.join(words[i:i+j]).lower()
+                potential_suffix_no_dots = potential_suffix.replace('.', '')
+                if potential_suffix in suffixes or potential_suffix_no_dots in suffixes:
+                    suffix_key = potential_suffix if potential_suffix in suffixes else potential_suffix_no_dots
+                    formatted_words.append(suffixes[suffix_key])
+                    i += j
+                    found_suffix = True
+                    break
+            if found_suffix:
+                continue
+            if is_acronym(word):
+                formatted_words.append(word)
+            elif word_lower in common_words and formatted_words:
+                formatted_words.append(word_lower)
+            else:
+                formatted_words.append(word.capitalize())
+            i += 1
+        return ' '.join(formatted_words)
+
+    parts = []
+    current = []
+    for char in name:
+        if char == '(':
+            if current:
+                parts.append(''.join(current))
+                current = []
+        elif char == ')':
+            if current:
+                parts.append('(' + ''.join(current) + ')')
+                current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append(''.join(current))
+
+    formatted_parts = []
+    for part in parts:
+        if part.startswith('(') and part.endswith(')'):
+            formatted_parts.append(f"({format_part(part[1:-1], True)})")
+        else:
+            formatted_parts.append(format_part(part))
+    return ''.join(formatted_parts)
+
+WORDS = ['advance', 'engineering', 'maintenance', 'stellar', 'recruitment', 'fletcher', 'building',
+         'fonterra', 'downer', 'fulton', 'hogan', 'naylor', 'love', 'hawkins', 'civil', 'services',
+         'mechanical', 'support', 'systems', 'construction', 'group', 'holdings', 'logistics',
+         'smith', 'wood', 'white', 'solutions', 'tech', 'corp', 'mainfreight', 'transport']
+CONNECTORS = ['and', 'of', 'the', '&', 'de', 'van']
+ACRONYMS = ['IBM', 'ANZ', 'BNZ', 'MSS', 'UAE', 'KSA', 'NZTA', 'KPMG', 'A.B.C']
+SUFFIXES = ['Ltd', 'LTD', 'Limited', 'Pty Ltd', 'Inc', 'LLC', 'L.L.C', 'W.I.I', 'GmbH', 'Co', 'PLC', 'Lp', 'SA']
+
+def synthetic_names(count: int, distinct: int, seed: int = 7) -> list:
+    """Employer-like names with realistic repetition: `distinct` unique names drawn `count` times."""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 4))]
+        if rng.random() < 0.3:
+            words.insert(rng.randint(1, len(words)), rng.choice(CONNECTORS))
+        if rng.random() < 0.3:
+            words.insert(0, rng.choice(ACRONYMS))
+        name = ' '.join(w.upper() if rng.random() < 0.2 else w.title() if rng.random() < 0.5 else w for w in words)
+        if rng.random() < 0.2:
+            name = name.replace(' ', '-', 1)
+        if rng.random() < 0.6:
+            name += ' ' + rng.choice(SUFFIXES)
+        if rng.random() < 0.15:
+            name += f" ({rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SUFFIXES)})"
+        pool.append(name)
+    # Zipf-like reuse: a few employers appear on many CVs
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(pool, weights=weights, k=count)
+
+def time_it(fn, names) -> float:
+    start = time.perf_counter()
+    for name in names:
+        fn(name)
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('names_file', nargs='?', help="File with one employer name per line")
+    parser.add_argument('--count', type=int, default=100_000, help="Number of names to format")
+    parser.add_argument('--distinct', type=int, default=20_000, help="Distinct synthetic names")
+    args = parser.parse_args()
+
+    if args.names_file:
+        with open(args.names_file, encoding='utf-8') as f:
+            source = [line.strip() for line in f if line.strip()]
+        names = (source * (args.count // len(source) + 1))[:args.count]
+    else:
+        names = synthetic_names(args.count, args.distinct)
+
+    format_company_name('warm up')  # Load the suffix table outside the timed runs
+    suffixes = doc_generator._COMPANY_SUFFIXES
+
+    mismatches = [(n, legacy_format_company_name(n, suffixes), format_company_name(n))
+                  for n in set(names) if legacy_format_company_name(n, suffixes) != format_company_name(n)]
+    if mismatches:
+        for name, old, new in mismatches[:10]:
+            print(f"MISMATCH {name!r}: {old!r} != {new!r}")
+        sys.exit(1)
+
+    legacy = time_it(lambda n: legacy_format_company_name(n, suffixes), names)
+    _format_company_name_cached.cache_clear()
+    compiled = time_it(format_company_name, names)
+    _format_company_name_cached.cache_clear()
+    uncached = time_it(_format_company_name_cached.__wrapped__, names)
+
+    print(f"{len(names)} names ({len(set(names))} distinct), outputs identical")
+    print(f"legacy:            {legacy * 1000:8.1f} ms  ({legacy / len(names) * 1e6:.2f} us/name)")
+    print(f"compiled, no memo: {uncached * 1000:8.1f} ms  ({legacy / uncached:.1f}x)")
+    print(f"compiled + memo:   {compiled * 1000:8.1f} ms  ({legacy / compiled:.1f}x)")
+
+if __name__ == '__main__':
+    main()
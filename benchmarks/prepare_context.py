@@ -0,0 +1,95 @@
+"""
+Time DocGenerator.prepare_context and check that it is pure.
+
+prepare_context used to write the whole CV JSON to parsed_jsons/ and print several
+debug sections on every call. It now only builds the context. This script checks
+that cv_data is left untouched and no files are written, then reports the time
+per call.
+
+Usage:
+    python benchmarks/prepare_context.py [enriched.json ...] [--iterations N]
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from doc_generator import DocGenerator
+
+COMPANIES = ['Fletcher Building Ltd', 'FONTERRA CO-OPERATIVE GROUP', 'downer nz', 'ANZ Bank', 'Hawkins (stellar Recruitment Lp)',
+             'Fulton Hogan', 'BNZ BANKING GROUP', 'Mainfreight Limited', 'Saudi Aramco', 'Emirates Group']
+TITLES = ['Site Foreman', 'Project Manager', 'Scaffolder', 'Electrician', 'HVAC Technician', 'Forklift Operator']
+
+def synthetic_cv(seed: int) -> dict:
+    """A parser-shaped CV with a realistic number of experiences and qualifications."""
+    rng = random.Random(seed)
+    experiences = [{
+        'company': rng.choice(COMPANIES),
+        'title': rng.choice(TITLES),
+        'start_date': '2015-01',
+        'end_date': '2018-06',
+        'duration_in_months': rng.randint(3, 60),
+        'is_nz': rng.random() < 0.6,
+        'description': 'Responsible for site safety and crew supervision.',
+        'highlights': ['Delivered on time', 'Zero LTIs'],
+        'location': 'Auckland'
+    } for _ in range(rng.randint(3, 12))]
+    return {'data': {'profile': {
+        'basics': {'first_name': 'jane', 'last_name': 'smith-jones', 'profession': 'senior project manager of civil works',
+                   'address': '12 Queen Street, Auckland 1010'},
+        'blurb': 'Experienced project manager.',
+        'professional_experiences': experiences,
+        'trainings_and_certifications': [{'description': 'Site Safe Passport', 'issuing_organization': 'Site Safe', 'year': 2019}]
+    }}}
+
+def snapshot(directory: str) -> dict:
+    """Map of file path -> modification time under directory."""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            result[path] = os.stat(path).st_mtime_ns
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark DocGenerator.prepare_context")
+    parser.add_argument('json_files', nargs='*', help="Enriched CV JSON files; synthetic CVs are used if omitted")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.json_files:
+        cvs = []
+        for path in args.json_files:
+            with open(path, encoding='utf-8') as f:
+                cvs.append(json.load(f))
+    else:
+        cvs = [synthetic_cv(seed) for seed in range(50)]
+
+    with tempfile.NamedTemporaryFile(suffix='.docx') as template:
+        generator = DocGenerator(template.name)
+
+        originals = copy.deepcopy(cvs)
+        before = snapshot('parsed_jsons') if os.path.isdir('parsed_jsons') else {}
+        contexts = [generator.prepare_context(cv) for cv in cvs]
+        after = snapshot('parsed_jsons') if os.path.isdir('parsed_jsons') else {}
+        assert cvs == originals, "prepare_context modified its input"
+        assert before == after, "prepare_context wrote to parsed_jsons/"
+        assert contexts == [generator.prepare_context(cv) for cv in cvs], "prepare_context is not deterministic"
+
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            generator.prepare_context(cvs[i % len(cvs)])
+        elapsed = time.perf_counter() - start
+
+    print(f"prepare_context is pure over {len(cvs)} CV(s)")
+    print(f"{args.iterations} calls in {elapsed * 1000:.1f} ms ({elapsed / args.iterations * 1e6:.1f} us/call)")
+
+if __name__ == '__main__':
+    main()
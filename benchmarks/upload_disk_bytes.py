@@ -0,0 +1,71 @@
+"""
+Measure bytes written to disk per upload request, before and after the single-write upload path.
+
+The old path let Werkzeug spool the body to a temp file (anything over 500 KB),
+saved it to a NamedTemporaryFile, copied it into uploads/, and then copied it
+again into another temp file before the storage upload. The new path buffers
+the body in memory and writes it once into the job directory.
+
+Usage:
+    python benchmarks/upload_disk_bytes.py [size_mb]
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from upload_store import save_upload_stream, spooled_buffer
+
+WERKZEUG_DEFAULT_SPOOL_BYTES = 500 * 1024
+
+def bytes_written() -> int:
+    """Bytes this process has passed to write-like syscalls (Linux /proc/self/io wchar)."""
+    with open('/proc/self/io') as f:
+        for line in f:
+            if line.startswith('wchar:'):
+                return int(line.split()[1])
+    raise RuntimeError("wchar not available in /proc/self/io")
+
+def receive_body(payload: bytes, spool) -> tempfile.SpooledTemporaryFile:
+    """Simulate the multipart parser copying the request body into its file stream."""
+    spool.write(payload)
+    spool.seek(0)
+    return spool
+
+def old_path(payload: bytes, workdir: Path) -> None:
+    stream = receive_body(payload, tempfile.SpooledTemporaryFile(max_size=WERKZEUG_DEFAULT_SPOOL_BYTES))
+    temp_file = tempfile.NamedTemporaryFile(delete=False, dir=workdir)
+    with open(temp_file.name, 'wb') as f:
+        shutil.copyfileobj(stream, f)
+    upload_path = workdir / 'cv.pdf'
+    shutil.copy2(temp_file.name, upload_path)
+    pipeline_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.docx', dir=workdir)
+    pipeline_temp.close()
+    shutil.copy2(upload_path, pipeline_temp.name)
+
+def new_path(payload: bytes, workdir: Path) -> None:
+    stream = receive_body(payload, spooled_buffer())
+    job_dir = workdir / 'job'
+    job_dir.mkdir()
+    save_upload_stream(stream, str(job_dir / 'cv.pdf'))
+
+def measure(path_fn, payload: bytes) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        before = bytes_written()
+        path_fn(payload, Path(workdir))
+        return bytes_written() - before
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    payload = os.urandom(int(size_mb * 1024 * 1024))
+
+    old_bytes = measure(old_path, payload)
+    new_bytes = measure(new_path, payload)
+
+    print(f"Upload size:             {len(payload):>12,} bytes")
+    print(f"Old path bytes written:  {old_bytes:>12,} ({old_bytes / len(payload):.1f}x upload)")
+    print(f"New path bytes written:  {new_bytes:>12,} ({new_bytes / len(payload):.1f}x upload)")
@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any
+from logger import log_error
+
+# Local record of content-addressed blobs already held in storage
+BLOB_INDEX_PATH = os.environ.get("BLOB_INDEX_PATH", "data/blob_index.db")
+# Index hits older than this are confirmed with storage before they are trusted
+BLOB_INDEX_VERIFY_SECONDS = int(os.getenv("BLOB_INDEX_VERIFY_SECONDS", "3600"))
+
+def content_addressed_name(content_hash: str, filename: str, prefix: str = "uploads") -> str:
+    """
+    Build a storage key from a content hash, keeping the real file extension.
+
+    Args:
+        content_hash: SHA-256 hex digest of the file contents
+        filename: Original filename (used only for its extension)
+        prefix: Folder in the bucket to store the blob under
+
+    Returns:
+        str: Blob name such as 'uploads/ab/ab12...ef.pdf'
+    """
+    extension = Path(filename).suffix.lower()
+    return f"{prefix}/{content_hash[:2]}/{content_hash}{extension}"
+
+class BlobIndex:
+    """
+    Persistent map of content hash -> stored blob, plus original filename -> hash.
+
+    Lets callers answer "does storage already hold these bytes?" without a
+    network round trip. The index is a hint: a miss only means we have not
+    seen the content from this machine, not that storage lacks it, and a hit
+    is re-checked with storage once it is older than BLOB_INDEX_VERIFY_SECONDS.
+    Records live in SQLite, so all worker processes share one index and a
+    write touches one row.
+    """
+
+    def __init__(self, index_path: Optional[str] = BLOB_INDEX_PATH):
+        """
+        Args:
+            index_path: SQLite file to persist the index to, or None to keep it in memory only
+        """
+        self.index_path = Path(index_path) if index_path else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._names: Dict[str, str] = {}
+        if self.index_path is not None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connect().execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    blob_name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    verified_at REAL NOT NULL
+                )
+            """)
+            self._connect().execute("""
+                CREATE TABLE IF NOT EXISTS filenames (
+                    filename TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the index database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.index_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored blob record for a content hash, if known.
+
+        Returns:
+            Dict with 'blob_name', 'size', 'verified_at' and 'stale' (True if it should be
+            confirmed with storage before use), or None
+        """
+        if self.index_path is None:
+            with self._lock:
+                record = self._memory.get(content_hash)
+                record = dict(record) if record else None
+        else:
+            row = self._connect().execute(
+                "SELECT blob_name, size, verified_at FROM blobs WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            record = {'blob_name': row[0], 'size': row[1], 'verified_at': row[2]} if row else None
+        if record:
+            record['stale'] = time.time() - record['verified_at'] > BLOB_INDEX_VERIFY_SECONDS
+        return record
+
+    def hash_for_name(self, filename: str) -> Optional[str]:
+        """Return the content hash most recently uploaded under filename."""
+        if self.index_path is None:
+            with self._lock:
+                return self._names.get(filename)
+        row = self._connect().execute(
+            "SELECT content_hash FROM filenames WHERE filename = ?", (filename,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record_name(self, filename: str, content_hash: str) -> None:
+        """
+        Record that filename was last uploaded with content_hash.
+
+        Args:
+            filename: Original filename of the upload
+            content_hash: SHA-256 hex digest of its content
+        """
+        if self.index_path is None:
+            with self._lock:
+                self._names[filename] = content_hash
+            return
+        try:
+            # Re-uploads of unchanged files leave the row alone
+            self._connect().execute(
+                "INSERT INTO filenames (filename, content_hash) VALUES (?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET content_hash = excluded.content_hash "
+                "WHERE content_hash != excluded.content_hash",
+                (filename, content_hash)
+            )
+        except sqlite3.Error as e:
+            log_error("Error saving blob index", e)
+
+    def record(self, content_hash: str, blob_name: str, size: int) -> None:
+        """
+        Record that storage holds content_hash at blob_name, as of now.
+
+        Args:
+            content_hash: SHA-256 hex digest of the content
+            blob_name: Storage key holding the content
+            size: Size of the content in bytes
+        """
+        now = time.time()
+        if self.index_path is None:
+            with self._lock:
+                self._memory[content_hash] = {'blob_name': blob_name, 'size': size, 'verified_at': now}
+            return
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO blobs (content_hash, blob_name, size, verified_at) VALUES (?, ?, ?, ?)",
+                (content_hash, blob_name, size, now)
+            )
+        except sqlite3.Error as e:
+            log_error("Error saving blob index", e)
+
+    def forget(self, content_hash: str) -> None:
+        """Drop a blob record, e.g. after discovering the blob was deleted."""
+        if self.index_path is None:
+            with self._lock:
+                self._memory.pop(content_hash, None)
+            return
+        try:
+            self._connect().execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+        except sqlite3.Error as e:
+            log_error("Error saving blob index", e)
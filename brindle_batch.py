@@ -0,0 +1,289 @@
+"""
+brindle-batch: run the CV pipeline over a folder of CVs without the web tier.
+
+I/O-bound stages (storage, parser, Claude) run on a thread pool and document
+rendering runs on a process pool, so both kinds of work overlap. PDF output is
+converted from the rendered .docx in this process, on one shared pool of warm
+LibreOffice workers, so render processes never start office instances of their
+own. Progress is saved after every CV, so an interrupted run picks up where it
+left off when restarted with the same state file.
+
+Usage:
+    python brindle_batch.py INPUT [INPUT ...] [--template PATH] [--output-dir DIR]
+
+INPUT may be a directory (searched recursively) or a glob such as 'packs/**/*.pdf'.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from logger import logger, log_info, log_error
+from security import SecurityConfig
+from singleflight import hash_file
+from upload_store import read_upload_head, create_job_dir
+from batch_upload import unique_name
+from pipeline_executor import PIPELINE_CONCURRENCY
+from archive_queue import get_archive_queue
+from cv_pipeline import TEMPLATE_PATH, prepare_cv, render_cv_document, finish_cv
+from doc_generator import OUTPUT_FORMATS, export_document
+from office_pool import OFFICE_POOL_SIZE
+
+DEFAULT_STATE_PATH = 'data/batch_state.json'
+PROGRESS_BAR_WIDTH = 30
+
+class BatchState:
+    """Per-CV results of a batch run, keyed by content hash and saved after every change."""
+
+    def __init__(self, path: str, restart: bool = False):
+        """
+        Args:
+            path: JSON file holding the state
+            restart: Ignore any results from a previous run
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists() and not restart:
+            with open(self.path, 'r') as f:
+                self.results = json.load(f)
+
+    def is_done(self, content_hash: str) -> bool:
+        """True if the CV with this content was completed by an earlier run."""
+        return self.results.get(content_hash, {}).get('success', False)
+
+    def record(self, content_hash: str, result: Dict[str, Any]) -> None:
+        """Store a CV's result and write the state file atomically."""
+        with self._lock:
+            self.results[content_hash] = result
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.results, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+class ProgressBar:
+    """Single-line progress display on stderr."""
+
+    def __init__(self, total: int, enabled: bool = True):
+        self.total = total
+        self.enabled = enabled and sys.stderr.isatty()
+        self.succeeded = 0
+        self.failed = 0
+        self.start_time = time.time()
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + self.failed
+
+    def throughput(self) -> float:
+        """CVs finished per minute so far."""
+        elapsed = time.time() - self.start_time
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+    def update(self, success: bool) -> None:
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if not self.enabled:
+            return
+        filled = int(PROGRESS_BAR_WIDTH * self.done / self.total) if self.total else PROGRESS_BAR_WIDTH
+        bar = '#' * filled + '-' * (PROGRESS_BAR_WIDTH - filled)
+        sys.stderr.write(
+            f"\r[{bar}] {self.done}/{self.total}  ok {self.succeeded}  failed {self.failed}  "
+            f"{self.throughput():.1f} CV/min"
+        )
+        sys.stderr.flush()
+        if self.done == self.total:
+            sys.stderr.write("\n")
+
+def collect_inputs(inputs: List[str]) -> List[str]:
+    """Expand directories and globs into a sorted list of CV files with allowed extensions."""
+    files = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, '**', '*'), recursive=True)
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            extension = path.rsplit('.', 1)[1].lower() if '.' in os.path.basename(path) else ''
+            if os.path.isfile(path) and extension in SecurityConfig.ALLOWED_EXTENSIONS:
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+def validate_input(file_path: str) -> Optional[str]:
+    """Return why a file can't be processed, or None if it is acceptable."""
+    validation = SecurityConfig.validate_file(os.path.basename(file_path), os.path.getsize(file_path))
+    if validation["valid"]:
+        with open(file_path, 'rb') as f:
+            validation = SecurityConfig.validate_file_head(os.path.basename(file_path), read_upload_head(f))
+    return None if validation["valid"] else validation["message"]
+
+def stage_unique_names(files: List[str]) -> Dict[str, str]:
+    """
+    Map each input to the path the pipeline should read.
+
+    Pipeline artefacts are named after the file, so inputs from different folders
+    that share a name are linked into a job directory under a unique name.
+    """
+    used = set()
+    staged = {}
+    job_dir = None
+    for file_path in files:
+        name = os.path.basename(file_path)
+        unique = unique_name(name, used)
+        if unique == name:
+            staged[file_path] = file_path
+            continue
+        if job_dir is None:
+            _, job_dir = create_job_dir()
+        target = str(job_dir / unique)
+        try:
+            os.link(file_path, target)
+        except OSError:
+            shutil.copy2(file_path, target)
+        staged[file_path] = target
+    return staged
+
+def run_batch(files: List[str], state: BatchState, template_path: str, output_dir: Optional[str],
+              io_workers: int, render_workers: int, show_progress: bool = True,
+              output_format: str = 'docx') -> ProgressBar:
+    """
+    Run the pipeline over files, skipping those the state records as done.
+
+    Returns:
+        The progress bar, holding the final counts
+    """
+    work = []
+    seen = set()
+    for file_path in files:
+        content_hash = hash_file(file_path)
+        if content_hash not in seen and not state.is_done(content_hash):
+            work.append((file_path, content_hash))
+        seen.add(content_hash)
+    skipped = len(files) - len(work)
+    if skipped:
+        print(f"Skipping {skipped} CV(s) that are duplicates or were completed in a previous run")
+
+    staged = stage_unique_names([file_path for file_path, _ in work])
+    progress = ProgressBar(len(work), show_progress)
+
+    def complete(file_path: str, content_hash: str, result: Dict[str, Any]) -> None:
+        result = dict(result, file=file_path, finished_at=time.time())
+        state.record(content_hash, result)
+        progress.update(bool(result.get('success')))
+
+    with ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="batch-io") as io_pool, \
+            ThreadPoolExecutor(max_workers=OFFICE_POOL_SIZE, thread_name_prefix="batch-export") as export_pool, \
+            ProcessPoolExecutor(max_workers=render_workers) as render_pool:
+        pending = {}
+        for file_path, content_hash in work:
+            error = validate_input(file_path)
+            if error:
+                complete(file_path, content_hash, {'success': False, 'message': error})
+                continue
+            future = io_pool.submit(prepare_cv, staged[file_path], os.path.basename(staged[file_path]), content_hash)
+            pending[future] = ('prepare', file_path, content_hash, None)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, file_path, content_hash, prepared = pending.pop(future)
+                filename = os.path.basename(file_path)
+                try:
+                    if kind == 'prepare':
+                        prepared = future.result()
+                        if not prepared.get('success'):
+                            complete(file_path, content_hash, prepared)
+                            continue
+                        render = render_pool.submit(render_cv_document, prepared['enriched_json_path'], template_path)
+                        pending[render] = ('render', file_path, content_hash, prepared)
+                        continue
+                    output_path = future.result()
+                    if kind == 'render' and output_path and output_format != 'docx':
+                        export = export_pool.submit(export_document, output_path, output_format)
+                        pending[export] = ('export', file_path, content_hash, prepared)
+                        continue
+
+                    result = finish_cv(filename, prepared['parsed_json_path'], prepared['enriched_json_path'],
+                                       output_path, save_to_downloads=False)
+                    if output_dir:
+                        output_path = os.path.join('outputs', result['download_file'])
+                        shutil.copy2(output_path, os.path.join(output_dir, result['download_file']))
+                    complete(file_path, content_hash, result)
+                except Exception as e:
+                    log_error(f"Batch processing failed for {filename}", e)
+                    complete(file_path, content_hash, {'success': False, 'message': f"Error processing CV: {str(e)}"})
+    return progress
+
+def print_summary(progress: ProgressBar, state: BatchState) -> None:
+    """Print the run's throughput and any failures."""
+    elapsed = time.time() - progress.start_time
+    print(f"Processed {progress.done} CV(s) in {elapsed:.1f}s: "
+          f"{progress.succeeded} succeeded, {progress.failed} failed, {progress.throughput():.1f} CVs/minute")
+    failures = [result for result in state.results.values()
+                if not result.get('success') and result.get('finished_at', 0) >= progress.start_time]
+    for result in failures:
+        print(f"  FAILED {result.get('file')}: {result.get('message')}")
+    print(f"State saved to {state.path}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='brindle-batch', description="Run the CV pipeline over a folder of CVs.")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of CVs to process")
+    parser.add_argument('--template', default=TEMPLATE_PATH, help="Word template used to render CVs")
+    parser.add_argument('--output-dir', help="Copy generated documents into this directory")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='docx',
+                        help="Output format; pdf is converted by a pool of warm LibreOffice workers")
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="Progress file used to resume interrupted runs")
+    parser.add_argument('--restart', action='store_true', help="Ignore progress from earlier runs")
+    parser.add_argument('--io-workers', type=int, default=PIPELINE_CONCURRENCY,
+                        help="Concurrent CVs in the storage/parser/Claude stages")
+    parser.add_argument('--render-workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes used to render documents")
+    parser.add_argument('--no-progress', action='store_true', help="Don't draw the progress bar")
+    parser.add_argument('--verbose', action='store_true', help="Show pipeline log messages on the console")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.template):
+        parser.error(f"Template not found: {args.template}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for path in ['uploads', 'parsed_jsons', 'outputs']:
+        Path(path).mkdir(exist_ok=True)
+    # Upload artefacts a previous run queued but didn't archive
+    get_archive_queue().resume()
+
+    # Pipeline logs still go to the log file; keep the console for the progress bar
+    if not args.verbose:
+        for handler in logger.handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.WARNING)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("No CV files found.")
+        return 1
+    log_info(f"brindle-batch starting on {len(files)} file(s)")
+
+    state = BatchState(args.state, restart=args.restart)
+    try:
+        progress = run_batch(files, state, args.template, args.output_dir,
+                             args.io_workers, args.render_workers, not args.no_progress, args.format)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume.")
+        return 130
+    print_summary(progress, state)
+    return 0 if progress.failed == 0 else 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,7 +7,6 @@ from anthropic import Anthropic
 import ast
 import re
 import time
-from firebase_utils import upload_file
 from template_formatter import format_name
 import requests
 
@@ -7,10 +7,16 @@ import json
 import base64
 import requests
 import time
+import sqlite3
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
+from urllib.parse import urlparse
 from location_service import LocationService
+from local_parser import LOCAL_PARSER_MIN_CONFIDENCE, parse_file
+from parser_timeouts import ADAPTIVE_PARSER_TIMEOUTS, ParseFeatures, get_parser_latency_model
+from eta_estimator import file_type_of
+from storage import fetch_url
 from file_tracker import track_file
 from logger import log_info, log_error, log_warning
 
@@ -37,9 +43,12 @@ for path in PATHS.values():
     path.mkdir(exist_ok=True)
 
 def make_parser_api_call(url: str, headers: Dict[str, str], payload: Dict[str, Any], 
-                        max_retries: int = 5, initial_delay: float = 1.0) -> Optional[Dict[str, Any]]:
+                        max_retries: int = 5, initial_delay: float = 1.0,
+                        timeout: Optional[float] = None,
+                        features: Optional[ParseFeatures] = None) -> Optional[Dict[str, Any]]:
     """
     Make a CV parser API call with retry logic and exponential backoff.
+    Unless a timeout is given, it is picked from the latency model for documents like this one.
     
     Args:
         url: The API endpoint URL
@@ -47,23 +56,35 @@ def make_parser_api_call(url: str, headers: Dict[str, str], payload: Dict[str, A
         payload: Request payload
         max_retries: Maximum number of retry attempts
         initial_delay: Initial delay in seconds between retries
+        timeout: Request timeout in seconds; overrides the latency model
+        features: The document's characteristics; defaults to its type and size from the payload
         
     Returns:
         The API response as a dictionary or None if all retries fail
     """
     delay = initial_delay
+    model = get_parser_latency_model() if ADAPTIVE_PARSER_TIMEOUTS else None
+    if features is None:
+        features = ParseFeatures(file_type_of(payload.get('filename')), len(payload.get('base64', '')) * 3 // 4)
+    if timeout is None:
+        timeout, source = model.timeout_for(features, CVPARSER_TIMEOUT) if model else (CVPARSER_TIMEOUT, 'default')
+        log_info(f"Parser timeout {timeout:.0f}s ({source}) for {features.file_type}, {features.kind}, "
+                 f"{features.page_count or '?'} pages")
     
     for attempt in range(max_retries):
+        started = time.monotonic()
         try:
             response = requests.post(
                 url,
                 headers=headers,
                 json=payload,
-                timeout=CVPARSER_TIMEOUT
+                timeout=timeout
             )
             
             # If successful, return the parsed JSON
             if response.status_code == 200:
+                if model:
+                    _record_latency(model, features, time.monotonic() - started)
                 return response.json()
                 
             # If the error is retryable (server errors 5xx)
@@ -80,7 +101,9 @@ def make_parser_api_call(url: str, headers: Dict[str, str], payload: Dict[str, A
             
         except requests.Timeout:
             # For timeouts, immediately return None - no retries
-            print(f"Parser API request timed out after {CVPARSER_TIMEOUT} seconds")
+            if model:
+                _record_latency(model, features, timeout, timed_out=True)
+            print(f"Parser API request timed out after {timeout:.0f} seconds")
             return None
             
         except requests.exceptions.RequestException as e:
@@ -94,6 +117,13 @@ def make_parser_api_call(url: str, headers: Dict[str, str], payload: Dict[str, A
     
     return None
 
+def _record_latency(model, features: ParseFeatures, latency: float, timed_out: bool = False) -> None:
+    """Feed a parser call into the latency model; a failure here must not fail the parse."""
+    try:
+        model.record(features, latency, timed_out)
+    except sqlite3.Error as e:
+        log_warning(f"Could not record parser latency: {e}")
+
 class CVParser:
     """Parser class for CV documents"""
     
@@ -101,12 +131,17 @@ class CVParser:
         """Initialize the CV parser with LocationService"""
         self.location_service = LocationService()
     
-    def send_to_cv_parser(self, file_url: str) -> Optional[Dict[str, Any]]:
+    def send_to_cv_parser(self, file_url: str, filename: Optional[str] = None, timeout: Optional[float] = None,
+                          features: Optional[ParseFeatures] = None) -> Optional[Dict[str, Any]]:
         """
         Send a CV to the parsing service with timeout handling.
         
         Args:
             file_url: URL to the CV file in Firebase
+            filename: Original filename; the parser uses its extension to pick a reader.
+                Defaults to the name in the URL
+            timeout: Parser timeout in seconds; defaults to one picked by the latency model
+            features: The document's characteristics (see parser_timeouts.document_features)
         
         Returns:
             Optional[Dict]: Parsed data or None if error occurs
@@ -115,14 +150,12 @@ class CVParser:
             # Track the start of the parsing process
             track_file(file_url, "parse", "starting", "Beginning CV parsing process")
             
-            # 1. Download PDF content from file_url
-            response = requests.get(file_url)
-            if response.status_code != 200:
-                print(f"Error downloading PDF: {response.status_code}")
-                track_file(file_url, "parse", "failed", f"Error downloading PDF: {response.status_code}")
+            # 1. Download PDF content from file_url (signed URL, file:// or memory://)
+            pdf_content = fetch_url(file_url)
+            if pdf_content is None:
+                track_file(file_url, "parse", "failed", "Error downloading PDF")
                 return None
 
-            pdf_content = response.content
             base64_pdf = base64.b64encode(pdf_content).decode('utf-8')
             track_file(file_url, "parse", "downloaded", "PDF downloaded successfully")
 
@@ -133,7 +166,7 @@ class CVParser:
 
             payload = {
                 'base64': base64_pdf,
-                'filename': 'cv.pdf',
+                'filename': filename or Path(urlparse(file_url).path).name or 'cv.pdf',
                 'wait': True
             }
 
@@ -142,24 +175,14 @@ class CVParser:
             
             try:
                 # Use the retry mechanism with configurable timeout
-                parsed_data = make_parser_api_call(PARSER_API_URL, headers, payload)
+                parsed_data = make_parser_api_call(PARSER_API_URL, headers, payload, timeout=timeout, features=features)
                 if not parsed_data:
                     track_file(file_url, "parse", "failed", "Parser API call failed or timed out")
                     return None
 
                 track_file(file_url, "parse", "received", "Received parsed data from API")
 
-                # Add location classification to each experience
-                for exp in parsed_data.get('data', {}).get('profile', {}).get('professional_experiences', []):
-                    location = exp.get('location', '')
-                    exp['is_nz'] = self.location_service.is_nz_location(location)
-                    print(f"Location '{location}' classified as {'NZ' if exp['is_nz'] else 'International'}")
-                    
-                    # If location is empty, try using company name
-                    if not location and 'company' in exp:
-                        company = exp.get('company', '')
-                        exp['is_nz'] = self.location_service.is_nz_location(company)
-                        print(f"Company '{company}' classified as {'NZ' if exp['is_nz'] else 'International'}")
+                self.classify_locations(parsed_data)
 
                 # Save and track the parsed data
                 saved_result = self.save_parsed_data(parsed_data, file_url)
@@ -174,7 +197,7 @@ class CVParser:
             except requests.Timeout:
                 msg = "Complex file structure found, please save this resume as a PDF then upload again, this should solve the problem."
                 track_file(file_url, "parse", "timeout", msg)
-                print(f"Parser API timed out after {CVPARSER_TIMEOUT} seconds")
+                print("Parser API timed out")
                 return None
                 
         except Exception as e:
@@ -184,6 +207,50 @@ class CVParser:
             traceback.print_exc()
             return None
 
+    def classify_locations(self, parsed_data: Dict[str, Any]) -> None:
+        """Add location classification (is_nz) to each experience."""
+        for exp in parsed_data.get('data', {}).get('profile', {}).get('professional_experiences', []):
+            location = exp.get('location', '')
+            exp['is_nz'] = self.location_service.is_nz_location(location)
+            print(f"Location '{location}' classified as {'NZ' if exp['is_nz'] else 'International'}")
+            
+            # If location is empty, try using company name
+            if not location and 'company' in exp:
+                company = exp.get('company', '')
+                exp['is_nz'] = self.location_service.is_nz_location(company)
+                print(f"Company '{company}' classified as {'NZ' if exp['is_nz'] else 'International'}")
+
+    def parse_locally(self, file_path: str, filename: str, checked: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Parse a plain-text or simple Word CV without the remote parser.
+        
+        Args:
+            file_path: Path to the local CV file
+            filename: Original filename
+            checked: True if local_parser.can_parse_locally has already accepted the file
+            
+        Returns:
+            Optional[Dict]: Like send_to_cv_parser, or None if the file isn't suitable or the
+            parse confidence is below LOCAL_PARSER_MIN_CONFIDENCE
+        """
+        try:
+            result = parse_file(file_path, filename, checked)
+        except Exception as e:
+            log_warning(f"Local parse of {filename} failed, using the remote parser: {e}")
+            return None
+        if result is None:
+            return None
+        if result.confidence < LOCAL_PARSER_MIN_CONFIDENCE:
+            log_info(f"Local parse of {filename} not confident enough ({result.confidence:.2f}: "
+                     f"{'; '.join(result.notes)}), using the remote parser")
+            return None
+        
+        parsed_data = result.as_parser_response()
+        self.classify_locations(parsed_data)
+        log_info(f"Parsed {filename} locally (confidence {result.confidence:.2f})")
+        track_file(file_path, "parse", "parsed", f"Parsed locally with confidence {result.confidence:.2f}")
+        return self.save_parsed_data(parsed_data, file_path)
+
     def parse_cv(self, file_path: str) -> str:
         """
         Bridge method that works with the local file path passed from draft_app.py.
@@ -0,0 +1,331 @@
+"""
+The CV processing pipeline, independent of the web tier.
+
+prepare_cv runs the I/O-bound stages (storage, parser, Claude, locations),
+render_cv_document the CPU-bound document generation, and finish_cv archives the
+results. process_cv_pipeline runs all three for the web app; the batch CLI runs
+them on separate pools.
+"""
+
+import os
+import json
+import time
+from typing import Optional
+from dotenv import load_dotenv
+from storage import get_storage_backend
+from cv_parser import CVParser
+from claude_utils import generate_blurb_with_claude
+from doc_generator import DocGenerator
+from location_service import LocationService
+from direct_download import save_output_to_downloads
+from file_tracker import track_file
+from logger import log_info, log_error, log_warning
+from feedback import FeedbackManager
+from archive_queue import get_archive_queue, json_blob_name
+from pipeline_executor import dependency_slot
+from local_parser import LOCAL_PARSER_ENABLED, can_parse_locally
+from blob_index import content_addressed_name
+from singleflight import hash_file
+from input_normalizer import NORMALIZE_WORD_INPUTS, convert_to_pdf, is_word_file, normalize_for_parser
+from pdf_preflight import preflight_pdf, route_pdf
+from parser_timeouts import document_features
+
+# Load environment variables
+load_dotenv('config.env')
+
+TEMPLATE_PATH = os.getenv("CV_TEMPLATE_PATH", '/Users/claytonbadland/flask_project/templates/Current_template.docx')
+# Copy finished documents into the server user's ~/Downloads as well (only useful when running locally)
+SAVE_TO_DOWNLOADS = os.getenv("SAVE_TO_DOWNLOADS", "false").lower() == "true"
+
+storage_backend = get_storage_backend()
+
+def _report_progress(feedback: Optional[FeedbackManager], stage: str, status: str, message: str) -> None:
+    """Report a stage transition to the job's feedback manager, if there is one."""
+    if feedback is not None:
+        feedback.update_progress(stage, status, message)
+
+def retry_storage_upload(file_path: str, filename: str, content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    Retry storage upload with specific timing requirements.
+    The file is stored under a content-addressed key, so bytes already in storage are not re-uploaded.
+    Returns the storage URL or None if all retries fail
+    """
+    max_retries = 3
+    base_wait = 5  # Base wait time in seconds
+    
+    for attempt in range(max_retries):
+        try:
+            log_info(f"Storage upload attempt {attempt + 1} ({storage_backend.name}) for {filename}")
+            firebase_path = storage_backend.upload_content_addressed(file_path, filename, content_hash)
+            
+            if firebase_path:
+                log_info(f"Storage upload successful on attempt {attempt + 1}, path: {firebase_path}")
+                return firebase_path
+                
+            # More detailed logging for failed attempts
+            log_warning(f"Storage upload attempt {attempt + 1} failed - No path returned for file: {filename}")
+            
+        except Exception as e:
+            log_error(f"Storage upload error on attempt {attempt + 1} for {filename}", e)
+        
+        # Don't wait after the last attempt
+        if attempt < max_retries - 1:
+            wait_time = base_wait + (attempt * 1) if attempt > 0 else base_wait
+            log_info(f"Waiting {wait_time} seconds before retry attempt {attempt + 2} for {filename}...")
+            time.sleep(wait_time)
+        else:
+            log_error(f"Storage upload failed after all {max_retries} attempts for {filename}")
+    
+    return None
+
+def _upload_and_parse(file_path: str, filename: str, content_hash: Optional[str],
+                      feedback: Optional[FeedbackManager]) -> Optional[dict]:
+    """
+    Stages 1 and 2: upload the file to storage and send it to the parser.
+    PDFs get a local pre-flight check first, which picks the parser lane; the parser timeout
+    comes from the latency model for documents like this one.
+    
+    Returns:
+        The parser result (falsy if parsing failed), or a response with success False
+        if the PDF was rejected or the upload failed
+    """
+    lane, report = 'parser', None
+    if filename.lower().endswith('.pdf'):
+        report = preflight_pdf(file_path)
+        decision = route_pdf(report)
+        log_info(f"Pre-flight for {filename}: {report.kind}, {report.page_count} pages, "
+                 f"{report.image_count} images, {report.byte_size // 1024} KB -> "
+                 f"{'lane ' + decision.lane if decision.accept else 'rejected'} ({', '.join(decision.reasons)})")
+        if not decision.accept:
+            track_file(file_path, "parse", "rejected", decision.message)
+            return {
+                "success": False,
+                "message": decision.message,
+                "status": "warning",
+                "preflight": report.to_dict()
+            }
+        lane = decision.lane
+    features = document_features(file_path, filename, report)
+    
+    # Stage 1 - Upload to storage with retries
+    log_info(f"Stage 1 - Uploading {filename} to storage")
+    _report_progress(feedback, 'upload', 'start', f"Uploading {filename}")
+    with dependency_slot('storage'):
+        firebase_path = retry_storage_upload(file_path, filename, content_hash)
+    
+    if not firebase_path:
+        log_error(f"Storage upload failed completely for {filename}")
+        return {
+            "success": False,
+            "message": "Sorry, we're having some issues connecting to our cloud storage, please wait a couple of minutes and try again. If issues persist beyond this point, wait 15 minutes before trying again as Google is clearly having some issues :).",
+            "status": "error"
+        }
+        
+    track_file(firebase_path, "storage", "uploaded", "File uploaded to storage")
+    log_info(f"Storage upload completed successfully for {filename}")
+    _report_progress(feedback, 'upload', 'complete', "File stored")
+    
+    # Stage 2 - Parse CV
+    log_info(f"Stage 2 - Parsing CV for {filename}")
+    _report_progress(feedback, 'parse', 'start', "Extracting information from CV")
+    cv_parser = CVParser()
+    with dependency_slot(lane):
+        return cv_parser.send_to_cv_parser(firebase_path, filename, features=features)
+
+def prepare_cv(file_path: str, filename: str, content_hash: Optional[str] = None,
+               feedback: Optional[FeedbackManager] = None) -> dict:
+    """
+    Run the I/O-bound stages of the pipeline: storage upload, parsing, blurb, locations and enrichment.
+    
+    Returns:
+        On success a dict with 'success', 'parsed_json_path' and 'enriched_json_path';
+        otherwise the error response to return to the user
+    """
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    log_info(f"Starting CV pipeline for: {filename} (base name: {base_name})")
+    track_file(file_path, "pipeline", "starting", f"Processing CV: {base_name}")
+    
+    # Plain-text and simple Word CVs are parsed locally, with no storage round trip or parser call
+    parsed_result = None
+    normalized = None
+    if LOCAL_PARSER_ENABLED and can_parse_locally(file_path, filename):
+        _report_progress(feedback, 'parse', 'start', "Extracting information from CV")
+        parsed_result = CVParser().parse_locally(file_path, filename, checked=True)
+        if parsed_result:
+            # The original is still kept in storage, just off the critical path
+            get_archive_queue().archive(content_addressed_name(content_hash or hash_file(file_path), filename),
+                                        file_path=file_path)
+    
+    if not parsed_result:
+        # Word files the parser struggles with are converted to PDF locally first
+        upload_path, upload_name, upload_hash = file_path, filename, content_hash
+        normalized = normalize_for_parser(file_path, filename)
+        if normalized:
+            upload_path, upload_name, upload_hash = normalized.file_path, normalized.filename, None
+        
+        parsed_result = _upload_and_parse(upload_path, upload_name, upload_hash, feedback)
+        if isinstance(parsed_result, dict) and parsed_result.get('success') is False:
+            return parsed_result
+    
+    # A parser failure on a Word file usually means a layout it can't handle; retry once as PDF
+    # instead of asking the user to re-save and upload again
+    if not parsed_result and not normalized and NORMALIZE_WORD_INPUTS != 'off' and is_word_file(filename):
+        log_info(f"Parsing failed for {filename}, retrying as PDF")
+        _report_progress(feedback, 'parse', 'start', "Converting to PDF and parsing again")
+        normalized = convert_to_pdf(file_path, filename, "parser failed on the original")
+        if normalized:
+            parsed_result = _upload_and_parse(normalized.file_path, normalized.filename, None, feedback)
+            if isinstance(parsed_result, dict) and parsed_result.get('success') is False:
+                return parsed_result
+    
+    # If parsing failed, it might be due to timeout
+    if not parsed_result:
+        log_warning(f"CV parsing failed for {filename} - Complex file structure detected")
+        return {
+            "success": False,
+            "message": "Complex file structure found, please save this resume as a PDF then upload again, this should solve the problem.",
+            "status": "warning",  # Indicates it's a warning, not a critical error
+            "retry_as_pdf": True
+        }
+        
+    # Get the path where the parsed data was saved
+    parsed_json_path = parsed_result.get('path')
+    if not parsed_json_path:
+        log_error(f"No parsed JSON path returned for {filename}")
+        raise Exception("No path returned from CV parser")
+    
+    log_info(f"CV parsing completed successfully for {filename}")
+    _report_progress(feedback, 'parse', 'complete', "CV parsed")
+    
+    # Stage 3 - Generate blurb
+    log_info(f"Stage 3 - Generating blurb for {filename}")
+    _report_progress(feedback, 'blurb', 'start', "Generating career summary")
+    with dependency_slot('claude'):
+        enriched_json_result = generate_blurb_with_claude(parsed_json_path)
+
+    # Check if the blurb generation was successful
+    if isinstance(enriched_json_result, dict):
+        enriched_json_path = enriched_json_result.get('path', '')
+        if not enriched_json_path:
+            # Check for a specific error message
+            if enriched_json_result.get('status') == 'error':
+                log_error(f"Failed to generate blurb for {filename}: {enriched_json_result.get('message')}")
+                return enriched_json_result  # Return the error message directly
+            else:
+                log_error(f"Failed to generate blurb for {filename}")
+                raise Exception("Failed to generate blurb")
+    else:
+        enriched_json_path = enriched_json_result
+
+    track_file(enriched_json_path, "blurb", "generated", "Blurb generated and added to JSON")
+    log_info(f"Blurb generation completed for {filename}")
+    _report_progress(feedback, 'blurb', 'complete', "Career summary generated")
+    
+    # Stage 4 - Classify locations
+    log_info(f"Stage 4 - Classifying locations for {filename}")
+    _report_progress(feedback, 'location', 'start', "Classifying work locations")
+    location_service = LocationService()
+    with open(enriched_json_path, 'r') as file:
+        enriched_data = json.load(file)
+    enriched_data = location_service.enrich_experience_locations(enriched_data)
+    log_info(f"Location classification completed for {filename}")
+    _report_progress(feedback, 'location', 'complete', "Work locations classified")
+    
+    # Stage 5 - Save enriched JSON
+    log_info(f"Stage 5 - Saving enriched JSON for {filename}")
+    _report_progress(feedback, 'enrich', 'start', "Saving enriched CV data")
+    enriched_json_path = os.path.join('parsed_jsons', f"{base_name}_enriched.json")
+    with open(enriched_json_path, 'w') as file:
+        json.dump(enriched_data, file, indent=4)
+    track_file(enriched_json_path, "enrich", "saved", "Enriched JSON saved")
+    log_info(f"Enriched JSON saved successfully for {filename}")
+    _report_progress(feedback, 'enrich', 'complete', "Enriched CV data saved")
+    
+    return {
+        'success': True,
+        'parsed_json_path': parsed_json_path,
+        'enriched_json_path': enriched_json_path
+    }
+
+def render_cv_document(enriched_json_path: str, template_path: str = TEMPLATE_PATH,
+                       output_format: str = 'docx') -> Optional[str]:
+    """
+    Render the final document from enriched JSON.
+    CPU-bound and self-contained, so it can run in a worker process.
+    
+    Args:
+        output_format: 'docx', or 'pdf' to convert through the office converter pool
+    
+    Returns:
+        Path of the generated document, or None if generation failed
+    """
+    generator = DocGenerator(template_path)
+    return generator.generate_cv_document(enriched_json_path, output_format=output_format)
+
+def finish_cv(filename: str, parsed_json_path: str, enriched_json_path: str, output_path: Optional[str],
+              save_to_downloads: bool = SAVE_TO_DOWNLOADS) -> dict:
+    """
+    Archive a rendered CV's artefacts and build the success response.
+    
+    Raises:
+        Exception: If the document was not generated or could not be saved
+    """
+    if not output_path:
+        log_error(f"Failed to generate CV document for {filename}")
+        raise Exception("Failed to generate CV document")
+    
+    if not os.path.exists(output_path):
+        log_error(f"Generated file not found at {output_path} for {filename}")
+        raise FileNotFoundError(f"Generated file not found at {output_path}")
+    
+    # Archive artefacts in the background so uploads don't delay the response
+    archive_queue = get_archive_queue()
+    archive_queue.archive(json_blob_name(os.path.basename(parsed_json_path)), file_path=parsed_json_path)
+    archive_queue.archive(json_blob_name(os.path.basename(enriched_json_path)), file_path=enriched_json_path)
+    archive_queue.archive(f"outputs/{os.path.basename(output_path)}", file_path=output_path)
+    
+    # Final step: Save document to Downloads folder
+    if save_to_downloads:
+        log_info(f"Saving document to Downloads folder for {filename}")
+        download_path = save_output_to_downloads(output_path)
+        if not download_path:
+            log_error(f"Failed to save file to Downloads folder for {filename}")
+            raise Exception("Failed to save file to Downloads folder")
+        track_file(download_path, "download", "saved", "File saved to Downloads folder")
+        log_info(f"File saved successfully to Downloads folder for {filename}")
+
+    log_info(f"CV processing completed successfully for: {filename}")
+    return {
+        'success': True,
+        'message': f'CV processed successfully: {filename}',
+        'download_file': os.path.basename(output_path),
+        'download_url': f"/download/{os.path.basename(output_path)}"
+    }
+
+def process_cv_pipeline(file_path: str, filename: str, content_hash: Optional[str] = None,
+                        feedback: Optional[FeedbackManager] = None, template_path: str = TEMPLATE_PATH) -> dict:
+    """
+    Process the CV through the complete pipeline with error handling.
+    Stage transitions are reported to feedback when provided.
+    """
+    try:
+        prepared = prepare_cv(file_path, filename, content_hash, feedback)
+        if not prepared.get('success'):
+            return prepared
+        
+        # Stage 6 - Generate document
+        log_info(f"Stage 6 - Generating document for {filename}")
+        _report_progress(feedback, 'generate', 'start', "Generating final document")
+        with dependency_slot('render'):
+            output_path = render_cv_document(prepared['enriched_json_path'], template_path)
+        response = finish_cv(filename, prepared['parsed_json_path'], prepared['enriched_json_path'], output_path)
+        _report_progress(feedback, 'generate', 'complete', "Document ready")
+        return response
+        
+    except Exception as e:
+        log_error(f"Error processing CV: {filename}", e)
+        return {
+            "success": False,
+            "message": f"Error processing CV: {str(e)}",
+            "status": "error"  # Indicates it's a critical error
+        }
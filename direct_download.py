@@ -1,9 +1,9 @@
 import os
 import platform
 import shutil
+import tempfile
 from pathlib import Path
 from typing import Optional, Union
-import io
 
 def get_downloads_folder() -> Path:
     """Get the user's downloads folder path based on the operating system."""
@@ -50,18 +50,18 @@ def save_output_to_downloads(output_file_path: Union[str, Path],
         if not downloads_folder.exists():
             downloads_folder.mkdir(parents=True, exist_ok=True)
         
-        # Use the same filename as the source
-        dest_path = downloads_folder / output_path.name
+        # Use the same filename as the source; a newer render of the same CV replaces the old copy
+        dest_path = downloads_folder / (new_filename or output_path.name)
         
-        # Avoid overwriting by appending a counter if needed
-        counter = 1
-        original_stem = dest_path.stem
-        while dest_path.exists():
-            dest_path = downloads_folder / f"{original_stem}_{counter}{dest_path.suffix}"
-            counter += 1
-        
-        # Copy the file to the downloads folder
-        shutil.copy2(output_path, dest_path)
+        # Copy to a temporary name and rename, so the replacement is atomic
+        fd, tmp_path = tempfile.mkstemp(dir=downloads_folder, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copy2(output_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
         # Verify the copied file
         if not dest_path.exists():
@@ -1,64 +1,74 @@
 import os
+import re
 import json
 import traceback
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Optional
 from docx import Document
 from docxtpl import DocxTemplate
 from location_service import LocationService
-from spellchecker import SpellChecker
+from spell_index import SpellIndex, get_spell_index
+from render_cache import export_key, get_render_cache, link_or_copy, maybe_sweep_outputs, render_key
+from office_pool import get_office_pool
+from logger import log_debug, log_warning
 
 # Define paths
 TEMPLATES_DIR = 'templates'
 CURRENT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), TEMPLATES_DIR, 'Current_template.docx')
 OUTPUTS_DIR = 'outputs'
 
+# Formats generate_cv_document can produce; pdf is converted from the rendered .docx
+OUTPUT_FORMATS = ('docx', 'pdf')
+
 # Global settings
-ENABLE_SPELL_CHECK = False  # Default to False
+ENABLE_SPELL_CHECK = os.getenv("ENABLE_SPELL_CHECK", "false").lower() == "true"  # Default to False
+ENABLE_RENDER_CACHE = os.getenv("ENABLE_RENDER_CACHE", "true").lower() == "true"  # Default to True
 
 # Create necessary directories
 os.makedirs(OUTPUTS_DIR, exist_ok=True)
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 
-# Initialize spell checker with industry-specific words
-def initialize_spell_checker():
-    spell = SpellChecker()
-    # Add common industry-specific terms and job titles
-    industry_terms = {
-        # Job Titles
-        'foreman', 'supervisor', 'technician', 'operator', 'mechanic', 'electrician',
-        'plumber', 'welder', 'carpenter', 'builder', 'fitter', 'turner', 'machinist',
-        'rigger', 'scaffolder', 'painter', 'laborer', 'labourer', 'apprentice',
-        'trainee', 'installer', 'assembler', 'driver', 'operator', 'storeman',
-        'storeperson', 'yardman', 'tradesman', 'tradie', 'handyman', 'ductman',
-        
-        # Equipment and Skills
-        'hvac', 'forklift', 'excavator', 'bobcat', 'scissorlift', 'crane',
-        'bulldozer', 'grader', 'loader', 'digger', 'telehandler', 'manlift',
-        'mig', 'tig', 'gmaw', 'smaw', 'fcaw', 'stick', 'plasma',
-        
-        # Certifications and Standards
-        'ohs', 'whs', 'iso', 'haccp', 'tafe', 'cert', 'ppe', 'swms', 'sop',
-        'msds', 'sds', 'jsa', 'jha', 'asme', 'osha', 'confined',
-        
-        # Common Industry Words
-        'warehousing', 'logistics', 'dispatch', 'receiving', 'shipping',
-        'maintenance', 'repair', 'installation', 'construction', 'fabrication',
-        'assembly', 'production', 'manufacturing', 'industrial', 'commercial',
-        'residential', 'mechanical', 'electrical', 'hydraulic', 'pneumatic'
-    }
-    spell.word_frequency.load_words(industry_terms)
-    return spell
+# Industry-specific terms and job titles added to the spelling dictionary
+INDUSTRY_TERMS = frozenset({
+    # Job Titles
+    'foreman', 'supervisor', 'technician', 'operator', 'mechanic', 'electrician',
+    'plumber', 'welder', 'carpenter', 'builder', 'fitter', 'turner', 'machinist',
+    'rigger', 'scaffolder', 'painter', 'laborer', 'labourer', 'apprentice',
+    'trainee', 'installer', 'assembler', 'driver', 'operator', 'storeman',
+    'storeperson', 'yardman', 'tradesman', 'tradie', 'handyman', 'ductman',
+    
+    # Equipment and Skills
+    'hvac', 'forklift', 'excavator', 'bobcat', 'scissorlift', 'crane',
+    'bulldozer', 'grader', 'loader', 'digger', 'telehandler', 'manlift',
+    'mig', 'tig', 'gmaw', 'smaw', 'fcaw', 'stick', 'plasma',
+    
+    # Certifications and Standards
+    'ohs', 'whs', 'iso', 'haccp', 'tafe', 'cert', 'ppe', 'swms', 'sop',
+    'msds', 'sds', 'jsa', 'jha', 'asme', 'osha', 'confined',
+    
+    # Common Industry Words
+    'warehousing', 'logistics', 'dispatch', 'receiving', 'shipping',
+    'maintenance', 'repair', 'installation', 'construction', 'fabrication',
+    'assembly', 'production', 'manufacturing', 'industrial', 'commercial',
+    'residential', 'mechanical', 'electrical', 'hydraulic', 'pneumatic'
+})
+
+def initialize_spell_checker() -> SpellIndex:
+    """
+    Return the shared spelling index for the base dictionary plus INDUSTRY_TERMS.
+    The index is built on disk the first time and reused by every generator and worker.
+    """
+    return get_spell_index(INDUSTRY_TERMS)
+
+_WORD_OR_PUNCTUATION_RE = re.compile(r"[\w']+|[.,!?;]")
 
 def debug_spell_correction(original: str, corrected: str, word_type: str = "word"):
-    """Print debug information about spell corrections."""
+    """Log debug information about spell corrections."""
     if original != corrected:
-        print(f"\n=== SPELL CHECK DEBUG ===")
-        print(f"Original {word_type}: '{original}'")
-        print(f"Corrected {word_type}: '{corrected}'")
-        print(f"Changed: {'Yes' if original != corrected else 'No'}")
+        log_debug(f"Spell check corrected {word_type}: '{original}' -> '{corrected}'")
 
-def auto_correct_text(text: str, spell: SpellChecker, word_type: str = "text") -> str:
+def auto_correct_text(text: str, spell: SpellIndex, word_type: str = "text") -> str:
     """
     Automatically correct obvious spelling mistakes while preserving case and formatting.
     Added debugging output for corrections.
@@ -67,11 +77,7 @@ def auto_correct_text(text: str, spell: SpellChecker, word_type: str = "text") -
         return text
         
     # Split into words while preserving punctuation
-    def split_with_punctuation(s):
-        import re
-        return re.findall(r"[\w']+|[.,!?;]", s)
-        
-    words = split_with_punctuation(text)
+    words = _WORD_OR_PUNCTUATION_RE.findall(text)
     corrected_words = []
     any_corrections = False
     
@@ -114,12 +120,10 @@ def auto_correct_text(text: str, spell: SpellChecker, word_type: str = "text") -
     
     return result
 
-def spell_check_context(context: Dict[str, Any], spell: SpellChecker) -> Dict[str, Any]:
+def spell_check_context(context: Dict[str, Any], spell: SpellIndex) -> Dict[str, Any]:
     """
     Apply spell checking focused on job titles and employers.
     """
-    print("\n=== STARTING SPELL CHECK ===")
-    
     # Focus only on employment-related fields
     employer_fields = ['nzemployers', 'internationalemployers']
     position_fields = ['nzpositions', 'internationalpositions']
@@ -128,7 +132,6 @@ def spell_check_context(context: Dict[str, Any], spell: SpellChecker) -> Dict[st
     for field in employer_fields:
         if field in context and isinstance(context[field], str):
             if context[field] != "None":
-                print(f"\nChecking employers in {field}:")
                 lines = context[field].split('\n')
                 corrected_lines = []
                 for line in lines:
@@ -144,7 +147,6 @@ def spell_check_context(context: Dict[str, Any], spell: SpellChecker) -> Dict[st
     for field in position_fields:
         if field in context and isinstance(context[field], str):
             if context[field] != "None":
-                print(f"\nChecking job titles in {field}:")
                 lines = context[field].split('\n')
                 corrected_lines = []
                 for line in lines:
@@ -155,8 +157,7 @@ def spell_check_context(context: Dict[str, Any], spell: SpellChecker) -> Dict[st
                     else:
                         corrected_lines.append(line)
                 context[field] = '\n'.join(corrected_lines)
-    
-    print("\n=== SPELL CHECK COMPLETE ===")
+
     return context
 
 def format_name(name_str: str) -> str:
@@ -187,7 +188,7 @@ def format_name(name_str: str) -> str:
             
     return ' '.join(formatted_words)
 
-def extract_city_from_address(address: str) -> str:
+def extract_city_from_address(address: str, location_service: Optional[LocationService] = None) -> str:
     """
     Extract location from an address string by checking against nz_locations.json.
     If a match is found in nz_locations.json, return that location name.
@@ -199,8 +200,8 @@ def extract_city_from_address(address: str) -> str:
     # Convert to lowercase for matching
     address_lower = address.lower()
     
-    # Initialize LocationService
-    location_service = LocationService()
+    # Initialize LocationService unless the caller already has one
+    location_service = location_service or LocationService()
     
     # Check if any part of the address matches a known NZ location
     if location_service.is_nz_location(address_lower):
@@ -258,9 +259,143 @@ def load_company_suffixes():
 # Cache for company suffixes
 _COMPANY_SUFFIXES = None
 
+# Words that should be lowercase unless at start
+_COMMON_WORDS = frozenset({
+    'and', 'of', 'the', 'in', 'on', 'at', 'to', 'for', 'with', 'by',
+    'de', 'van', 'der', 'den', 'von', 'und', 'les', 'la', 'el'
+})
+
+# Common business acronyms to preserve
+_KNOWN_ACRONYMS = frozenset({
+    'AE', 'IBM', 'ANZ', 'BNZ', 'MSS', 'LLC', 'LTD', 'INC', 'PTY',
+    'GmbH', 'AG', 'NV', 'SA', 'PLC', 'CO', 'W.I.I', 'UAE', 'KSA'
+})
+
+# Common last name words that should never be treated as acronyms
+_COMMON_LAST_NAMES = frozenset({
+    'SMITH', 'JONES', 'BROWN', 'WILSON', 'TAYLOR', 'JOHNSON',
+    'WHITE', 'MARTIN', 'ANDERSON', 'THOMPSON', 'WOOD'
+})
+
+# Company suffixes span at most this many words
+_MAX_SUFFIX_WORDS = 3
+_SUFFIX_END = object()  # Trie key holding the preferred spelling of a complete suffix
+
+# Token trie over _COMPANY_SUFFIXES, built once the suffixes are loaded
+_SUFFIX_TRIE = None
+
+_PARENTHESES_RE = re.compile(r'([()])')
+
+COMPANY_NAME_CACHE_SIZE = 8192
+
+def _build_suffix_trie(suffixes: Dict[str, str]) -> Dict:
+    """Index suffix keys by their space-separated tokens so a name is matched word by word."""
+    trie = {}
+    for key, preferred in suffixes.items():
+        node = trie
+        for token in key.split(' '):
+            node = node.setdefault(token, {})
+        node[_SUFFIX_END] = preferred
+    return trie
+
+def _match_suffix(words: list, start: int):
+    """
+    Find the longest company suffix (up to three words) starting at words[start].
+
+    A run of words matches when its lowercased words, or the same words with dots
+    removed, equal a suffix key. Longer runs win, and at equal length a match with
+    dots kept wins over one with dots removed.
+
+    Returns:
+        Tuple of (preferred spelling, number of words matched), or (None, 0)
+    """
+    exact_node = dotless_node = _SUFFIX_TRIE
+    best = (None, 0)
+    for depth in range(1, min(_MAX_SUFFIX_WORDS, len(words) - start) + 1):
+        word_lower = words[start + depth - 1].lower()
+        exact_node = exact_node.get(word_lower) if exact_node is not None else None
+        dotless_node = dotless_node.get(word_lower.replace('.', '')) if dotless_node is not None else None
+        if exact_node is None and dotless_node is None:
+            break
+        if exact_node is not None and _SUFFIX_END in exact_node:
+            best = (exact_node[_SUFFIX_END], depth)
+        elif dotless_node is not None and _SUFFIX_END in dotless_node:
+            best = (dotless_node[_SUFFIX_END], depth)
+    return best
+
+def _is_acronym(word: str) -> bool:
+    """
+    Check if a word is an acronym (including those with dots).
+    
+    Rules:
+    1. Known business acronyms are always preserved
+    2. Common last name words are never acronyms
+    3. Words with dots between capital letters are acronyms
+    4. Anything else is not an acronym
+    """
+    clean_word = word.replace('.', '')
+    if clean_word in _KNOWN_ACRONYMS:
+        return True
+    if clean_word in _COMMON_LAST_NAMES:
+        return False
+    return '.' in word and all(c.isupper() or c == '.' for c in word)
+
+def _format_company_part(text: str) -> str:
+    """Format one parenthesis-free segment of a company name."""
+    words = text.replace('-', ' - ').split()
+    formatted_words = []
+    
+    i = 0
+    while i < len(words):
+        word = words[i]
+        
+        # Keep hyphen as is
+        if word == '-':
+            formatted_words.append(word)
+            i += 1
+            continue
+        
+        # Check for multi-word company suffixes (like "W.I.I")
+        suffix, length = _match_suffix(words, i)
+        if length:
+            formatted_words.append(suffix)
+            i += length
+            continue
+        
+        word_lower = word.lower()
+        # Check if word is an acronym
+        if _is_acronym(word):
+            formatted_words.append(word)
+        # Handle common words (lowercase unless at start)
+        elif word_lower in _COMMON_WORDS and formatted_words:
+            formatted_words.append(word_lower)
+        # Regular capitalization for other words
+        else:
+            formatted_words.append(word.capitalize())
+        i += 1
+        
+    return ' '.join(formatted_words)
+
+@lru_cache(maxsize=COMPANY_NAME_CACHE_SIZE)
+def _format_company_name_cached(name: str) -> str:
+    # Split on parentheses: text closed by ')' is parenthesised, anything else is plain
+    pieces = _PARENTHESES_RE.split(name)
+    formatted_parts = []
+    for k in range(0, len(pieces), 2):
+        text = pieces[k]
+        if not text:
+            continue
+        closer = pieces[k + 1] if k + 1 < len(pieces) else None
+        if closer == ')':
+            formatted_parts.append(f"({_format_company_part(text)})")
+        else:
+            formatted_parts.append(_format_company_part(text))
+    return ''.join(formatted_parts)
+
 def format_company_name(name: str) -> str:
     """
     Format company names with special handling for acronyms, parentheses, and company suffixes.
+    Results are memoized per raw name, since the same employers recur across experiences and CVs.
     
     Examples:
         'MSS -mechanical Support System (stellar Recruitment Lp)' -> 'MSS - Mechanical Support System (Stellar Recruitment LP)'
@@ -274,145 +409,14 @@ def format_company_name(name: str) -> str:
     if not name:
         return ""
     
-    # Load company suffixes if not already loaded
-    global _COMPANY_SUFFIXES
-    if _COMPANY_SUFFIXES is None:
-        _COMPANY_SUFFIXES = load_company_suffixes()
-    
-    # Common words that should be lowercase unless at start
-    common_words = {
-        'and', 'of', 'the', 'in', 'on', 'at', 'to', 'for', 'with', 'by',
-        'de', 'van', 'der', 'den', 'von', 'und', 'les', 'la', 'el'
-    }
-    
-    def is_acronym(word: str) -> bool:
-        """
-        Check if a word is an acronym (including those with dots).
-        
-        Rules:
-        1. Known business acronyms are always preserved
-        2. 2-3 letter words in caps are considered acronyms
-        3. Words with dots between letters are acronyms
-        4. Common last name words are never acronyms
-        """
-        # Remove dots and check if it's all uppercase
-        clean_word = word.replace('.', '')
-        
-        # Common business acronyms to preserve
-        known_acronyms = {
-            'AE', 'IBM', 'ANZ', 'BNZ', 'MSS', 'LLC', 'LTD', 'INC', 'PTY',
-            'GmbH', 'AG', 'NV', 'SA', 'PLC', 'CO', 'W.I.I', 'UAE', 'KSA'
-        }
-        
-        # Common last name words that should never be treated as acronyms
-        common_last_names = {
-            'SMITH', 'JONES', 'BROWN', 'WILSON', 'TAYLOR', 'JOHNSON',
-            'WHITE', 'MARTIN', 'ANDERSON', 'THOMPSON', 'WOOD'
-        }
-        
-        # If it's a known acronym, preserve it
-        if clean_word in known_acronyms:
-            return True
-        
-        # If it's a common last name, it's not an acronym
-        if clean_word in common_last_names:
-            return False
-        
-        # Check for dots between letters (like W.I.I)
-        if '.' in word and all(c.isupper() or c == '.' for c in word):
-            return True
-        
-        # For 2-3 letter words, they must be known acronyms to be preserved
-        if len(clean_word) <= 3:
-            return clean_word in known_acronyms
-        
-        # For longer words, they must be in known_acronyms to be considered acronyms
-        return clean_word in known_acronyms
-    
-    def format_part(text: str, is_in_parentheses: bool = False) -> str:
-        if not text:
-            return ""
-            
-        # Split into words, preserving spaces around hyphens
-        text = text.replace('-', ' - ')
-        words = [w for w in text.split() if w]
-        formatted_words = []
-        
-        i = 0
-        while i < len(words):
-            word = words[i]
-            word_lower = word.lower()
-            word_no_dots = word_lower.replace('.', '')
-            
-            # Keep hyphen as is
-            if word == '-':
-                formatted_words.append(word)
-                i += 1
-                continue
-            
-            # Check for multi-word company suffixes (like "W.I.I")
-            found_suffix = False
-            for j in range(min(3, len(words) - i), 0, -1):
-                potential_suffix = ' '.join(words[i:i+j]).lower()
-                potential_suffix_no_dots = potential_suffix.replace('.', '')
-                if potential_suffix in _COMPANY_SUFFIXES or potential_suffix_no_dots in _COMPANY_SUFFIXES:
-                    suffix_key = potential_suffix if potential_suffix in _COMPANY_SUFFIXES else potential_suffix_no_dots
-                    formatted_words.append(_COMPANY_SUFFIXES[suffix_key])
-                    i += j
-                    found_suffix = True
-                    break
-            
-            if found_suffix:
-                continue
-                
-            # Check if word is an acronym
-            if is_acronym(word):
-                formatted_words.append(word)
-            # Handle common words (lowercase unless at start)
-            elif word_lower in common_words and formatted_words:
-                formatted_words.append(word_lower)
-            # Regular capitalization for other words
-            else:
-                formatted_words.append(word.capitalize())
-            
-            i += 1
-            
-        return ' '.join(formatted_words)
-    
-    # Split the name into parts based on parentheses
-    parts = []
-    current = []
-    in_parentheses = False
-    
-    for char in name:
-        if char == '(':
-            if current:
-                parts.append(''.join(current))
-                current = []
-            in_parentheses = True
-        elif char == ')':
-            if current:
-                parts.append('(' + ''.join(current) + ')')
-                current = []
-            in_parentheses = False
-        else:
-            current.append(char)
-    
-    if current:
-        parts.append(''.join(current))
+    # Load company suffixes and build the matcher if not already done
+    global _COMPANY_SUFFIXES, _SUFFIX_TRIE
+    if _SUFFIX_TRIE is None:
+        if _COMPANY_SUFFIXES is None:
+            _COMPANY_SUFFIXES = load_company_suffixes()
+        _SUFFIX_TRIE = _build_suffix_trie(_COMPANY_SUFFIXES)
     
-    # Format each part
-    formatted_parts = []
-    for part in parts:
-        if part.startswith('(') and part.endswith(')'):
-            # Format content inside parentheses
-            inner_content = part[1:-1]
-            formatted_inner = format_part(inner_content, True)
-            formatted_parts.append(f"({formatted_inner})")
-        else:
-            formatted_parts.append(format_part(part))
-    
-    return ''.join(formatted_parts)
+    return _format_company_name_cached(name)
 
 def format_bullet_list(items: set) -> str:
     """Format a set of items as a bullet-pointed list without leading newline."""
@@ -439,13 +443,16 @@ def round_up_years(months: int) -> int:
 class DocGenerator:
     """Document generator for CV documents."""
     
-    def __init__(self, template_path: str, enable_spell_check: bool = ENABLE_SPELL_CHECK):
+    def __init__(self, template_path: str, enable_spell_check: bool = ENABLE_SPELL_CHECK,
+                 enable_render_cache: bool = ENABLE_RENDER_CACHE):
         """
         Initialize the document generator with the template path.
         
         Args:
             template_path: Path to the template file
             enable_spell_check: Whether to enable spell checking (default: False)
+            enable_render_cache: Whether to reuse documents already rendered from the same
+                context and template (default: True)
         """
         if not os.path.exists(template_path):
             raise FileNotFoundError(f"Template file not found at: {template_path}")
@@ -453,10 +460,15 @@ class DocGenerator:
         self.location_service = LocationService()
         self.enable_spell_check = enable_spell_check
         self.spell = initialize_spell_checker() if enable_spell_check else None
+        self.render_cache = get_render_cache() if enable_render_cache else None
 
     def prepare_context(self, cv_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Prepare a context dictionary for placeholder replacement.
+        
+        Pure: cv_data is not modified and nothing is written, so the result depends only
+        on cv_data and the generator's settings and can be cached or computed in parallel.
+        The calculated total years is returned as context['total_experience_in_years'].
         """
         context = {}
         profile = cv_data.get('data', {}).get('profile', {})
@@ -501,18 +513,14 @@ class DocGenerator:
         
         # Get blurb directly from profile, not from basics
         blurb = profile.get('blurb', '')
-        print("\n=== BLURB DEBUG ===")
-        print(f"Raw blurb from profile: {blurb}")
         context['blurb'] = blurb
-        print(f"Final blurb in context: {context['blurb']}")
+        log_debug(f"Blurb in context: {blurb}")
         
         # Extract city from address
         full_address = basics.get('address', '')
-        city = extract_city_from_address(full_address)
+        city = extract_city_from_address(full_address, self.location_service)
         context['location'] = city
-        print(f"\n=== LOCATION DEBUG ===")
-        print(f"Full address: {full_address}")
-        print(f"Extracted city: {city}")
+        log_debug(f"Location: '{full_address}' -> '{city}'")
         
         # Professional Experience - Split into NZ and International using is_nz flag
         experiences = profile.get('professional_experiences', [])
@@ -528,8 +536,6 @@ class DocGenerator:
         nz_positions = set()
         international_positions = set()
         
-        print("\n=== EXPERIENCE DURATION DEBUG ===")
-        
         # Process each experience entry
         for exp in experiences:
             company_name = format_company_name(exp.get('company', ''))
@@ -547,18 +553,18 @@ class DocGenerator:
             try:
                 duration_months = exp.get('duration_in_months')
                 if duration_months is None:
-                    print(f"WARNING: No duration_in_months for {formatted_exp['company']}, defaulting to 0")
+                    log_warning(f"No duration_in_months for {formatted_exp['company']}, defaulting to 0")
                     duration_months = 0
                 elif isinstance(duration_months, str):
                     duration_months = int(duration_months)
                 elif not isinstance(duration_months, int):
-                    print(f"WARNING: Invalid duration_in_months type for {formatted_exp['company']}: {type(duration_months)}")
+                    log_warning(f"Invalid duration_in_months type for {formatted_exp['company']}: {type(duration_months)}")
                     duration_months = 0
             except (ValueError, TypeError) as e:
-                print(f"ERROR: Could not parse duration for {formatted_exp['company']}: {e}")
+                log_warning(f"Could not parse duration for {formatted_exp['company']}: {e}")
                 duration_months = 0
                     
-            print(f"Experience at {formatted_exp['company']}: {duration_months} months")
+            log_debug(f"Experience at {formatted_exp['company']}: {duration_months} months")
             
             # Add duration to appropriate category based on is_nz flag
             if exp.get('is_nz', False):
@@ -589,23 +595,11 @@ class DocGenerator:
             international_years = initial_international_years
             total_years = nz_years + international_years
         
-        # Update total years in the JSON structure
-        print(f"\n=== YEARS CALCULATION DEBUG ===")
-        print(f"Total months: {total_months} (rounded up to {total_years} years)")
-        print(f"NZ months: {nz_months} (rounded up to {nz_years} years)")
-        print(f"International months: {international_months} (initial round up to {initial_international_years} years, adjusted to {international_years} years)")
-        print(f"Final total years (NZ + International): {total_years}")
-        
-        # Update the JSON structure with calculated years
-        if 'data' in cv_data:
-            cv_data['data']['profile']['basics']['total_experience_in_years'] = total_years
-        else:
-            cv_data['profile']['basics']['total_experience_in_years'] = total_years
-            
-        # Save the updated JSON back to file
-        json_path = os.path.join('parsed_jsons', f"{Path(self.template_path).stem}_enriched.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(cv_data, f, indent=4)
+        log_debug(
+            f"Years: total {total_months} months -> {total_years}, NZ {nz_months} months -> {nz_years}, "
+            f"international {international_months} months -> {initial_international_years} adjusted to {international_years}"
+        )
+        context['total_experience_in_years'] = total_years
         
         # Format years of experience as sentences
         context['nzyears'] = format_years_experience(nz_years, "New Zealand")
@@ -645,99 +639,142 @@ class DocGenerator:
         
         # Apply spell checking to the context only if enabled
         if self.enable_spell_check:
-            print("\n=== SPELL CHECK ENABLED ===")
             context = spell_check_context(context, self.spell)
-        else:
-            print("\n=== SPELL CHECK DISABLED ===")
         
         return context
 
-    def generate_cv_document(self, json_path: str, projects_data: Optional[Dict] = None) -> str:
+    def build_context(self, json_path: str, projects_data: Optional[Dict] = None) -> Dict[str, Any]:
         """
-        Generate a formatted CV document from the provided JSON data.
+        Load the CV JSON and prepare the render context.
+        
+        Args:
+            json_path: Path to the JSON file containing CV data
+            projects_data: Optional dictionary merged into the context
+            
+        Returns:
+            The render context
+        """
+        if not os.path.exists(self.template_path):
+            raise FileNotFoundError(f"Template file not found at: {self.template_path}")
+        
+        with open(json_path, 'r', encoding='utf-8') as f:
+            cv_data = json.load(f)
+        log_debug(f"Loaded CV data from {json_path}")
+        
+        context = self.prepare_context(cv_data)
+        if projects_data:
+            context.update(projects_data)
+        log_debug(f"Context keys: {list(context.keys())}")
+        return context
+
+    def render_template(self, context: Dict[str, Any]) -> DocxTemplate:
+        """
+        Load the template and render context into it.
+        
+        Returns:
+            The rendered DocxTemplate, ready to save
         """
         try:
-            # 1. Template Verification
-            print("\n=== TEMPLATE VERIFICATION ===")
-            print(f"Template path: {self.template_path}")
-            print(f"Template exists: {os.path.exists(self.template_path)}")
-            template_size = os.path.getsize(self.template_path) if os.path.exists(self.template_path) else 'N/A'
-            print(f"Template size: {template_size} bytes")
+            doc = DocxTemplate(self.template_path)
             
-            if not os.path.exists(self.template_path):
-                raise FileNotFoundError(f"Template file not found at: {self.template_path}")
+            # Check for required variables in context
+            variables = doc.get_undeclared_template_variables()
+            missing_vars = [var for var in variables if var not in context]
+            if missing_vars:
+                log_warning(f"Missing context for template variables: {missing_vars}")
             
-            # 2. JSON Data Loading
-            print("\n=== JSON DATA VERIFICATION ===")
-            print(f"JSON path: {json_path}")
-            print(f"JSON exists: {os.path.exists(json_path)}")
-            with open(json_path, 'r', encoding='utf-8') as f:
-                cv_data = json.load(f)
-            print("JSON data loaded successfully")
+        except Exception as template_error:
+            print(f"Template loading error: {template_error}")
+            raise
+        
+        try:
+            doc.render(context)
+            log_debug(f"Rendered template {self.template_path}")
+            return doc
+        except Exception as render_error:
+            print(f"Document generation error: {render_error}")
+            raise
+
+    def _write_docx(self, context: Dict[str, Any], output_path: str) -> str:
+        """Render context to output_path, reusing a cached render when there is one."""
+        from file_tracker import track_file
+        
+        # Same context and template content render the same document, so reuse it
+        cache_key = None
+        if self.render_cache:
+            cache_key = render_key(context, self.template_path)
+            cached_path = self.render_cache.get(cache_key)
+            if cached_path:
+                print(f"Render cache hit ({cache_key[:12]}), reusing rendered document")
+                link_or_copy(str(cached_path), output_path)
+                self.render_cache.bind_name(os.path.basename(output_path), cache_key)
+                track_file(output_path, "generate", "created", "Final document served from render cache")
+                return output_path
+        
+        doc = self.render_template(context)
+        
+        # Save document. With the cache on, it is rendered into the cache and
+        # linked to the output path, so the file is only written once.
+        print(f"Saving document to: {output_path}")
+        if cache_key:
+            tmp_path = self.render_cache.new_temp_path()
+            try:
+                doc.save(tmp_path)
+                if os.path.getsize(tmp_path) == 0:
+                    raise ValueError("Generated file is empty")
+                cached_path = self.render_cache.put(cache_key, tmp_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            link_or_copy(str(cached_path), output_path)
+            self.render_cache.bind_name(os.path.basename(output_path), cache_key)
+        else:
+            # The existing output may be a hard link into the cache; replace it rather than write through it
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            doc.save(output_path)
+        
+        # Verify output
+        if os.path.exists(output_path):
+            output_size = os.path.getsize(output_path)
+            print(f"Output file created successfully. Size: {output_size} bytes")
+            if output_size == 0:
+                raise ValueError("Generated file is empty")
             
-            # 3. Context Preparation
-            print("\n=== CONTEXT PREPARATION ===")
-            context = self.prepare_context(cv_data)
-            if projects_data:
-                context.update(projects_data)
-                print("Projects data added to context")
-            print(f"Context keys: {list(context.keys())}")
+            # Track the file creation
+            track_file(output_path, "generate", "created", "Final document generated")
             
-            # 4. Template Loading
-            print("\n=== TEMPLATE LOADING ===")
-            try:
-                doc = DocxTemplate(self.template_path)
-                print("Template loaded successfully")
-                
-                # Check template variables
-                variables = doc.get_undeclared_template_variables()
-                print(f"Template variables found: {variables}")
-                
-                # Check for required variables in context
-                missing_vars = [var for var in variables if var not in context]
-                if missing_vars:
-                    print(f"WARNING: Missing context for variables: {missing_vars}")
-                
-            except Exception as template_error:
-                print(f"Template loading error: {template_error}")
-                raise
+            return output_path
+        else:
+            raise FileNotFoundError("Output file was not created")
+
+    def generate_cv_document(self, json_path: str, projects_data: Optional[Dict] = None, output_format: str = 'docx') -> str:
+        """
+        Generate a formatted CV document from the provided JSON data.
+        
+        Args:
+            json_path: Path to the JSON file containing CV data
+            projects_data: Optional dictionary containing additional project data
+            output_format: One of OUTPUT_FORMATS; formats other than docx are converted
+                from the rendered .docx by the office converter pool
             
-            # 5. Document Generation
-            print("\n=== DOCUMENT GENERATION ===")
-            try:
-                doc.render(context)
-                print("Template rendering completed")
-                
-                # Generate only one output file
-                base_name = Path(json_path).stem
-                if base_name.endswith('_enriched'):
-                    base_name = base_name[:-9]
-                
-                # Use a single output path for both operations
-                output_path = os.path.join(OUTPUTS_DIR, f"{base_name}_CV.docx")
-                
-                # Save document
-                print(f"Saving document to: {output_path}")
-                doc.save(output_path)
-                
-                # Verify output
-                if os.path.exists(output_path):
-                    output_size = os.path.getsize(output_path)
-                    print(f"Output file created successfully. Size: {output_size} bytes")
-                    if output_size == 0:
-                        raise ValueError("Generated file is empty")
-                    
-                    # Track the file creation
-                    from file_tracker import track_file
-                    track_file(output_path, "generate", "created", "Final document generated")
-                    
-                    return output_path
-                else:
-                    raise FileNotFoundError("Output file was not created")
-                
-            except Exception as render_error:
-                print(f"Document generation error: {render_error}")
-                raise
+        Returns:
+            str: Path to the generated document
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        try:
+            # Outputs link into the render cache, so keep them bounded as well
+            maybe_sweep_outputs(OUTPUTS_DIR)
+            context = self.build_context(json_path, projects_data)
+            
+            base_name = Path(json_path).stem
+            if base_name.endswith('_enriched'):
+                base_name = base_name[:-9]
+            docx_path = self._write_docx(context, os.path.join(OUTPUTS_DIR, f"{base_name}_CV.docx"))
+            if output_format == 'docx':
+                return docx_path
+            return export_document(docx_path, output_format, enable_render_cache=self.render_cache is not None)
                 
         except Exception as e:
             print(f"\n=== ERROR SUMMARY ===")
@@ -746,7 +783,49 @@ class DocGenerator:
             traceback.print_exc()
             raise
 
-def generate_cv_document(json_path: str, template_path: str, projects_data: Optional[Dict] = None, enable_spell_check: bool = ENABLE_SPELL_CHECK) -> str:
+def export_document(docx_path: str, output_format: str, enable_render_cache: bool = ENABLE_RENDER_CACHE) -> str:
+    """
+    Convert a rendered .docx to output_format with the warm office pool, writing it next to the .docx.
+    With the render cache on, conversions are cached under the .docx content, so a document
+    served from the cache is not converted again.
+    
+    Args:
+        docx_path: The rendered .docx, e.g. from generate_cv_document
+        output_format: One of OUTPUT_FORMATS other than docx
+        enable_render_cache: Whether to reuse and store conversions in the render cache
+        
+    Returns:
+        str: Path to the converted document
+    """
+    from file_tracker import track_file
+    
+    output_path = f"{os.path.splitext(docx_path)[0]}.{output_format}"
+    print(f"Converting document to {output_format}: {output_path}")
+    pool = get_office_pool()
+    if enable_render_cache:
+        render_cache = get_render_cache()
+        cache_key = export_key(docx_path, output_format)
+        cached_path = render_cache.get(cache_key)
+        if cached_path is None:
+            tmp_path = render_cache.new_temp_path()
+            try:
+                pool.convert(docx_path, tmp_path, output_format)
+                cached_path = render_cache.put(cache_key, tmp_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        link_or_copy(str(cached_path), output_path)
+        render_cache.bind_name(os.path.basename(output_path), cache_key)
+    else:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        pool.convert(docx_path, output_path, output_format)
+    
+    track_file(output_path, "generate", "created", f"Final document exported as {output_format}")
+    return output_path
+
+def generate_cv_document(json_path: str, template_path: str, projects_data: Optional[Dict] = None, enable_spell_check: bool = ENABLE_SPELL_CHECK,
+                         output_format: str = 'docx') -> str:
     """
     Standalone wrapper for generating a CV document.
     
@@ -755,12 +834,13 @@ def generate_cv_document(json_path: str, template_path: str, projects_data: Opti
         template_path: Path to the template file
         projects_data: Optional dictionary containing additional project data
         enable_spell_check: Whether to enable spell checking (default: False)
+        output_format: 'docx' (default) or 'pdf'
         
     Returns:
         str: Path to the generated document
     """
     generator = DocGenerator(template_path, enable_spell_check=enable_spell_check)
-    return generator.generate_cv_document(json_path, projects_data)
+    return generator.generate_cv_document(json_path, projects_data, output_format)
 
 if __name__ == "__main__":
     # Example usage:
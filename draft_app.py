@@ -1,31 +1,68 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template, send_file
+from flask import Flask, Request, Response, request, jsonify, render_template, stream_with_context
 import os
 from pathlib import Path
 from werkzeug.utils import secure_filename
-from firebase_utils import FirebaseConfig
-from validators import validate_json
-from cv_parser import CVParser, send_to_cv_parser
-from claude_utils import generate_blurb_with_claude
-from doc_generator import DocGenerator
-from location_service import LocationService
-from d_projects_to_enriched import ProjectExtractor
-from direct_download import save_output_to_downloads
-from datetime import timedelta
 from file_tracker import track_file, print_summary
 from logger import log_info, log_error, log_warning
-import tempfile
+from singleflight import SingleFlight
+from upload_store import create_job_dir, save_upload_stream, spooled_buffer, read_upload_head, ValidatingSpool
+from security import SecurityConfig, SecurityError
+from feedback import ProcessingStatus, create_job_feedback, get_job_feedback, get_job_version
+from eta_estimator import get_stage_estimator, file_type_of
+from pipeline_executor import get_pipeline_executor
+from cv_pipeline import process_cv_pipeline
+from batch_upload import BatchItem, BATCH_MAX_BYTES, extract_zip, save_files, stream_batch_results
+from render_cache import get_render_cache
+from file_delivery import send_download
+from parser_timeouts import get_parser_latency_model
+from archive_queue import get_archive_queue
 import shutil
 import json
 import time
-from typing import Dict, Any, Tuple, Optional
+import threading
+from typing import Dict, Optional
+
+class SpooledUploadRequest(Request):
+    """
+    Request that buffers uploaded files in memory so they are written to disk only once.
+    The buffer enforces the size limit and checks the file's magic bytes as the body arrives.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.path == BATCH_UPLOAD_PATH:
+            # Batch files are validated one by one so a bad CV doesn't sink the whole batch
+            return ValidatingSpool(filename, max_bytes=BATCH_MAX_BYTES)
+        return spooled_buffer(filename)
+    
+    @property
+    def max_content_length(self):
+        if self.path == BATCH_UPLOAD_PATH:
+            return BATCH_MAX_BYTES
+        return super().max_content_length
 
 app = Flask(__name__)
-firebase_config = FirebaseConfig()
+app.request_class = SpooledUploadRequest
+
+# Identical uploads that arrive while one is still processing share its result
+pipeline_flight = SingleFlight()
+
+# Content hash -> job id of the background job currently processing those bytes
+_active_jobs: Dict[str, str] = {}
+_active_jobs_lock = threading.Lock()
+
+BATCH_UPLOAD_PATH = '/upload/batch'
+
+# Server-Sent Events timing
+SSE_POLL_INTERVAL = 0.5
+SSE_HEARTBEAT_INTERVAL = 15
 
 # Create required directories
 for path in ['uploads', 'parsed_jsons', 'outputs']:
     Path(path).mkdir(exist_ok=True)
 
+# Upload artefacts a previous run queued but didn't archive
+get_archive_queue().resume()
+
 # Configure upload folder and allowed extensions
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
@@ -45,7 +82,6 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file_route():
-    temp_file = None
     try:
         if 'file' not in request.files:
             log_warning("No file part in the request")
@@ -60,219 +96,218 @@ def upload_file_route():
             log_warning(f"File type not allowed: {file.filename}")
             return jsonify({"success": False, "message": "File type not allowed. Please upload a PDF or DOCX file."})
         
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        file.save(temp_file.name)
-        
-        # Check file size
-        file_size = os.path.getsize(temp_file.name)
-        if file_size > app.config['MAX_CONTENT_LENGTH']:
-            return jsonify({"success": False, "message": "File too large. Maximum size is 16MB."})
+        # Validate name, declared size and magic bytes before anything is written
+        filename = secure_filename(file.filename)
+        validation = SecurityConfig.validate_file(filename, request.content_length or 0)
+        if validation["valid"]:
+            validation = SecurityConfig.validate_file_head(filename, read_upload_head(file.stream))
+        if not validation["valid"]:
+            log_warning(f"Upload rejected: {file.filename} - {validation['message']}")
+            return jsonify({"success": False, "message": validation["message"]})
         
-        log_info(f"Processing file: {file.filename} (Size: {file_size/1024/1024:.2f}MB)")
+        # Stream the upload once into its own job directory, hashing as it is written
+        job_id, job_dir = create_job_dir(app.config['UPLOAD_FOLDER'])
+        file_path = os.path.join(job_dir, filename)
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        log_info(f"Saving uploaded file: {filename} (job {job_id})")
+        try:
+            file_size, content_hash = save_upload_stream(file.stream, file_path, app.config['MAX_CONTENT_LENGTH'])
+        except SecurityError:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
         
-        log_info(f"Saving uploaded file: {filename}")
-        shutil.copy2(temp_file.name, file_path)
+        log_info(f"Processing file: {file.filename} (Size: {file_size/1024/1024:.2f}MB)")
         track_file(file_path, "upload", "saved", "File uploaded by user")
 
-        # Process the file
-        log_info(f"Processing file: {filename}")
-        response = process_cv_pipeline(file_path, filename)
+        # Clients that can't consume the progress stream may wait for the result
+        if request.args.get('wait'):
+            log_info(f"Processing file: {filename}")
+            response, is_leader = pipeline_flight.do(content_hash, process_cv_pipeline, file_path, filename, content_hash)
+            if not is_leader:
+                # Another request's copy was processed; this one was never read
+                log_info(f"Pipeline result for {filename} taken from a concurrent identical upload")
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return jsonify(response)
         
-        return jsonify(response)
+        # Otherwise process in the background and let the client follow progress over SSE
+        started_job_id = start_pipeline_job(job_id, file_path, filename, content_hash, file_size)
+        if started_job_id != job_id:
+            # Joined an identical job already in flight, which works from its own copy
+            shutil.rmtree(job_dir, ignore_errors=True)
+            job_id = started_job_id
+        estimate = get_stage_estimator().predict_job_seconds(
+            [(key, stage.estimated_time) for key, stage in ProcessingStatus.STAGES.items()],
+            file_type_of(filename), file_size
+        )
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "estimated_seconds": round(estimate['p50'], 1),
+            "progress_url": f"/progress/{job_id}",
+            "status_url": f"/status/{job_id}"
+        }), 202
+
+    except SecurityError as e:
+        log_warning(f"Upload rejected: {str(e)}")
+        return jsonify({"success": False, "message": str(e)})
 
     except Exception as e:
         log_error(f"Error processing file: {str(e)}")
         return jsonify({"success": False, "message": "An error occurred while processing the file."})
-    
-    finally:
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file.name):
-            try:
-                os.unlink(temp_file.name)
-            except Exception as e:
-                log_error(f"Error cleaning up temporary file: {str(e)}")
 
-def retry_firebase_upload(file_path: str, filename: str) -> Optional[str]:
+@app.route(BATCH_UPLOAD_PATH, methods=['POST'])
+def upload_batch_route():
     """
-    Retry Firebase upload with specific timing requirements.
-    Returns firebase_path or None if all retries fail
+    Process a pack of CVs, sent as a zip ('file') or a multipart list ('files').
+    Streams back a zip of the generated documents plus manifest.json with a result per file.
     """
-    max_retries = 3
-    base_wait = 5  # Base wait time in seconds
-    
-    for attempt in range(max_retries):
-        try:
-            log_info(f"Firebase upload attempt {attempt + 1} for {filename}")
-            firebase_path = firebase_config.upload_file(file_path, filename)
-            
-            if firebase_path:
-                log_info(f"Firebase upload successful on attempt {attempt + 1}, path: {firebase_path}")
-                return firebase_path
-                
-            # More detailed logging for failed attempts
-            log_warning(f"Firebase upload attempt {attempt + 1} failed - No path returned for file: {filename}")
-            
-        except Exception as e:
-            log_error(f"Firebase upload error on attempt {attempt + 1} for {filename}", e)
-        
-        # Don't wait after the last attempt
-        if attempt < max_retries - 1:
-            wait_time = base_wait + (attempt * 1) if attempt > 0 else base_wait
-            log_info(f"Waiting {wait_time} seconds before retry attempt {attempt + 2} for {filename}...")
-            time.sleep(wait_time)
-        else:
-            log_error(f"Firebase upload failed after all {max_retries} attempts for {filename}")
-    
-    return None
-
-def process_cv_pipeline(file_path: str, filename: str) -> dict:
-    """Process the CV through the complete pipeline with error handling."""
     try:
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        log_info(f"Starting CV pipeline for: {filename} (base name: {base_name})")
-        track_file(file_path, "pipeline", "starting", f"Processing CV: {base_name}")
-        
-        # Stage 1 - Upload to Firebase with retries
-        log_info(f"Stage 1 - Uploading {filename} to Firebase")
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-        temp_file.close()
-        
-        shutil.copy2(file_path, temp_file.name)
-        firebase_path = retry_firebase_upload(temp_file.name, f"{base_name}.docx")
-        
-        if not firebase_path:
-            log_error(f"Firebase upload failed completely for {filename}")
-            return {
-                "success": False,
-                "message": "Sorry, we're having some issues connecting to our cloud storage, please wait a couple of minutes and try again. If issues persist beyond this point, wait 15 minutes before trying again as Google is clearly having some issues :).",
-                "status": "error"
-            }
-            
-        track_file(firebase_path, "firebase", "uploaded", "File uploaded to Firebase")
-        log_info(f"Firebase upload completed successfully for {filename}")
+        batch_id, batch_dir = create_job_dir(app.config['UPLOAD_FOLDER'])
+        try:
+            files = request.files.getlist('files')
+            if files:
+                items = save_files(files, batch_dir)
+            elif 'file' in request.files and request.files['file'].filename.lower().endswith('.zip'):
+                items = extract_zip(request.files['file'].stream, batch_dir)
+            else:
+                shutil.rmtree(batch_dir, ignore_errors=True)
+                return jsonify({"success": False, "message": "Upload a zip file or a list of CV files."}), 400
+        except SecurityError:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            raise
         
-        # Stage 2 - Parse CV
-        log_info(f"Stage 2 - Parsing CV for {filename}")
-        cv_parser = CVParser()
-        parsed_result = cv_parser.send_to_cv_parser(firebase_path)
+        if not items:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({"success": False, "message": "No CV files found in the batch."}), 400
         
-        # If parsing failed, it might be due to timeout
-        if not parsed_result:
-            log_warning(f"CV parsing failed for {filename} - Complex file structure detected")
-            return {
-                "success": False,
-                "message": "Complex file structure found, please save this resume as a PDF then upload again, this should solve the problem.",
-                "status": "warning",  # Indicates it's a warning, not a critical error
-                "retry_as_pdf": True
-            }
-            
-        # Get the path where the parsed data was saved
-        parsed_json_path = parsed_result.get('path')
-        if not parsed_json_path:
-            log_error(f"No parsed JSON path returned for {filename}")
-            raise Exception("No path returned from CV parser")
+        log_info(f"Batch {batch_id}: {len(items)} file(s) received")
+        for item in items:
+            if item.file_path:
+                track_file(item.file_path, "upload", "saved", f"File uploaded in batch {batch_id}")
         
-        log_info(f"CV parsing completed successfully for {filename}")
+        def process_item(item: BatchItem) -> dict:
+            response, _ = pipeline_flight.do(item.content_hash, process_cv_pipeline, item.file_path, item.name, item.content_hash)
+            return response
         
-        # Stage 3 - Generate blurb
-        log_info(f"Stage 3 - Generating blurb for {filename}")
-        enriched_json_result = generate_blurb_with_claude(parsed_json_path)
+        return Response(
+            stream_with_context(stream_batch_results(items, process_item, get_pipeline_executor(), app.config['OUTPUT_FOLDER'])),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="cv_batch_{batch_id}.zip"'}
+        )
 
-        # Check if the blurb generation was successful
-        if isinstance(enriched_json_result, dict):
-            enriched_json_path = enriched_json_result.get('path', '')
-            if not enriched_json_path:
-                # Check for a specific error message
-                if enriched_json_result.get('status') == 'error':
-                    log_error(f"Failed to generate blurb for {filename}: {enriched_json_result.get('message')}")
-                    return enriched_json_result  # Return the error message directly
-                else:
-                    log_error(f"Failed to generate blurb for {filename}")
-                    raise Exception("Failed to generate blurb")
-        else:
-            enriched_json_path = enriched_json_result
+    except SecurityError as e:
+        log_warning(f"Batch upload rejected: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 400
 
-        track_file(enriched_json_path, "blurb", "generated", "Blurb generated and added to JSON")
-        log_info(f"Blurb generation completed for {filename}")
-        
-        # Stage 4 - Classify locations
-        log_info(f"Stage 4 - Classifying locations for {filename}")
-        location_service = LocationService()
-        with open(enriched_json_path, 'r') as file:
-            enriched_data = json.load(file)
-        enriched_data = location_service.enrich_experience_locations(enriched_data)
-        log_info(f"Location classification completed for {filename}")
-        
-        # Stage 5 - Save enriched JSON
-        log_info(f"Stage 5 - Saving enriched JSON for {filename}")
-        enriched_json_path = os.path.join('parsed_jsons', f"{base_name}_enriched.json")
-        with open(enriched_json_path, 'w') as file:
-            json.dump(enriched_data, file, indent=4)
-        track_file(enriched_json_path, "enrich", "saved", "Enriched JSON saved")
-        log_info(f"Enriched JSON saved successfully for {filename}")
-        
-        # Stage 6 - Generate document
-        log_info(f"Stage 6 - Generating document for {filename}")
-        template_path = '/Users/claytonbadland/flask_project/templates/Current_template.docx'
-        generator = DocGenerator(template_path)
-        output_path = generator.generate_cv_document(enriched_json_path)
-        if not output_path:
-            log_error(f"Failed to generate CV document for {filename}")
-            raise Exception("Failed to generate CV document")
-        
-        # Final step: Save document to Downloads folder
-        log_info(f"Saving document to Downloads folder for {filename}")
-        if os.path.exists(output_path):
-            download_path = save_output_to_downloads(output_path)
-            if not download_path:
-                log_error(f"Failed to save file to Downloads folder for {filename}")
-                raise Exception("Failed to save file to Downloads folder")
-            track_file(download_path, "download", "saved", "File saved to Downloads folder")
-            download_url = f"/download/{os.path.basename(output_path)}"
-            log_info(f"File saved successfully to Downloads folder for {filename}")
-        else:
-            log_error(f"Generated file not found at {output_path} for {filename}")
-            raise FileNotFoundError(f"Generated file not found at {output_path}")
-
-        log_info(f"CV processing completed successfully for: {filename}")
-        return {
-            'success': True,
-            'message': f'CV processed successfully: {filename}',
-            'download_file': os.path.basename(output_path),
-            'download_url': download_url
-        }
-        
     except Exception as e:
-        log_error(f"Error processing CV: {filename}", e)
-        return {
-            "success": False,
-            "message": f"Error processing CV: {str(e)}",
-            "status": "error"  # Indicates it's a critical error
-        }
+        log_error(f"Error processing batch upload: {str(e)}")
+        return jsonify({"success": False, "message": "An error occurred while processing the batch."}), 500
+
+def start_pipeline_job(job_id: str, file_path: str, filename: str, content_hash: str,
+                       file_size: Optional[int] = None) -> str:
+    """
+    Run the pipeline for an upload on a background thread.
+    If the same bytes are already being processed, the existing job id is returned instead.
+    """
+    with _active_jobs_lock:
+        existing_job_id = _active_jobs.get(content_hash)
+        if existing_job_id:
+            log_info(f"Upload {filename} joined in-flight job {existing_job_id}")
+            return existing_job_id
+        _active_jobs[content_hash] = job_id
+    
+    feedback = create_job_feedback(job_id, filename, file_size)
+    
+    def run():
+        try:
+            response, is_leader = pipeline_flight.do(content_hash, process_cv_pipeline, file_path, filename, content_hash, feedback)
+            if not is_leader:
+                # A waiting request was already processing its own copy of these bytes
+                shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+        except Exception as e:
+            log_error(f"Background job {job_id} failed", e)
+            response = {"success": False, "message": "An error occurred while processing the file.", "status": "error"}
+        finally:
+            with _active_jobs_lock:
+                _active_jobs.pop(content_hash, None)
+        feedback.finish(response)
+    
+    threading.Thread(target=run, name=f"pipeline-{job_id}", daemon=True).start()
+    return job_id
+
+@app.route('/progress/<job_id>')
+def progress_stream(job_id):
+    """Stream stage transitions and progress for a job as Server-Sent Events."""
+    if get_job_feedback(job_id) is None:
+        return jsonify({"success": False, "message": "Unknown job."}), 404
+    
+    def events():
+        last_version = None
+        last_sent = time.time()
+        while True:
+            # The job may be running in another worker; only load its state when the version moves
+            version = get_job_version(job_id)
+            if version is None:
+                yield "event: error\ndata: {\"message\": \"Job expired.\"}\n\n"
+                return
+            # The state may not be readable yet; try again after the poll interval
+            feedback = get_job_feedback(job_id) if version != last_version else None
+            if feedback is not None:
+                status = feedback.get_status()
+                last_version = status['version']
+                last_sent = time.time()
+                yield f"event: progress\ndata: {json.dumps(status)}\n\n"
+                if status['done']:
+                    yield f"event: complete\ndata: {json.dumps(status['result'])}\n\n"
+                    return
+            if time.time() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            time.sleep(SSE_POLL_INTERVAL)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    """Return the current status of a job as JSON."""
+    feedback = get_job_feedback(job_id)
+    if feedback is None:
+        return jsonify({"success": False, "message": "Unknown job."}), 404
+    return jsonify(feedback.get_status())
+
+@app.route('/stats/parser')
+def parser_stats():
+    """Return the parser latency model: per-document-class latencies, timeout rates and chosen timeouts."""
+    return jsonify(get_parser_latency_model().stats())
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Serve the file for download with error handling."""
+    """Serve the file for download with ETag validation and range support."""
     try:
         log_info(f"Initiating download request for: {filename}")
+        
+        # Rendered documents are served straight from the render cache, tagged with their content hash
+        cached = get_render_cache().lookup_name(filename)
+        if cached:
+            cached_path, etag = cached
+            log_info(f"Serving {filename} from render cache")
+            return send_download(str(cached_path), filename, etag=etag)
+        
         file_path = os.path.join(app.root_path, 'outputs', filename)
         
-        if not os.path.exists(file_path):
+        if os.path.basename(filename) != filename or not os.path.isfile(file_path):
             log_warning(f"Download failed - File not found: {filename}")
-            raise FileNotFoundError(f"File not found: {filename}")
+            return jsonify({
+                "success": False,
+                "message": "File not found."
+            }), 404
             
         log_info(f"File found, initiating download: {filename}")
-        result = send_from_directory(
-            os.path.join(app.root_path, 'outputs'),
-            filename, 
-            as_attachment=True
-        )
-        log_info(f"Download completed successfully: {filename}")
-        return result
+        return send_download(file_path, filename)
         
     except Exception as e:
         log_error(f"Error downloading file: {filename}", e)
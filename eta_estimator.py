@@ -0,0 +1,238 @@
+"""
+Learned stage durations for pipeline ETAs.
+
+Every completed stage records how long it took, keyed by stage, file type and a
+coarse file-size bucket. Estimates are percentiles over the most recent samples
+for the most specific key that has enough of them, falling back to broader keys
+and finally to the defaults in ProcessingStatus.STAGES. Samples are kept in
+SQLite so all worker processes learn from each other.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Iterable
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config.env')
+
+ETA_STORE_PATH = os.environ.get("ETA_STORE_PATH", "data/stage_durations.db")
+ETA_SAMPLES_PER_KEY = int(os.getenv("ETA_SAMPLES_PER_KEY", "200"))
+ETA_MIN_SAMPLES = int(os.getenv("ETA_MIN_SAMPLES", "5"))
+
+# Seconds between reloads of the sample cache from the shared database
+REFRESH_INTERVAL_SECONDS = 30
+
+# Upper bounds of the file-size buckets, in bytes
+SIZE_BUCKETS = (256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+def size_bucket(file_size: Optional[int]) -> str:
+    """Map a file size to a coarse bucket label."""
+    if file_size is None:
+        return 'unknown'
+    for i, limit in enumerate(SIZE_BUCKETS):
+        if file_size <= limit:
+            return f"b{i}"
+    return f"b{len(SIZE_BUCKETS)}"
+
+def file_type_of(filename: Optional[str]) -> str:
+    """Normalised extension used to condition estimates."""
+    if not filename or '.' not in filename:
+        return 'unknown'
+    return filename.rsplit('.', 1)[1].lower()
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+class StageDurationEstimator:
+    """Online estimator of stage durations conditioned on file type and size."""
+
+    def __init__(self, db_path: str = ETA_STORE_PATH, samples_per_key: int = ETA_SAMPLES_PER_KEY,
+                 min_samples: int = ETA_MIN_SAMPLES):
+        """
+        Args:
+            db_path: SQLite file shared by all worker processes
+            samples_per_key: Recent samples kept for each (stage, file type, size bucket)
+            min_samples: Samples needed before a key's estimate is trusted
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.samples_per_key = samples_per_key
+        self.min_samples = min_samples
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str, str], List[float]] = {}
+        self._loaded_at = 0.0
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS stage_durations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                size_bucket TEXT NOT NULL,
+                duration REAL NOT NULL,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_stage_durations_key ON stage_durations (stage, file_type, size_bucket, id)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the sample database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, stage: str, duration: float, file_type: str = 'unknown', file_size: Optional[int] = None) -> None:
+        """
+        Record a completed stage's duration.
+
+        Args:
+            stage: Stage key, as in ProcessingStatus.STAGES
+            duration: Seconds the stage took
+            file_type: Normalised file extension
+            file_size: Size of the uploaded file in bytes
+        """
+        bucket = size_bucket(file_size)
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO stage_durations (stage, file_type, size_bucket, duration, recorded_at) VALUES (?, ?, ?, ?, ?)",
+            (stage, file_type, bucket, duration, time.time())
+        )
+        conn.execute(
+            "DELETE FROM stage_durations WHERE stage = ? AND file_type = ? AND size_bucket = ? AND id NOT IN ("
+            "SELECT id FROM stage_durations WHERE stage = ? AND file_type = ? AND size_bucket = ? "
+            "ORDER BY id DESC LIMIT ?)",
+            (stage, file_type, bucket, stage, file_type, bucket, self.samples_per_key)
+        )
+        with self._lock:
+            samples = self._samples.setdefault((stage, file_type, bucket), [])
+            samples.append(duration)
+            del samples[:-self.samples_per_key]
+
+    def _refresh(self) -> None:
+        """Reload samples from the shared database if the cache is stale."""
+        if time.time() - self._loaded_at < REFRESH_INTERVAL_SECONDS:
+            return
+        rows = self._connect().execute(
+            "SELECT stage, file_type, size_bucket, duration FROM stage_durations ORDER BY id"
+        ).fetchall()
+        samples: Dict[Tuple[str, str, str], List[float]] = {}
+        for stage, file_type, bucket, duration in rows:
+            samples.setdefault((stage, file_type, bucket), []).append(duration)
+        with self._lock:
+            self._samples = samples
+            self._loaded_at = time.time()
+
+    def _samples_for(self, stage: str, file_type: str, bucket: str) -> List[float]:
+        """Sorted samples for the most specific key with enough data, else an empty list."""
+        self._refresh()
+        with self._lock:
+            exact = self._samples.get((stage, file_type, bucket), [])
+            if len(exact) >= self.min_samples:
+                return sorted(exact)
+            by_type = [d for (s, t, _), values in self._samples.items() if s == stage and t == file_type for d in values]
+            if len(by_type) >= self.min_samples:
+                return sorted(by_type)
+            by_stage = [d for (s, _, _), values in self._samples.items() if s == stage for d in values]
+            if len(by_stage) >= self.min_samples:
+                return sorted(by_stage)
+        return []
+
+    def estimate(self, stage: str, default: float, file_type: str = 'unknown', file_size: Optional[int] = None,
+                 elapsed: float = 0.0) -> Dict[str, float]:
+        """
+        Estimate the remaining time for a stage.
+
+        Args:
+            stage: Stage key
+            default: Fallback duration when there is not enough history
+            file_type: Normalised file extension
+            file_size: Size of the uploaded file in bytes
+            elapsed: Seconds the stage has already been running
+
+        Returns:
+            Dict with remaining-time percentiles 'p50' and 'p90', and 'samples' used
+        """
+        samples = self._samples_for(stage, file_type, size_bucket(file_size))
+        if not samples:
+            return {'p50': max(default - elapsed, 0.0), 'p90': max(default * 1.5 - elapsed, 0.0), 'samples': 0}
+        if elapsed > 0:
+            # Condition on the stage having already run this long
+            longer = [d for d in samples if d > elapsed]
+            if not longer:
+                return {'p50': 0.0, 'p90': 0.0, 'samples': len(samples)}
+            samples = longer
+        return {
+            'p50': percentile(samples, 0.5) - elapsed,
+            'p90': percentile(samples, 0.9) - elapsed,
+            'samples': len(samples)
+        }
+
+    def predict_job_seconds(self, stages: Iterable[Tuple[str, float]], file_type: str = 'unknown',
+                            file_size: Optional[int] = None) -> Dict[str, float]:
+        """
+        Predict the total duration of a job that has not started.
+
+        Args:
+            stages: (stage key, default duration) pairs for the stages the job will run
+            file_type: Normalised file extension
+            file_size: Size of the uploaded file in bytes
+
+        Returns:
+            Dict with summed 'p50' and 'p90' seconds (p90 is a conservative sum of per-stage p90s)
+        """
+        total = {'p50': 0.0, 'p90': 0.0}
+        for stage, default in stages:
+            estimate = self.estimate(stage, default, file_type, file_size)
+            total['p50'] += estimate['p50']
+            total['p90'] += estimate['p90']
+        return total
+
+def predict_queue_wait(running_remaining: List[float], queued: List[float], slots: int) -> float:
+    """
+    Predict how long a newly admitted job waits for a free slot.
+
+    Jobs are assigned to whichever slot frees first, in queue order.
+
+    Args:
+        running_remaining: Expected remaining seconds of each running job
+        queued: Expected durations of jobs already waiting, in queue order
+        slots: Number of jobs that run concurrently
+
+    Returns:
+        Expected seconds until the new job starts
+    """
+    if slots <= 0:
+        return float('inf')
+    running = sorted(running_remaining)
+    free_at = running[:slots] + [0.0] * max(slots - len(running), 0)
+    for duration in running[slots:] + list(queued):
+        free_at.sort()
+        free_at[0] += duration
+    return min(free_at)
+
+_estimator: Optional[StageDurationEstimator] = None
+_estimator_lock = threading.Lock()
+
+def get_stage_estimator() -> StageDurationEstimator:
+    """Return the process-wide stage duration estimator, creating it on first use."""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                _estimator = StageDurationEstimator()
+    return _estimator
@@ -3,6 +3,8 @@ from enum import Enum
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from job_store import get_job_store
+from eta_estimator import get_stage_estimator, file_type_of
 
 class FeedbackType(Enum):
     """Types of feedback messages"""
@@ -31,11 +33,13 @@ class ProcessingStatus:
         'generate': ProcessingStage('Generate', 'Generating final document', 10, 6),
     }
 
-    def __init__(self):
+    def __init__(self, file_type: str = 'unknown', file_size: Optional[int] = None):
         self.current_stage = None
         self.start_time = None
         self.stage_progress = {}
         self.messages = []
+        self.file_type = file_type  # Conditions the learned stage durations
+        self.file_size = file_size
 
     def start_stage(self, stage_name: str):
         """Start tracking a new processing stage"""
@@ -51,10 +55,59 @@ class ProcessingStatus:
     def complete_stage(self, stage_name: str, success: bool = True):
         """Mark a stage as completed"""
         if stage_name in self.stage_progress:
+            completion_time = time.time()
             self.stage_progress[stage_name].update({
                 'status': 'completed' if success else 'failed',
-                'completion_time': time.time()
+                'completion_time': completion_time
             })
+            if success:
+                duration = completion_time - self.stage_progress[stage_name]['start_time']
+                try:
+                    get_stage_estimator().record(stage_name, duration, self.file_type, self.file_size)
+                except Exception as e:
+                    print(f"Could not record duration for stage {stage_name}: {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialise the tracked state for the job status store"""
+        return {
+            'current_stage': self.current_stage,
+            'start_time': self.start_time,
+            'stage_progress': self.stage_progress,
+            'file_type': self.file_type,
+            'file_size': self.file_size
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ProcessingStatus':
+        """Rebuild a status from to_dict() output"""
+        status = cls(data.get('file_type', 'unknown'), data.get('file_size'))
+        status.current_stage = data.get('current_stage')
+        status.start_time = data.get('start_time')
+        status.stage_progress = data.get('stage_progress', {})
+        return status
+
+    def estimate_remaining(self) -> Dict[str, Any]:
+        """
+        Estimate the time left for this job from learned stage durations.
+
+        Returns:
+            Dict with 'stages' (remaining p50/p90 seconds per unfinished stage)
+            and totals 'p50' and 'p90' across them
+        """
+        estimator = get_stage_estimator()
+        now = time.time()
+        stages = {}
+        for key, stage in self.STAGES.items():
+            progress = self.stage_progress.get(key)
+            if progress and progress['status'] != 'in_progress':
+                continue
+            elapsed = now - progress['start_time'] if progress else 0.0
+            stages[key] = estimator.estimate(key, stage.estimated_time, self.file_type, self.file_size, elapsed)
+        return {
+            'stages': stages,
+            'p50': sum(estimate['p50'] for estimate in stages.values()),
+            'p90': sum(estimate['p90'] for estimate in stages.values())
+        }
 
     def get_progress(self) -> Dict[str, Any]:
         """Get the current processing progress"""
@@ -63,26 +116,47 @@ class ProcessingStatus:
                              if stage['status'] == 'completed')
         
         current_stage_info = self.STAGES.get(self.current_stage, None)
+        remaining = self.estimate_remaining()
+        
+        # Weight progress by time: elapsed time against elapsed plus the expected remainder
+        elapsed = sum(
+            (stage['completion_time'] or time.time()) - stage['start_time']
+            for stage in self.stage_progress.values()
+        )
+        expected_total = elapsed + remaining['p50']
+        current_estimate = remaining['stages'].get(self.current_stage)
         
         return {
             'total_stages': total_stages,
             'completed_stages': completed_stages,
-            'progress_percentage': (completed_stages / total_stages) * 100,
+            'progress_percentage': (elapsed / expected_total) * 100 if expected_total else 100.0,
             'current_stage': {
                 'name': current_stage_info.name if current_stage_info else None,
                 'description': current_stage_info.description if current_stage_info else None,
-                'estimated_time': current_stage_info.estimated_time if current_stage_info else None
+                'estimated_time': round(current_estimate['p50'], 1) if current_estimate else 0
             } if self.current_stage else None,
+            'eta': {
+                'remaining_seconds': round(remaining['p50'], 1),
+                'remaining_p90_seconds': round(remaining['p90'], 1),
+                'elapsed_seconds': round(elapsed, 1)
+            },
             'stage_details': self.stage_progress
         }
 
 class FeedbackManager:
     """Manages user feedback and progress updates"""
     
-    def __init__(self):
+    # Messages kept with a job's state in the shared store
+    STORED_MESSAGES = 20
+    
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
         self.processing_status = ProcessingStatus()
         self.messages = []
         self._max_messages = 100  # Prevent memory issues with too many messages
+        self.version = 0  # Incremented on every change so watchers can detect updates
+        self.result = None  # Final pipeline response once the job is done
+        self.has_error = False
 
     def add_message(self, message: str, msg_type: FeedbackType, details: Optional[Dict] = None):
         """Add a new feedback message"""
@@ -96,16 +170,51 @@ class FeedbackManager:
         }
         
         self.messages.append(message_data)
+        if msg_type == FeedbackType.ERROR:
+            self.has_error = True
         
         # Maintain message limit
         if len(self.messages) > self._max_messages:
             self.messages = self.messages[-self._max_messages:]
         
+        self.version += 1
+        self._persist()
         return message_data
 
-    def start_processing(self, filename: str):
+    def _persist(self):
+        """Publish this job's state so any worker process can report on it"""
+        if self.job_id is None:
+            return
+        try:
+            get_job_store().save(self.job_id, self.to_dict(), self.version)
+        except Exception as e:
+            print(f"Could not store status for job {self.job_id}: {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialise the job's state, keeping only the most recent messages"""
+        return {
+            'job_id': self.job_id,
+            'version': self.version,
+            'result': self.result,
+            'processing_status': self.processing_status.to_dict(),
+            'messages': self.messages[-self.STORED_MESSAGES:],
+            'has_error': self.has_error
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FeedbackManager':
+        """Rebuild a read-only snapshot of a job from to_dict() output"""
+        manager = cls(data.get('job_id'))
+        manager.version = data.get('version', 0)
+        manager.result = data.get('result')
+        manager.processing_status = ProcessingStatus.from_dict(data.get('processing_status', {}))
+        manager.messages = data.get('messages', [])
+        manager.has_error = data.get('has_error', False)
+        return manager
+
+    def start_processing(self, filename: str, file_size: Optional[int] = None):
         """Initialize processing tracking for a new file"""
-        self.processing_status = ProcessingStatus()
+        self.processing_status = ProcessingStatus(file_type_of(filename), file_size)
         self.add_message(
             f"Starting CV processing for: {filename}",
             FeedbackType.INFO,
@@ -137,12 +246,28 @@ class FeedbackManager:
                     {'stage': stage, 'status': status}
                 )
 
+    def finish(self, result: Dict[str, Any]):
+        """Record the final pipeline response and mark the job as done"""
+        self.result = result
+        current_stage = self.processing_status.current_stage
+        if not result.get('success') and current_stage:
+            if self.processing_status.stage_progress.get(current_stage, {}).get('status') == 'in_progress':
+                self.processing_status.complete_stage(current_stage, False)
+        if result.get('success'):
+            self.add_message(result.get('message', 'Processing complete'), FeedbackType.SUCCESS)
+        else:
+            self.add_message(result.get('message', 'Processing failed'), FeedbackType.ERROR)
+
     def get_status(self) -> Dict[str, Any]:
         """Get current processing status and messages"""
         return {
+            'job_id': self.job_id,
+            'version': self.version,
+            'done': self.result is not None,
+            'result': self.result,
             'progress': self.processing_status.get_progress(),
             'messages': self.messages[-10:],  # Return last 10 messages
-            'has_error': any(msg['type'] == 'error' for msg in self.messages)
+            'has_error': self.has_error
         }
 
     def format_error(self, error: Exception, stage: str) -> Dict[str, Any]:
@@ -170,4 +295,22 @@ class FeedbackManager:
         }
 
 # Global feedback manager instance
-feedback_manager = FeedbackManager() 
+feedback_manager = FeedbackManager()
+
+def create_job_feedback(job_id: str, filename: str, file_size: Optional[int] = None) -> FeedbackManager:
+    """Create the feedback manager for a new job; its state is published to the job status store"""
+    manager = FeedbackManager(job_id)
+    manager.start_processing(filename, file_size)
+    return manager
+
+def get_job_feedback(job_id: str) -> Optional[FeedbackManager]:
+    """
+    Load a snapshot of a job's feedback from the job status store.
+    Works for jobs running in any worker process; returns None for unknown or expired jobs.
+    """
+    data = get_job_store().load(job_id)
+    return FeedbackManager.from_dict(data) if data else None
+
+def get_job_version(job_id: str) -> Optional[int]:
+    """Return a job's current status version without loading it, or None if unknown or expired"""
+    return get_job_store().version(job_id)
@@ -0,0 +1,111 @@
+"""
+HTTP delivery of generated documents.
+
+Responses carry a strong ETag derived from the file's SHA-256, so a browser that
+already has the document gets a 304. Served directly, Werkzeug also handles
+If-Range and byte ranges (206), which lets interrupted downloads resume.
+
+With DOWNLOAD_OFFLOAD set, the conditional check still happens here but the body
+is handed to the fronting proxy. Use x-sendfile (Apache mod_xsendfile,
+lighttpd) or x-accel-redirect (nginx, with an internal location at
+X_ACCEL_REDIRECT_PREFIX aliased to DOWNLOAD_ROOT). Large files then no
+longer hold a Python worker, and the proxy handles ranges.
+"""
+
+import os
+import hashlib
+import mimetypes
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+from dotenv import load_dotenv
+from flask import Response, request, send_file
+from logger import log_info, log_warning
+
+# Load environment variables
+load_dotenv('config.env')
+
+DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "none").lower()  # none, x-sendfile or x-accel-redirect
+X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "/protected")
+DOWNLOAD_ROOT = os.path.abspath(os.getenv("DOWNLOAD_ROOT", "."))
+
+OFFLOAD_MODES = ('none', 'x-sendfile', 'x-accel-redirect')
+if DOWNLOAD_OFFLOAD not in OFFLOAD_MODES:
+    log_warning(f"Unknown DOWNLOAD_OFFLOAD '{DOWNLOAD_OFFLOAD}', serving downloads directly")
+    DOWNLOAD_OFFLOAD = 'none'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Path -> (inode, mtime_ns, size, sha256), so unchanged files are hashed once
+_etags: Dict[str, Tuple[int, int, int, str]] = {}
+_etags_lock = threading.Lock()
+
+def file_etag(path: str) -> str:
+    """SHA-256 of a file's content, recomputed only when the file changes."""
+    stat = os.stat(path)
+    with _etags_lock:
+        cached = _etags.get(path)
+        if cached and cached[:3] == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return cached[3]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    with _etags_lock:
+        _etags[path] = (stat.st_ino, stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+def _content_disposition(download_name: str) -> str:
+    """Attachment header that survives non-ASCII names, as send_file builds it."""
+    try:
+        download_name.encode('ascii')
+        return f'attachment; filename="{download_name}"'
+    except UnicodeEncodeError:
+        ascii_name = download_name.encode('ascii', 'ignore').decode('ascii') or 'download'
+        return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(download_name)}"
+
+def _offload_response(path: str, download_name: str, etag: str) -> Response:
+    """An empty response telling the proxy which file to send."""
+    response = Response(status=200, mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+    if DOWNLOAD_OFFLOAD == 'x-sendfile':
+        response.headers['X-Sendfile'] = path
+    else:
+        relative = os.path.relpath(path, DOWNLOAD_ROOT)
+        if relative.startswith('..'):
+            raise ValueError(f"{path} is outside DOWNLOAD_ROOT {DOWNLOAD_ROOT}")
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(relative)}"
+    response.headers['Content-Disposition'] = _content_disposition(download_name)
+    return response
+
+def send_download(path: str, download_name: str, etag: Optional[str] = None) -> Response:
+    """
+    Build the response for downloading a file as an attachment.
+
+    Args:
+        path: File to send
+        download_name: Filename offered to the browser
+        etag: Content hash of the file, if already known; computed otherwise
+
+    Returns:
+        A 200, 206 or 304 response, or an offload response for the proxy
+    """
+    path = os.path.abspath(path)
+    etag = etag or file_etag(path)
+
+    if DOWNLOAD_OFFLOAD == 'none':
+        # Werkzeug evaluates If-None-Match, If-Range and Range against the strong ETag
+        response = send_file(path, as_attachment=True, download_name=download_name, etag=etag, conditional=True)
+    elif request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+    else:
+        response = _offload_response(path, download_name, etag)
+        response.set_etag(etag)
+
+    # Revalidate on every use, so a re-rendered CV is never served stale but an unchanged one is a 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+    status = response.status_code
+    response.call_on_close(lambda: log_info(f"Download finished: {download_name} ({status})"))
+    return response
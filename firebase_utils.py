@@ -5,9 +5,112 @@ from firebase_admin import credentials, storage, firestore
 from pathlib import Path
 from typing import Optional, Dict, Any, Union
 from datetime import timedelta
+from collections import OrderedDict, deque
 import tempfile
+import threading
+import time
+import hashlib
+import mimetypes
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud.exceptions import NotFound
 from retry_utils import retry_with_backoff
 
+# Cache sizing and lifetimes
+BLOB_CACHE_MAX_ENTRIES = int(os.getenv("BLOB_CACHE_MAX_ENTRIES", "1024"))
+BLOB_METADATA_TTL_SECONDS = int(os.getenv("BLOB_METADATA_TTL_SECONDS", "300"))
+MISSING_BLOB_TTL_SECONDS = 30
+SIGNED_URL_LIFETIME = timedelta(hours=1)
+SIGNED_URL_REFRESH_MARGIN_SECONDS = 300  # Re-sign when less than this remains
+
+class _BoundedTTLCache:
+    """Thread-safe LRU cache whose entries also expire after a per-entry TTL."""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+# Chunked upload settings. GCS requires resumable chunk sizes in multiples of 256 KB.
+_CHUNK_ALIGNMENT = 256 * 1024
+UPLOAD_CHUNK_SIZE = max(_CHUNK_ALIGNMENT, int(float(os.getenv("UPLOAD_CHUNK_SIZE_MB", "2")) * 1024 * 1024) // _CHUNK_ALIGNMENT * _CHUNK_ALIGNMENT)
+PARALLEL_UPLOAD_THRESHOLD = int(float(os.getenv("PARALLEL_UPLOAD_THRESHOLD_MB", "8")) * 1024 * 1024)
+UPLOAD_PARALLELISM = int(os.getenv("UPLOAD_PARALLELISM", "4"))
+UPLOAD_PART_RETRIES = 3
+MAX_COMPOSE_SOURCES = 32  # GCS limit on objects combined in a single compose call
+
+# How long a failed upload's progress is kept for a retry to resume from.
+# GCS resumable sessions themselves expire after a week.
+UPLOAD_RESUME_TTL_SECONDS = int(os.getenv("UPLOAD_RESUME_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_RESUME_MAX_ENTRIES = 256
+
+# Progress of uploads that have not completed, keyed by upload id, so a retry in
+# this process resumes them: parts acknowledged by storage for composite uploads,
+# and resumable session URLs for single-object uploads
+_acknowledged_parts = _BoundedTTLCache(UPLOAD_RESUME_MAX_ENTRIES)
+_acknowledged_parts_lock = threading.Lock()
+_upload_sessions = _BoundedTTLCache(UPLOAD_RESUME_MAX_ENTRIES)
+
+# Recent per-upload throughput figures
+_upload_metrics = deque(maxlen=200)
+
+def _record_upload_metrics(blob_name: str, size: int, elapsed: float, parts: int = 1, resumed_parts: int = 0) -> None:
+    """Record throughput for one completed upload."""
+    throughput = size / elapsed if elapsed > 0 else 0.0
+    _upload_metrics.append({
+        'blob_name': blob_name,
+        'bytes': size,
+        'seconds': round(elapsed, 3),
+        'mb_per_second': round(throughput / (1024 * 1024), 3),
+        'parts': parts,
+        'resumed_parts': resumed_parts,
+        'completed_at': time.time()
+    })
+    print(f"Uploaded {blob_name}: {size} bytes in {elapsed:.2f}s ({throughput / (1024 * 1024):.2f} MB/s, {parts} part(s), {resumed_parts} resumed)")
+
+def get_upload_metrics() -> list:
+    """Return throughput figures for recent uploads, oldest first."""
+    return list(_upload_metrics)
+
+# Shared across FirebaseConfig instances, which are created per call in several places
+_blob_metadata_cache = _BoundedTTLCache(BLOB_CACHE_MAX_ENTRIES)
+_signed_url_cache = _BoundedTTLCache(BLOB_CACHE_MAX_ENTRIES)
+
+def _remember_blob(blob_name: str, exists: bool, size: Optional[int] = None, generation: Optional[int] = None) -> Dict[str, Any]:
+    """Record what we know about a blob; missing blobs are remembered only briefly."""
+    metadata = {'exists': exists, 'size': size, 'generation': generation}
+    ttl = BLOB_METADATA_TTL_SECONDS if exists else MISSING_BLOB_TTL_SECONDS
+    _blob_metadata_cache.set(blob_name, metadata, ttl)
+    return metadata
+
+def invalidate_blob_cache(blob_name: str) -> None:
+    """Forget cached metadata and signed URLs for a blob after it is written."""
+    _blob_metadata_cache.invalidate(blob_name)
+    _signed_url_cache.invalidate(blob_name)
+
 @retry_with_backoff(max_retries=3, initial_delay=1, exceptions_to_check=(Exception,))
 def upload_file(file_path: Optional[str] = None, 
                 destination_blob_name: str = None, 
@@ -85,22 +188,33 @@ class FirebaseConfig:
                 return None
 
             blob = self.bucket.blob(destination_blob_name)
+            invalidate_blob_cache(destination_blob_name)
+            started = time.time()
             
             # If in-memory data is provided, upload that
             if data is not None:
+                # In-memory data is small (JSON, generated documents) and is sent in one
+                # request; a failed upload is retried from the start
                 blob.upload_from_string(data)
                 print(f"Uploaded in-memory data as {destination_blob_name}")
+                _record_upload_metrics(destination_blob_name, len(data), time.time() - started)
             # Otherwise, if a file path is provided, upload from file
             elif file_path is not None:
-                blob.upload_from_filename(file_path)
+                file_size = os.path.getsize(file_path)
+                if file_size >= PARALLEL_UPLOAD_THRESHOLD:
+                    blob = self._upload_parallel_composite(file_path, destination_blob_name, file_size)
+                else:
+                    blob = self._upload_resumable(file_path, destination_blob_name, file_size)
                 print(f"File {file_path} uploaded as {destination_blob_name}")
             else:
                 print("Either file_path or data must be provided.")
                 return None
 
+            # The upload response carries the new object's metadata
+            _remember_blob(destination_blob_name, True, blob.size, blob.generation)
+            
             # Generate a signed URL that expires in 1 hour
-            signed_url = blob.generate_signed_url(expiration=timedelta(hours=1))
-            return signed_url
+            return self._signed_url(blob)
         
         except FileNotFoundError:
             print(f"File not found: {file_path}")
@@ -109,6 +223,224 @@ class FirebaseConfig:
             print(f"Upload error: {e}")
             return None
 
+    def _upload_resumable(self, file_path: str, destination_blob_name: str, file_size: int):
+        """
+        Upload a file through a GCS resumable session, in UPLOAD_CHUNK_SIZE chunks.
+        
+        The session URL is kept for UPLOAD_RESUME_TTL_SECONDS, so if this upload fails
+        and is retried for the same unchanged file, storage is asked how many bytes it
+        has confirmed and the upload continues from there.
+        
+        Args:
+            file_path: Local path to the file to upload
+            destination_blob_name: The name for the file in Firebase Storage
+            file_size: Size of the file in bytes
+            
+        Returns:
+            The uploaded blob, with its metadata loaded
+        """
+        started = time.time()
+        stat = os.stat(file_path)
+        upload_id = f"{destination_blob_name}:{file_size}:{stat.st_mtime_ns}"
+        content_type = mimetypes.guess_type(destination_blob_name)[0] or 'application/octet-stream'
+        
+        session_url = _upload_sessions.get(upload_id)
+        offset = self._confirmed_offset(session_url, file_size) if session_url else None
+        if offset is None:
+            session_url = self.bucket.blob(destination_blob_name).create_resumable_upload_session(
+                content_type=content_type, size=file_size)
+            _upload_sessions.set(upload_id, session_url, UPLOAD_RESUME_TTL_SECONDS)
+            offset = 0
+        resumed_bytes = offset
+        if resumed_bytes:
+            print(f"Resuming upload of {destination_blob_name} from byte {resumed_bytes}/{file_size}")
+        
+        with open(file_path, 'rb') as f:
+            while offset < file_size:
+                f.seek(offset)
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                end = offset + len(chunk) - 1
+                response = requests.put(session_url, data=chunk, timeout=120,
+                                        headers={'Content-Range': f"bytes {offset}-{end}/{file_size}"})
+                confirmed = self._range_end(response) if response.status_code == 308 else None
+                if response.status_code in (200, 201):
+                    offset = file_size
+                elif confirmed is not None and confirmed > offset:
+                    offset = confirmed
+                else:
+                    # The session stays cached so a retry resumes from the last confirmed byte
+                    raise Exception(f"Resumable upload of {destination_blob_name} failed at byte {offset}: "
+                                    f"{response.status_code} {response.text[:200]}")
+        
+        _upload_sessions.invalidate(upload_id)
+        blob = self.bucket.blob(destination_blob_name)
+        blob.reload()
+        _record_upload_metrics(destination_blob_name, file_size, time.time() - started,
+                               resumed_parts=1 if resumed_bytes else 0)
+        return blob
+
+    @staticmethod
+    def _range_end(response) -> Optional[int]:
+        """
+        Bytes confirmed by a 308 response to a resumable upload request.
+        
+        Returns:
+            The offset after the last stored byte, or None if the response has no
+            Range header, meaning storage holds none of the upload yet
+        """
+        confirmed = response.headers.get('Range')  # e.g. "bytes=0-1048575"
+        if not confirmed:
+            return None
+        return int(confirmed.rsplit('-', 1)[1]) + 1
+
+    def _confirmed_offset(self, session_url: str, file_size: int) -> Optional[int]:
+        """
+        Ask storage how much of a resumable upload it has received.
+        
+        Returns:
+            The offset to continue from, or None if the session has expired or can't be queried
+        """
+        try:
+            response = requests.put(session_url, timeout=30,
+                                    headers={'Content-Range': f"bytes */{file_size}", 'Content-Length': '0'})
+        except requests.RequestException as e:
+            print(f"Could not query upload session, starting over: {e}")
+            return None
+        if response.status_code == 308:
+            confirmed = self._range_end(response)
+            # Nothing stored yet: send the whole file, from the first byte to the end
+            return 0 if confirmed is None else confirmed
+        if response.status_code in (200, 201):
+            return file_size
+        return None
+
+    def _upload_parallel_composite(self, file_path: str, destination_blob_name: str, file_size: int):
+        """
+        Upload a large file as parts in parallel, then compose them into the destination blob.
+        
+        Parts acknowledged by storage are remembered, so if this upload fails and is
+        retried for the same unchanged file only the missing parts are sent again.
+        
+        Args:
+            file_path: Local path to the file to upload
+            destination_blob_name: The name for the combined file in Firebase Storage
+            file_size: Size of the file in bytes
+            
+        Returns:
+            The composed destination blob
+        """
+        started = time.time()
+        
+        # Keep within the compose limit by growing the part size for very large files
+        part_size = UPLOAD_CHUNK_SIZE
+        while (file_size + part_size - 1) // part_size > MAX_COMPOSE_SOURCES:
+            part_size += _CHUNK_ALIGNMENT
+        part_count = (file_size + part_size - 1) // part_size
+        
+        # Identify this upload by destination and file identity so retries resume it
+        stat = os.stat(file_path)
+        upload_id = hashlib.sha256(
+            f"{destination_blob_name}:{file_size}:{stat.st_mtime_ns}:{part_size}".encode('utf-8')
+        ).hexdigest()[:16]
+        part_names = [f"{destination_blob_name}.parts/{upload_id}/{i:04d}" for i in range(part_count)]
+        
+        with _acknowledged_parts_lock:
+            acknowledged = _acknowledged_parts.get(upload_id)
+            if acknowledged is None:
+                acknowledged = set()
+                _acknowledged_parts.set(upload_id, acknowledged, UPLOAD_RESUME_TTL_SECONDS)
+            resumed_parts = len(acknowledged)
+        if resumed_parts:
+            print(f"Resuming upload of {destination_blob_name}: {resumed_parts}/{part_count} parts already stored")
+        
+        def upload_part(index: int) -> None:
+            with _acknowledged_parts_lock:
+                if index in acknowledged:
+                    return
+            with open(file_path, 'rb') as f:
+                f.seek(index * part_size)
+                chunk = f.read(part_size)
+            for attempt in range(UPLOAD_PART_RETRIES):
+                try:
+                    self.bucket.blob(part_names[index]).upload_from_string(chunk)
+                    with _acknowledged_parts_lock:
+                        acknowledged.add(index)
+                    return
+                except Exception as e:
+                    if attempt == UPLOAD_PART_RETRIES - 1:
+                        raise
+                    wait_time = 2 ** attempt
+                    print(f"Part {index + 1}/{part_count} of {destination_blob_name} failed ({e}), retrying in {wait_time}s")
+                    time.sleep(wait_time)
+        
+        with ThreadPoolExecutor(max_workers=UPLOAD_PARALLELISM) as executor:
+            # list() re-raises the first part failure, leaving acknowledged parts for a retry
+            list(executor.map(upload_part, range(part_count)))
+        
+        destination = self.bucket.blob(destination_blob_name)
+        destination.content_type = mimetypes.guess_type(destination_blob_name)[0] or 'application/octet-stream'
+        destination.compose([self.bucket.blob(name) for name in part_names])
+        
+        _acknowledged_parts.invalidate(upload_id)
+        for name in part_names:
+            try:
+                self.bucket.blob(name).delete()
+            except Exception as e:
+                print(f"Could not delete upload part {name}: {e}")
+        
+        _record_upload_metrics(destination_blob_name, file_size, time.time() - started, part_count, resumed_parts)
+        return destination
+
+    def _signed_url(self, blob) -> str:
+        """Return a signed URL for blob, reusing a cached one until it is close to expiry."""
+        signed_url = _signed_url_cache.get(blob.name)
+        if signed_url:
+            return signed_url
+        signed_url = blob.generate_signed_url(expiration=SIGNED_URL_LIFETIME)
+        ttl = SIGNED_URL_LIFETIME.total_seconds() - SIGNED_URL_REFRESH_MARGIN_SECONDS
+        _signed_url_cache.set(blob.name, signed_url, ttl)
+        return signed_url
+
+    def get_signed_url(self, blob_name: str) -> Optional[str]:
+        """
+        Get a signed URL valid for up to 1 hour for an existing blob.
+        
+        Args:
+            blob_name: The name of the file in Firebase Storage
+            
+        Returns:
+            str or None: A signed URL for the blob, or None on failure
+        """
+        try:
+            return self._signed_url(self.bucket.blob(blob_name))
+        except Exception as e:
+            print(f"Error signing URL for {blob_name}: {e}")
+            return None
+
+    def get_blob_metadata(self, blob_name: str) -> Dict[str, Any]:
+        """
+        Get existence, size and generation for a blob, from cache when possible.
+        
+        Args:
+            blob_name: The name of the file in Firebase Storage
+            
+        Returns:
+            Dict with 'exists', 'size' and 'generation' keys
+        """
+        metadata = _blob_metadata_cache.get(blob_name)
+        if metadata is not None:
+            return metadata
+        
+        # get_blob fetches metadata in a single request and returns None if missing
+        blob = self.bucket.get_blob(blob_name)
+        if blob is None:
+            return _remember_blob(blob_name, False)
+        return _remember_blob(blob_name, True, blob.size, blob.generation)
+
+    def blob_exists(self, blob_name: str) -> bool:
+        """Return True if blob_name exists in Firebase Storage, using cached metadata when possible."""
+        return self.get_blob_metadata(blob_name)['exists']
+
     def get_document(self, collection: str, doc_id: str) -> Optional[dict]:
         """Retrieve document from Firestore."""
         try:
@@ -239,6 +571,9 @@ def download_file(blob_name: str) -> Optional[bytes]:
     """
     Download a file from Firebase Storage and return its contents as bytes.
     
+    The download is attempted directly rather than after an existence check;
+    cached metadata lets us skip names already known to be missing.
+    
     Args:
         blob_name: The name of the file in Firebase Storage
         
@@ -248,33 +583,35 @@ def download_file(blob_name: str) -> Optional[bytes]:
     try:
         firebase_config = FirebaseConfig()
         
-        # Check if blob exists with this name first
-        blob = firebase_config.bucket.blob(blob_name)
-        if not blob.exists():
-            # Try with outputs/ prefix if not already there
-            if not blob_name.startswith("outputs/"):
-                alt_blob_name = f"outputs/{blob_name}"
-                blob = firebase_config.bucket.blob(alt_blob_name)
-                if blob.exists():
-                    blob_name = alt_blob_name
-                    blob = firebase_config.bucket.blob(blob_name)
-                else:
-                    print(f"File {blob_name} not found in Firebase Storage")
-                    return None
-            else:
-                print(f"File {blob_name} not found in Firebase Storage")
-                return None
-            
-        # Set correct content type for docx files
-        if blob_name.lower().endswith('.docx'):
-            blob.content_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        candidates = [blob_name]
+        # Try with outputs/ prefix if not already there
+        if not blob_name.startswith("outputs/"):
+            candidates.append(f"outputs/{blob_name}")
         
-        # Download the file to memory
-        print(f"Downloading {blob_name} from Firebase")
-        file_bytes = blob.download_as_bytes()
+        for candidate in candidates:
+            metadata = _blob_metadata_cache.get(candidate)
+            if metadata is not None and not metadata['exists']:
+                continue
+            
+            blob = firebase_config.bucket.blob(candidate)
+            # Set correct content type for docx files
+            if candidate.lower().endswith('.docx'):
+                blob.content_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            
+            # Download the file to memory
+            print(f"Downloading {candidate} from Firebase")
+            try:
+                file_bytes = blob.download_as_bytes()
+            except NotFound:
+                _remember_blob(candidate, False)
+                continue
+            
+            _remember_blob(candidate, True, len(file_bytes), blob.generation)
+            print(f"Successfully downloaded {candidate} ({len(file_bytes)} bytes)")
+            return file_bytes
         
-        print(f"Successfully downloaded {blob_name} ({len(file_bytes)} bytes)")
-        return file_bytes
+        print(f"File {blob_name} not found in Firebase Storage")
+        return None
                 
     except Exception as e:
         print(f"Error downloading file from Firebase: {e}")
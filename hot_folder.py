@@ -0,0 +1,268 @@
+"""
+Hot-folder ingestion daemon.
+
+Watches an ingest directory with inotify and runs each CV dropped into it through
+the pipeline. Files are picked up from kernel events only, so the directory is
+never polled or rescanned however many files it holds. A file is processed once
+it has been closed after writing (or moved in) and left alone for a short
+debounce period, which covers clients that write in several passes.
+
+Each file is moved out of the ingest directory into its own job directory before
+processing. The generated document and a <name>.result.json describing the
+outcome are written to the output directory.
+
+Usage:
+    python hot_folder.py --ingest-dir /srv/cv_drop --output-dir /srv/cv_out
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import argparse
+import threading
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from logger import log_info, log_error, log_warning
+from upload_store import create_job_dir
+from singleflight import hash_file
+from pipeline_executor import PipelineExecutor, PIPELINE_CONCURRENCY
+from brindle_batch import validate_input
+from archive_queue import get_archive_queue
+from cv_pipeline import process_cv_pipeline
+
+# Load environment variables
+load_dotenv('config.env')
+
+HOT_FOLDER_INGEST_DIR = os.environ.get("HOT_FOLDER_INGEST_DIR", "ingest")
+HOT_FOLDER_OUTPUT_DIR = os.environ.get("HOT_FOLDER_OUTPUT_DIR", "ingest_results")
+HOT_FOLDER_DEBOUNCE_SECONDS = float(os.getenv("HOT_FOLDER_DEBOUNCE_SECONDS", "2"))
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_BUFFER_SIZE = 64 * 1024
+
+# Seconds between checks for a stop request while no events arrive
+STOP_CHECK_INTERVAL = 1.0
+
+# Partial files left by common clients and editors
+IGNORED_PREFIXES = ('.', '~$')
+IGNORED_SUFFIXES = ('.tmp', '.part', '.crdownload', '.swp')
+
+class Inotify:
+    """Minimal ctypes binding for watching one directory with inotify."""
+
+    def __init__(self, path: str, mask: int):
+        """
+        Args:
+            path: Directory to watch
+            mask: inotify event mask
+
+        Raises:
+            OSError: If inotify is unavailable or the watch can't be added
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Could not watch {path}: {os.strerror(errno)}")
+
+    def read_events(self) -> List[tuple]:
+        """Return the pending (mask, name) events without blocking."""
+        try:
+            data = os.read(self.fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class HotFolderWatcher:
+    """Turns inotify events in an ingest directory into debounced pipeline runs."""
+
+    def __init__(self, ingest_dir: str = HOT_FOLDER_INGEST_DIR, output_dir: str = HOT_FOLDER_OUTPUT_DIR,
+                 concurrency: int = PIPELINE_CONCURRENCY, debounce_seconds: float = HOT_FOLDER_DEBOUNCE_SECONDS):
+        """
+        Args:
+            ingest_dir: Directory clients drop CVs into
+            output_dir: Directory generated documents and result files are written to
+            concurrency: Number of CVs processed at once
+            debounce_seconds: Quiet time after the last write before a file is processed
+        """
+        self.ingest_dir = os.path.abspath(ingest_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.debounce_seconds = debounce_seconds
+        self.executor = PipelineExecutor(concurrency)
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[tuple] = []
+        self._stop = threading.Event()
+        os.makedirs(self.ingest_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    @staticmethod
+    def _is_candidate(name: str) -> bool:
+        """True if name looks like a finished CV rather than a temporary or hidden file."""
+        lower = name.lower()
+        return bool(name) and not lower.startswith(IGNORED_PREFIXES) and not lower.endswith(IGNORED_SUFFIXES)
+
+    def _schedule(self, name: str) -> None:
+        """(Re)start the debounce timer for a file."""
+        deadline = time.monotonic() + self.debounce_seconds
+        self._deadlines[name] = deadline
+        heapq.heappush(self._heap, (deadline, name))
+
+    def _due_files(self) -> List[str]:
+        """Pop files whose debounce period has passed without further writes."""
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, name = heapq.heappop(self._heap)
+            # Stale heap entries are left behind when a file is written again
+            if self._deadlines.get(name) == deadline:
+                del self._deadlines[name]
+                due.append(name)
+        return due
+
+    def _next_timeout(self) -> float:
+        if not self._heap:
+            return STOP_CHECK_INTERVAL
+        return max(0.0, min(self._heap[0][0] - time.monotonic(), STOP_CHECK_INTERVAL))
+
+    def _claim(self, name: str) -> None:
+        """Move a settled file out of the ingest directory and queue it for processing."""
+        source = os.path.join(self.ingest_dir, name)
+        if not os.path.isfile(source):
+            return
+        _, job_dir = create_job_dir()
+        file_path = str(job_dir / name)
+        try:
+            shutil.move(source, file_path)
+        except OSError as e:
+            log_error(f"Could not claim {source}", e)
+            return
+        log_info(f"Hot folder picked up {name}")
+        self.executor.submit(self._process, file_path, name)
+
+    def _process(self, file_path: str, name: str) -> None:
+        """Run one CV through the pipeline and write its results to the output directory."""
+        error = validate_input(file_path)
+        if error:
+            result = {'success': False, 'message': error}
+        else:
+            result = process_cv_pipeline(file_path, name, hash_file(file_path))
+
+        if result.get('success'):
+            output_path = os.path.join('outputs', result['download_file'])
+            try:
+                shutil.copy2(output_path, os.path.join(self.output_dir, result['download_file']))
+            except OSError as e:
+                log_error(f"Could not copy {output_path} to {self.output_dir}", e)
+                result = {'success': False, 'message': f"Could not write output: {str(e)}"}
+
+        result = dict(result, file=name, finished_at=time.time())
+        # Keep the extension, so cv.pdf and cv.docx in one drop don't share a result file
+        with open(os.path.join(self.output_dir, f"{name}.result.json"), 'w') as f:
+            json.dump(result, f, indent=2)
+        if result.get('success'):
+            log_info(f"Hot folder processed {name}")
+        else:
+            log_warning(f"Hot folder failed {name}: {result.get('message')}")
+
+    def _queue_existing(self) -> None:
+        """Schedule the files already in the ingest directory (one pass, used at startup and after overflow)."""
+        with os.scandir(self.ingest_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and self._is_candidate(entry.name):
+                    self._schedule(entry.name)
+
+    def stop(self) -> None:
+        """Ask the watch loop to exit."""
+        self._stop.set()
+
+    def run(self, process_existing: bool = False) -> None:
+        """
+        Watch the ingest directory until stop() is called.
+
+        Args:
+            process_existing: Also process files already present when the watcher starts
+        """
+        inotify = Inotify(self.ingest_dir, IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF)
+        log_info(f"Watching {self.ingest_dir} for CVs, writing results to {self.output_dir}")
+        if process_existing:
+            self._queue_existing()
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([inotify.fd], [], [], self._next_timeout())
+                if ready:
+                    for mask, name in inotify.read_events():
+                        if mask & IN_Q_OVERFLOW:
+                            # Events were dropped by the kernel; one pass recovers the missed files
+                            log_warning("inotify queue overflowed, rescanning ingest directory once")
+                            self._queue_existing()
+                        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                            log_error(f"Ingest directory {self.ingest_dir} was removed or moved, stopping")
+                            self._stop.set()
+                        elif not mask & IN_ISDIR and self._is_candidate(name):
+                            self._schedule(name)
+                for name in self._due_files():
+                    self._claim(name)
+        finally:
+            inotify.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='brindle-hot-folder', description="Process CVs dropped into a folder.")
+    parser.add_argument('--ingest-dir', default=HOT_FOLDER_INGEST_DIR, help="Directory to watch for new CVs")
+    parser.add_argument('--output-dir', default=HOT_FOLDER_OUTPUT_DIR, help="Directory for generated documents")
+    parser.add_argument('--concurrency', type=int, default=PIPELINE_CONCURRENCY, help="CVs processed at once")
+    parser.add_argument('--debounce', type=float, default=HOT_FOLDER_DEBOUNCE_SECONDS,
+                        help="Seconds a file must be left alone before it is processed")
+    parser.add_argument('--process-existing', action='store_true',
+                        help="Also process files already in the ingest directory at startup")
+    args = parser.parse_args(argv)
+
+    for path in ['uploads', 'parsed_jsons', 'outputs']:
+        os.makedirs(path, exist_ok=True)
+    # Upload artefacts a previous run queued but didn't archive
+    get_archive_queue().resume()
+
+    watcher = HotFolderWatcher(args.ingest_dir, args.output_dir, args.concurrency, args.debounce)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run(process_existing=args.process_existing)
+    except KeyboardInterrupt:
+        watcher.stop()
+    log_info("Hot folder watcher stopped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Pre-parse normalisation of Word uploads.
+
+The remote parser is fast on PDFs but often times out on legacy .doc files and on
+.docx files built from text boxes, floating shapes or multi-column layouts. Users
+used to be told to re-save those as PDF and upload again, which doubled parser
+spend. With NORMALIZE_WORD_INPUTS enabled, such files are converted to PDF
+locally on the warm office converter pool before they reach the parser:
+
+    off     never convert (default)
+    auto    convert legacy .doc, and .docx files whose layout looks complex
+    always  convert every Word file
+
+The complexity check only reads word/document.xml out of the zip and counts
+layout features, so it costs milliseconds.
+"""
+
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import List, Optional
+from dotenv import load_dotenv
+from logger import log_info, log_warning
+from security import SecurityConfig
+from office_pool import OfficeConversionError, get_office_pool
+
+# Load environment variables
+load_dotenv('config.env')
+
+NORMALIZE_WORD_INPUTS = os.getenv("NORMALIZE_WORD_INPUTS", "off").lower()  # off, auto or always
+NORMALIZE_MODES = ('off', 'auto', 'always')
+if NORMALIZE_WORD_INPUTS not in NORMALIZE_MODES:
+    log_warning(f"Unknown NORMALIZE_WORD_INPUTS '{NORMALIZE_WORD_INPUTS}', Word inputs will not be converted")
+    NORMALIZE_WORD_INPUTS = 'off'
+
+WORD_EXTENSIONS = {'doc', 'docx'}
+
+# document.xml larger than this is treated as complex without scanning it
+MAX_SCANNED_XML_BYTES = 4 * 1024 * 1024
+
+# Layout features the parser handles badly, and how many of each a simple document may have
+COMPLEXITY_LIMITS = {
+    'text boxes': (re.compile(rb'<w:txbxContent\b'), 0),
+    'floating shapes': (re.compile(rb'<wp:anchor\b'), 2),
+    'multi-column sections': (re.compile(rb'<w:cols\b[^>]*\bw:num="([2-9]|\d\d+)"'), 0),
+    'embedded objects': (re.compile(rb'<w:object\b'), 0),
+    'frames': (re.compile(rb'<w:framePr\b'), 0),
+}
+# A table opened inside a table cell that is still open (self-closing <w:tc/> cells hold nothing)
+NESTED_TABLE_RE = re.compile(rb'<w:tc(?:\s[^>]*[^/])?>(?:(?!</w:tc>).)*?<w:tbl\b', re.DOTALL)
+
+@dataclass
+class ComplexityReport:
+    """Result of the local complexity check on a Word document."""
+    complex: bool
+    reasons: List[str] = field(default_factory=list)
+
+@dataclass
+class NormalizedInput:
+    """A converted upload, ready to send to the parser instead of the original."""
+    file_path: str
+    filename: str
+    reason: str
+
+def is_word_file(filename: str) -> bool:
+    return filename.rsplit('.', 1)[-1].lower() in WORD_EXTENSIONS if '.' in filename else False
+
+def assess_docx_complexity(file_path: str) -> ComplexityReport:
+    """
+    Check a .docx for layout features that make the parser slow or unreliable.
+
+    Returns:
+        ComplexityReport listing the features found
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            info = archive.getinfo('word/document.xml')
+            if info.file_size > MAX_SCANNED_XML_BYTES:
+                return ComplexityReport(True, [f"document.xml is {info.file_size // 1024} KB"])
+            xml = archive.read(info)
+    except (zipfile.BadZipFile, KeyError, OSError) as e:
+        # LibreOffice opens many damaged files the parser rejects
+        return ComplexityReport(True, [f"unreadable docx ({e})"])
+
+    reasons = []
+    for feature, (pattern, limit) in COMPLEXITY_LIMITS.items():
+        count = len(pattern.findall(xml))
+        if count > limit:
+            reasons.append(f"{count} {feature}")
+    if NESTED_TABLE_RE.search(xml):
+        reasons.append("nested tables")
+    return ComplexityReport(bool(reasons), reasons)
+
+def conversion_reason(file_path: str, filename: str, mode: str = NORMALIZE_WORD_INPUTS) -> Optional[str]:
+    """
+    Decide whether an upload should be converted to PDF before parsing.
+
+    Returns:
+        Why it should be converted, or None to parse it as it is
+    """
+    if mode == 'off' or not is_word_file(filename):
+        return None
+    if mode == 'always':
+        return "all Word inputs are converted"
+
+    # Route on the real content, since Word saves .docx content under .doc names too
+    with open(file_path, 'rb') as f:
+        content_type = SecurityConfig.detect_content_type(f.read(SecurityConfig.SNIFF_BYTES))
+    if content_type == 'ole':
+        return "legacy .doc format"
+    if content_type == 'zip':
+        report = assess_docx_complexity(file_path)
+        if report.complex:
+            return "complex layout: " + ", ".join(report.reasons)
+    return None
+
+def convert_to_pdf(file_path: str, filename: str, reason: str) -> Optional[NormalizedInput]:
+    """
+    Convert a Word upload to PDF next to the original.
+    The PDF keeps the original's extension in its name (cv.doc -> cv.doc.normalized.pdf),
+    so cv.doc and cv.docx in one directory don't overwrite each other's conversion.
+
+    Returns:
+        The converted input, or None if conversion failed and the original should be used
+    """
+    pdf_path = f"{file_path}.normalized.pdf"
+    try:
+        get_office_pool().convert(file_path, pdf_path, 'pdf')
+    except OfficeConversionError as e:
+        log_warning(f"Could not convert {filename} to PDF, parsing the original: {e}")
+        return None
+    log_info(f"Converted {filename} to PDF before parsing ({reason})")
+    return NormalizedInput(pdf_path, f"{os.path.splitext(filename)[0]}.pdf", reason)
+
+def normalize_for_parser(file_path: str, filename: str, mode: str = NORMALIZE_WORD_INPUTS) -> Optional[NormalizedInput]:
+    """
+    Convert the upload to PDF if its type and layout call for it.
+
+    Returns:
+        The converted input, or None to parse the original
+    """
+    reason = conversion_reason(file_path, filename, mode)
+    return convert_to_pdf(file_path, filename, reason) if reason else None
@@ -0,0 +1,125 @@
+"""
+Shared store for per-job processing status.
+
+Status lives in a small SQLite database so any worker process can answer a
+status or progress query for a job another worker is running. Entries expire
+JOB_STATUS_TTL_SECONDS after their last update, and the table is capped at
+JOB_STORE_MAX_JOBS rows, oldest first.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config.env')
+
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", "data/job_status.db")
+JOB_STATUS_TTL_SECONDS = int(os.getenv("JOB_STATUS_TTL_SECONDS", "3600"))
+JOB_STORE_MAX_JOBS = int(os.getenv("JOB_STORE_MAX_JOBS", "1000"))
+
+# Minimum seconds between eviction sweeps
+EVICTION_INTERVAL_SECONDS = 60
+
+class JobStatusStore:
+    """SQLite-backed map of job id -> status, with TTL and size bounds."""
+
+    def __init__(self, db_path: str = JOB_STORE_PATH, ttl_seconds: int = JOB_STATUS_TTL_SECONDS,
+                 max_jobs: int = JOB_STORE_MAX_JOBS):
+        """
+        Args:
+            db_path: SQLite file shared by all worker processes
+            ttl_seconds: Seconds after its last update that a job's status is kept
+            max_jobs: Maximum number of jobs kept; the least recently updated are evicted first
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._local = threading.local()
+        self._last_eviction = 0.0
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS job_status (
+                job_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_job_status_updated ON job_status (updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the store."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, job_id: str, state: Dict[str, Any], version: int) -> None:
+        """
+        Store the latest state for a job, extending its expiry.
+
+        Args:
+            job_id: The job's id
+            state: JSON-serialisable job state
+            version: Monotonic version of the state, used by watchers to detect changes
+        """
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO job_status (job_id, state, version, updated_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, version = excluded.version, "
+            "updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+            (job_id, json.dumps(state), version, now, now + self.ttl_seconds)
+        )
+        if now - self._last_eviction >= EVICTION_INTERVAL_SECONDS:
+            self.evict()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored state for a job, or None if unknown or expired."""
+        row = self._connect().execute(
+            "SELECT state FROM job_status WHERE job_id = ? AND expires_at > ?",
+            (job_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def version(self, job_id: str) -> Optional[int]:
+        """Return the stored version for a job without loading its state."""
+        row = self._connect().execute(
+            "SELECT version FROM job_status WHERE job_id = ? AND expires_at > ?",
+            (job_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def evict(self) -> int:
+        """Delete expired jobs and trim the store to max_jobs. Returns the number of rows removed."""
+        now = time.time()
+        self._last_eviction = now
+        conn = self._connect()
+        removed = conn.execute("DELETE FROM job_status WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM job_status WHERE job_id IN ("
+            "SELECT job_id FROM job_status ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_jobs,)
+        ).rowcount
+        return removed
+
+_job_store: Optional[JobStatusStore] = None
+_job_store_lock = threading.Lock()
+
+def get_job_store() -> JobStatusStore:
+    """Return the process-wide job status store, creating it on first use."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStatusStore()
+    return _job_store
@@ -0,0 +1,422 @@
+"""
+Local fast-path parser for plain-text and simply laid out Word CVs.
+
+Extracts the same data.profile schema the remote parser returns and
+DocGenerator.prepare_context consumes: basics, professional_experiences (with
+duration_in_months) and trainings_and_certifications. It works from the
+document's lines: recognised section headings split the CV, date ranges start
+experience entries, and bullets become highlights.
+
+Every parse gets a confidence score between 0 and 1. Below
+LOCAL_PARSER_MIN_CONFIDENCE the caller should use the remote parser instead, so
+only CVs this simple approach reads reliably skip the network.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from input_normalizer import assess_docx_complexity
+
+# Load environment variables
+load_dotenv('config.env')
+
+LOCAL_PARSER_ENABLED = os.getenv("LOCAL_PARSER_ENABLED", "true").lower() == "true"
+LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSER_MIN_CONFIDENCE", "0.8"))
+
+LOCAL_PARSER_EXTENSIONS = {'txt', 'docx'}
+
+# Section headings, normalised to lower case letters and spaces
+SECTION_HEADINGS = {
+    'experience': {'experience', 'work experience', 'employment', 'employment history', 'work history',
+                   'professional experience', 'career history', 'relevant experience', 'employment experience'},
+    'qualifications': {'qualifications', 'certifications', 'certificates', 'licences', 'licenses', 'tickets',
+                       'licences and certifications', 'licenses and certifications', 'training',
+                       'training and certifications', 'education', 'education and training',
+                       'qualifications and training', 'tickets and licences'},
+    'summary': {'profile', 'summary', 'professional summary', 'career summary', 'about me', 'objective',
+                'career objective', 'personal statement'},
+    'other': {'skills', 'key skills', 'core skills', 'references', 'referees', 'interests', 'hobbies',
+              'achievements', 'personal details', 'contact', 'contact details', 'languages'},
+}
+_HEADING_SECTIONS = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+
+_MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+           'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+_MONTH_RE = r'Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?'
+
+def _date_re(name: str) -> str:
+    """One date: 'March 2018', '03/2018', '2018-03' or '2018'."""
+    return (rf"(?:(?P<{name}_mn>{_MONTH_RE})\.?,?\s+(?P<{name}_my>(?:19|20)\d\d)"
+            rf"|(?P<{name}_nm>0?[1-9]|1[0-2])[/.](?P<{name}_ny>(?:19|20)\d\d)"
+            rf"|(?P<{name}_iy>(?:19|20)\d\d)-(?P<{name}_im>0[1-9]|1[0-2])(?!\d)"
+            rf"|(?P<{name}_y>(?:19|20)\d\d))")
+
+DATE_RANGE_RE = re.compile(
+    rf"\b{_date_re('start')}\s*(?:-|–|—|to|until)\s*(?:{_date_re('end')}|(?P<current>present|current|now|date|today))\b",
+    re.IGNORECASE
+)
+YEAR_RE = re.compile(r'\b((?:19|20)\d\d)\b')
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+# Separators are spaces, tabs and hyphens only, so a number never runs into the next line
+PHONE_RE = re.compile(r'(?:\+\d{1,3}[ \t-]?)?(?:\(\d+\)[ \t-]?)?\d[\d \t-]{6,}\d')
+# Brackets left empty once a year or date range is taken out of a qualification
+EMPTY_BRACKETS_RE = re.compile(r'\(\s*[-–—,/]?\s*\)|\[\s*[-–—,/]?\s*\]')
+LABEL_RE = re.compile(r'^(name|address|location|email|e-mail|phone|mobile|ph|cell|position|title|profession)\s*:\s*(.+)$', re.IGNORECASE)
+STREET_RE = re.compile(r'\b\d+[A-Za-z]?\s+\w+(?:\s+\w+)*\s+(?:Street|St|Road|Rd|Avenue|Ave|Drive|Dr|Place|Pl|Lane|Ln|Crescent|Cres|'
+                       r'Terrace|Tce|Way|Close|Grove|Highway|Hwy|Parade|Boulevard|Blvd|Court|Ct)\b', re.IGNORECASE)
+BULLET_RE = re.compile(r'^\s*(?:[•●▪◦‣∙·*\-–]|\d+[.)])\s+')
+HEADER_SPLIT_RE = re.compile(r'\s+[|–—-]\s+|\s*\|\s*|,\s+|\s+@\s+')
+COMPANY_HINT_RE = re.compile(r'\b(?:Ltd|Limited|Inc|LLC|L\.L\.C|Pty|PLC|GmbH|Corp|Corporation|Company|Co|Group|Holdings|'
+                             r'Council|Contractors?|Construction|Services|Engineering|Industries|Partners|Trust|Ministry|Department)\b\.?',
+                             re.IGNORECASE)
+NAME_RE = re.compile(r"^[A-Za-z][A-Za-z'’-]*(?:\s+[A-Za-z][A-Za-z'’.-]*){1,3}$")
+
+@dataclass
+class LocalParseResult:
+    """A local parse and how far it can be trusted."""
+    profile: Dict[str, Any]
+    confidence: float
+    notes: List[str] = field(default_factory=list)
+
+    def as_parser_response(self) -> Dict[str, Any]:
+        """The parsed CV in the remote parser's response shape."""
+        return {'data': {'profile': self.profile},
+                'meta': {'parser': 'local', 'confidence': round(self.confidence, 3)}}
+
+def _read_text_lines(file_path: str) -> List[str]:
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    for encoding in ('utf-8-sig', 'cp1252', 'latin-1'):
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    return text.splitlines()
+
+def _read_docx_lines(file_path: str) -> Tuple[List[str], set]:
+    """Paragraph and table cell text in document order, and the indices of lines styled as headings."""
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(file_path)
+    lines, headings = [], set()
+    for child in document.element.body.iterchildren():
+        tag = child.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            paragraph = Paragraph(child, document)
+            style = paragraph.style.name if paragraph.style is not None else ''
+            if style.startswith('Heading') or style == 'Title':
+                headings.add(len(lines))
+            # List bullets come from numbering, not the text, so mark them the way a text CV would
+            is_list = style.startswith('List') or child.find('.//' + qn('w:numPr')) is not None
+            lines.append(f"• {paragraph.text}" if is_list and paragraph.text.strip() else paragraph.text)
+        elif tag == 'tbl':
+            for row in Table(child, document).rows:
+                seen = set()
+                for cell in row.cells:
+                    # Merged cells repeat across the row
+                    if id(cell._tc) in seen:
+                        continue
+                    seen.add(id(cell._tc))
+                    lines.extend(p.text for p in cell.paragraphs)
+    return lines, headings
+
+def _section_of(line: str) -> Optional[str]:
+    """The section a heading line opens, or None if it isn't a known heading."""
+    normalized = re.sub(r'[^a-z ]+', ' ', line.lower().replace('&', ' and '))
+    normalized = ' '.join(normalized.split())
+    if not normalized or len(normalized.split()) > 5:
+        return None
+    return _HEADING_SECTIONS.get(normalized)
+
+def _parse_date(match: re.Match, name: str) -> Optional[Tuple[int, Optional[int]]]:
+    """(year, month) of the named date in a DATE_RANGE_RE match; month is None for year-only dates."""
+    if match.group(f'{name}_my'):
+        return int(match.group(f'{name}_my')), _MONTHS[match.group(f'{name}_mn')[:3].lower()]
+    if match.group(f'{name}_ny'):
+        return int(match.group(f'{name}_ny')), int(match.group(f'{name}_nm'))
+    if match.group(f'{name}_iy'):
+        return int(match.group(f'{name}_iy')), int(match.group(f'{name}_im'))
+    if match.group(f'{name}_y'):
+        return int(match.group(f'{name}_y')), None
+    return None
+
+def _format_date(value: Tuple[int, Optional[int]]) -> str:
+    year, month = value
+    return f"{year}-{month:02d}" if month else str(year)
+
+def duration_in_months(start: Tuple[int, Optional[int]], end: Tuple[int, Optional[int]]) -> int:
+    """
+    Months from start to end. Dates with months count both end months;
+    year-only ranges count whole years, with a minimum of one. Reversed ranges are 0.
+    """
+    if end[0] < start[0] or (end[0] == start[0] and (end[1] or 12) < (start[1] or 1)):
+        return 0
+    if start[1] is None or end[1] is None:
+        return max(end[0] - start[0], 1) * 12
+    return max((end[0] - start[0]) * 12 + end[1] - start[1] + 1, 1)
+
+def _clean_part(part: str) -> str:
+    """Strip a header or qualification fragment, unwrapping it if it is entirely parenthesised."""
+    part = part.strip()
+    if part.startswith('(') and part.endswith(')'):
+        part = part[1:-1].strip()
+    return part
+
+def _split_header(header_lines: List[str]) -> Dict[str, str]:
+    """Work out title, company and location from an entry's header text."""
+    title = company = location = ''
+    parts = []
+    for line in header_lines:
+        at_split = re.split(r'\s+at\s+', line, maxsplit=1, flags=re.IGNORECASE)
+        if len(at_split) == 2 and not title:
+            title = at_split[0].strip()
+            parts.extend(_clean_part(p) for p in HEADER_SPLIT_RE.split(at_split[1]) if _clean_part(p))
+        else:
+            parts.extend(_clean_part(p) for p in HEADER_SPLIT_RE.split(line) if _clean_part(p))
+
+    if title:
+        company = parts.pop(0) if parts else ''
+    else:
+        hinted = [p for p in parts if COMPANY_HINT_RE.search(p)]
+        if hinted:
+            company = hinted[0]
+            parts.remove(company)
+            title = parts.pop(0) if parts else ''
+        else:
+            title = parts.pop(0) if parts else ''
+            company = parts.pop(0) if parts else ''
+    location = ', '.join(parts)
+    return {'title': title, 'company': company, 'location': location}
+
+def _is_header_candidate(line: str) -> bool:
+    """Short, unbulleted lines that don't read as a sentence can be an entry's title or company."""
+    return not BULLET_RE.match(line) and len(line) <= 90 and not line.rstrip().endswith('.')
+
+def _parse_experiences(lines: List[str], today: date) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Split an experience section into entries, each starting at a date range.
+
+    Returns:
+        (entries, number of lines that could not be attached to an entry)
+    """
+    entries = []
+    pending: List[str] = []
+
+    def close(entry: Optional[Dict[str, Any]], body: List[str]) -> None:
+        if entry is None:
+            return
+        description = []
+        for line in body:
+            if BULLET_RE.match(line):
+                entry['highlights'].append(BULLET_RE.sub('', line).strip())
+            else:
+                description.append(line.strip())
+        entry['description'] = ' '.join(description)
+
+    current = None
+    for line in lines:
+        match = DATE_RANGE_RE.search(line)
+        if not match:
+            pending.append(line)
+            continue
+
+        # Header lines directly above the dates belong to the new entry, the rest to the previous one
+        header = [line[:match.start()] + ' ' + line[match.end():]]
+        header = [h.strip(' |–—-,()\t') for h in header if h.strip(' |–—-,()\t')]
+        max_header_lines = 1 if header else 2
+        split_at = len(pending)
+        while split_at > 0 and len(pending) - split_at < max_header_lines and _is_header_candidate(pending[split_at - 1]):
+            split_at -= 1
+        header = pending[split_at:] + header
+        close(current, pending[:split_at])
+        pending = []
+
+        start = _parse_date(match, 'start')
+        end = (today.year, today.month) if match.group('current') else _parse_date(match, 'end')
+        fields = _split_header(header)
+        current = {
+            'company': fields['company'],
+            'title': fields['title'],
+            'start_date': _format_date(start),
+            'end_date': 'Present' if match.group('current') else _format_date(end),
+            'duration_in_months': duration_in_months(start, end),
+            'description': '',
+            'highlights': [],
+            'location': fields['location']
+        }
+        entries.append(current)
+
+    unattached = 0
+    if current is None:
+        unattached = len(pending)
+    else:
+        close(current, pending)
+    return entries, unattached
+
+def _parse_trainings(lines: List[str]) -> List[Dict[str, Any]]:
+    """One qualification per line: description, optional issuing organisation and year."""
+    trainings = []
+    for line in lines:
+        text = BULLET_RE.sub('', line).strip()
+        if not text:
+            continue
+        years = YEAR_RE.findall(text)
+        year = int(years[-1]) if years else None
+        if years:
+            text = DATE_RANGE_RE.sub('', text)
+            text = YEAR_RE.sub('', text)
+            text = EMPTY_BRACKETS_RE.sub('', text)
+        parts = [_clean_part(p) for p in HEADER_SPLIT_RE.split(text) if _clean_part(p)]
+        if not parts:
+            continue
+        trainings.append({
+            'description': parts[0],
+            'issuing_organization': ', '.join(parts[1:]),
+            'year': year
+        })
+    return trainings
+
+def _parse_basics(lines: List[str], all_lines: List[str]) -> Dict[str, str]:
+    """Name, profession, contact details and address from the lines above the first section."""
+    basics = {'first_name': '', 'last_name': '', 'profession': '', 'email': '', 'phone': '', 'address': ''}
+    name_index = None
+    for i, line in enumerate(lines):
+        label = LABEL_RE.match(line)
+        if label:
+            key, value = label.group(1).lower(), label.group(2).strip()
+            if key == 'name':
+                first, _, last = value.partition(' ')
+                basics['first_name'], basics['last_name'] = first, last.strip()
+                name_index = i
+            elif key in ('address', 'location'):
+                basics['address'] = value
+            elif key in ('position', 'title', 'profession'):
+                basics['profession'] = value
+            continue
+        if name_index is None and not basics['first_name'] and NAME_RE.match(line) and not _section_of(line):
+            first, _, last = line.partition(' ')
+            basics['first_name'], basics['last_name'] = first, last.strip()
+            name_index = i
+        elif not basics['address'] and STREET_RE.search(line):
+            basics['address'] = line
+        elif name_index is not None and i == name_index + 1 and not basics['profession'] \
+                and not EMAIL_RE.search(line) and not PHONE_RE.search(line) and len(line.split()) <= 8:
+            basics['profession'] = line
+
+    # Contact details are often in a footer or sidebar, so look everywhere
+    if email := EMAIL_RE.search('\n'.join(all_lines)):
+        basics['email'] = email.group(0)
+    phones = (phone for line in all_lines for phone in PHONE_RE.finditer(line))
+    for phone in phones:
+        # Date ranges such as 2015 - 2018 also look like numbers
+        if not DATE_RANGE_RE.search(phone.group(0)) and len(re.sub(r'\D', '', phone.group(0))) >= 7:
+            basics['phone'] = phone.group(0).strip()
+            break
+    return basics
+
+def parse_lines(lines: List[str], heading_indices: Optional[set] = None, today: Optional[date] = None) -> LocalParseResult:
+    """
+    Parse a CV from its lines of text.
+
+    Args:
+        lines: The document's lines in reading order
+        heading_indices: Indices of lines the document styles as headings
+        today: Date used for 'Present'; defaults to today
+
+    Returns:
+        LocalParseResult with the profile and its confidence
+    """
+    today = today or date.today()
+    heading_indices = heading_indices or set()
+    lines = [line.replace('\t', ' ').strip() for line in lines]
+
+    sections: Dict[str, List[str]] = {'header': []}
+    current = 'header'
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        section = _section_of(line)
+        if section is None and i in heading_indices:
+            section = 'other'
+        if section:
+            current = section
+            sections.setdefault(current, [])
+            continue
+        sections[current].append(line)
+
+    non_empty = [line for line in lines if line]
+    basics = _parse_basics(sections['header'], non_empty)
+    experiences, unattached = _parse_experiences(sections.get('experience', []), today)
+    trainings = _parse_trainings(sections.get('qualifications', []))
+
+    notes = []
+    confidence = 0.0
+    if basics['first_name'] and basics['last_name']:
+        confidence += 0.2
+    else:
+        notes.append("no name found")
+    if basics['email'] or basics['phone']:
+        confidence += 0.1
+    else:
+        notes.append("no contact details")
+    if 'experience' in sections:
+        confidence += 0.15
+    else:
+        notes.append("no experience section")
+    if experiences:
+        complete = sum(1 for e in experiences if e['title'] and e['company'] and e['duration_in_months'] > 0)
+        confidence += 0.35 * complete / len(experiences)
+        if complete < len(experiences):
+            notes.append(f"{len(experiences) - complete} of {len(experiences)} experiences incomplete")
+        if unattached == 0:
+            confidence += 0.1
+        else:
+            notes.append(f"{unattached} experience lines before the first dated entry")
+    else:
+        notes.append("no dated experience entries")
+    if 'qualifications' not in sections or trainings:
+        confidence += 0.1
+
+    profile = {
+        'basics': basics,
+        'professional_experiences': experiences,
+        'trainings_and_certifications': trainings
+    }
+    if sections.get('summary'):
+        profile['summary'] = ' '.join(sections['summary'])
+    return LocalParseResult(profile, round(confidence, 3), notes)
+
+def can_parse_locally(file_path: str, filename: str) -> bool:
+    """True for .txt files and .docx files without layout the line-based parser can't follow."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in LOCAL_PARSER_EXTENSIONS:
+        return False
+    if extension == 'docx':
+        return not assess_docx_complexity(file_path).complex
+    return True
+
+def parse_file(file_path: str, filename: str, checked: bool = False) -> Optional[LocalParseResult]:
+    """
+    Parse a CV file locally.
+
+    Args:
+        file_path: Path to the CV file
+        filename: Original filename
+        checked: True if can_parse_locally has already accepted this file
+
+    Returns:
+        LocalParseResult, or None if the file type or layout isn't supported
+    """
+    if not checked and not can_parse_locally(file_path, filename):
+        return None
+    if filename.lower().endswith('.docx'):
+        lines, headings = _read_docx_lines(file_path)
+        return parse_lines(lines, headings)
+    return parse_lines(_read_text_lines(file_path))
@@ -1,7 +1,7 @@
 from pathlib import Path
 import json
 import re
-from firebase_utils import upload_file
+from storage import get_storage_backend
 
 class LocationService:
     def __init__(self, locations_file: str = 'data/nz_locations.json'):
@@ -86,14 +86,14 @@ class LocationService:
 
 def process_location_data(location_info: str) -> str:
     """
-    Process location info (for example, perform any transformation) and upload the result to Firebase Storage.
+    Process location info (for example, perform any transformation) and store the result.
     
     In this example, the location info is simply converted to uppercase, encoded,
-    and then uploaded using the Firebase upload_file function. The function returns
-    the public URL for the uploaded data.
+    and then stored using the configured storage backend. The function returns
+    the URL for the stored data.
     """
     processed_data = location_info.upper().encode("utf-8")
-    public_url = upload_file("location_data.txt", processed_data)
+    public_url = get_storage_backend().upload("location_data.txt", data=processed_data)
     return public_url
 
 # Example usage:
@@ -0,0 +1,307 @@
+"""
+Pool of warm headless LibreOffice converters.
+
+Starting LibreOffice costs several seconds, so converting one document per
+`soffice --convert-to` run is slow. Each worker here is a long-lived unoserver
+process (its own LibreOffice instance and user profile) that takes conversion
+requests over XML-RPC. At steady state a conversion is only the rendering
+itself.
+
+Workers are health-checked when they are checked out, restarted after a failure
+or timeout, and recycled after OFFICE_RECYCLE_AFTER conversions to bound
+LibreOffice's memory growth. Callers wait up to OFFICE_QUEUE_TIMEOUT seconds for
+a free worker. stats() reports throughput and latency.
+
+Requires the unoserver package (`pip install unoserver`) and LibreOffice on the host.
+"""
+
+import os
+import time
+import queue
+import atexit
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import xmlrpc.client
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from logger import log_info, log_error, log_warning
+
+# Load environment variables
+load_dotenv('config.env')
+
+OFFICE_POOL_SIZE = int(os.getenv("OFFICE_POOL_SIZE", "2"))
+# Unset: free ports are picked per worker, so several processes can each run a pool
+OFFICE_BASE_PORT = int(os.getenv("OFFICE_BASE_PORT", "0"))
+OFFICE_RECYCLE_AFTER = int(os.getenv("OFFICE_RECYCLE_AFTER", "200"))
+OFFICE_CONVERT_TIMEOUT = float(os.getenv("OFFICE_CONVERT_TIMEOUT", "60"))
+OFFICE_QUEUE_TIMEOUT = float(os.getenv("OFFICE_QUEUE_TIMEOUT", "30"))
+OFFICE_STARTUP_TIMEOUT = float(os.getenv("OFFICE_STARTUP_TIMEOUT", "30"))
+UNOSERVER_COMMAND = os.getenv("UNOSERVER_COMMAND", "unoserver")
+SOFFICE_PATH = os.getenv("SOFFICE_PATH", "")
+
+class OfficeConversionError(Exception):
+    """Raised when a document cannot be converted."""
+    pass
+
+def _free_port() -> int:
+    """A port that is free on the loopback interface right now."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    """XML-RPC transport whose socket operations time out."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        return conn
+
+class OfficeWorker:
+    """One unoserver process and the LibreOffice instance it owns."""
+
+    def __init__(self, index: int, port: int = 0):
+        """
+        Args:
+            index: Worker number, used in logs
+            port: XML-RPC port, with the UNO port the next one up; 0 picks free ports on each start
+        """
+        self.index = index
+        self.fixed_port = port
+        self.port = port
+        self.uno_port = port + 1 if port else 0
+        self.process: Optional[subprocess.Popen] = None
+        self.profile_dir: Optional[str] = None
+        self.conversions = 0
+
+    def start(self) -> None:
+        """Start the server and wait until it accepts requests."""
+        if not self.fixed_port:
+            self.port, self.uno_port = _free_port(), _free_port()
+        # A private profile per worker; instances sharing one profile block each other
+        self.profile_dir = tempfile.mkdtemp(prefix=f"office_worker_{self.index}_")
+        command = [UNOSERVER_COMMAND, '--interface', '127.0.0.1', '--port', str(self.port),
+                   '--uno-port', str(self.uno_port),
+                   '--user-installation', Path(self.profile_dir).as_uri()]
+        if SOFFICE_PATH:
+            command += ['--executable', SOFFICE_PATH]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                            start_new_session=True)
+        except OSError as e:
+            raise OfficeConversionError(f"Could not start {UNOSERVER_COMMAND}: {e}") from e
+
+        deadline = time.monotonic() + OFFICE_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.healthy():
+                self.conversions = 0
+                log_info(f"Office worker {self.index} ready on port {self.port}")
+                return
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.25)
+        self.stop()
+        raise OfficeConversionError(f"Office worker {self.index} did not start within {OFFICE_STARTUP_TIMEOUT:.0f}s")
+
+    def healthy(self) -> bool:
+        """True if the process is alive and its XML-RPC port accepts connections."""
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def convert(self, input_path: str, output_path: str, output_format: str) -> None:
+        """Convert input_path to output_path; both must be on this host."""
+        proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{self.port}", allow_none=True,
+                                          transport=_TimeoutTransport(OFFICE_CONVERT_TIMEOUT))
+        # unoserver's convert(inpath, indata, outpath, convert_to)
+        proxy.convert(os.path.abspath(input_path), None, os.path.abspath(output_path), output_format)
+        self.conversions += 1
+
+    def stop(self) -> None:
+        """Stop the server and LibreOffice, and remove the profile."""
+        if self.process is not None and self.process.poll() is None:
+            try:
+                # The server runs in its own session, so this also reaches LibreOffice
+                os.killpg(self.process.pid, 15)
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(self.process.pid, 9)
+                except OSError:
+                    pass
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+class OfficePool:
+    """A fixed set of OfficeWorkers shared by all threads in the process."""
+
+    def __init__(self, size: int = OFFICE_POOL_SIZE, base_port: int = OFFICE_BASE_PORT,
+                 recycle_after: int = OFFICE_RECYCLE_AFTER, queue_timeout: float = OFFICE_QUEUE_TIMEOUT):
+        """
+        Args:
+            size: Number of LibreOffice workers
+            base_port: First port, each worker using two consecutive ports; 0 picks free ports
+            recycle_after: Conversions after which a worker is restarted
+            queue_timeout: Seconds to wait for a free worker before failing
+        """
+        self.recycle_after = recycle_after
+        self.queue_timeout = queue_timeout
+        self.workers: List[OfficeWorker] = [OfficeWorker(i, base_port + 2 * i if base_port else 0) for i in range(size)]
+        self._idle: queue.Queue = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'conversions': 0, 'failures': 0, 'timeouts': 0, 'restarts': 0,
+                       'convert_seconds': 0.0, 'wait_seconds': 0.0, 'waiting': 0}
+        self._started_at = time.monotonic()
+
+    def start(self) -> None:
+        """Start all workers. Workers that fail to start are retried when next checked out."""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            threads = [threading.Thread(target=self._start_worker, args=(worker,)) for worker in self.workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self._idle = queue.Queue()
+            for worker in self.workers:
+                self._idle.put(worker)
+            self._started = True
+            self._started_at = time.monotonic()
+            atexit.register(self.shutdown)
+
+    def _start_worker(self, worker: OfficeWorker) -> None:
+        try:
+            worker.start()
+        except OfficeConversionError as e:
+            log_error(f"Office worker {worker.index} failed to start", e)
+
+    def _record(self, **increments) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def convert(self, input_path: str, output_path: str, output_format: str = 'pdf') -> str:
+        """
+        Convert a document with the next free worker.
+
+        Args:
+            input_path: Document to convert
+            output_path: Where to write the converted document
+            output_format: LibreOffice filter extension, e.g. 'pdf' or 'docx'
+
+        Returns:
+            output_path
+
+        Raises:
+            OfficeConversionError: If no worker is free in time or the conversion fails
+        """
+        self.start()
+        self._record(waiting=1)
+        wait_start = time.monotonic()
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            self._record(failures=1, waiting=-1)
+            raise OfficeConversionError(f"No office worker free after {self.queue_timeout:.0f}s")
+        self._record(waiting=-1, wait_seconds=time.monotonic() - wait_start)
+
+        try:
+            if not worker.healthy():
+                log_warning(f"Office worker {worker.index} failed its health check, restarting")
+                self._restart(worker)
+            convert_start = time.monotonic()
+            worker.convert(input_path, output_path, output_format)
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                raise OfficeConversionError(f"Conversion of {input_path} produced no output")
+            self._record(conversions=1, convert_seconds=time.monotonic() - convert_start)
+            if worker.conversions >= self.recycle_after:
+                log_info(f"Recycling office worker {worker.index} after {worker.conversions} conversions")
+                # The output is already written; a failed restart is the next health check's problem
+                self._restart(worker, quiet=True)
+            return output_path
+        except socket.timeout as e:
+            self._record(failures=1, timeouts=1)
+            log_warning(f"Office worker {worker.index} timed out converting {input_path}, restarting")
+            self._restart(worker, quiet=True)
+            raise OfficeConversionError(f"Conversion timed out after {OFFICE_CONVERT_TIMEOUT:.0f}s") from e
+        except (OSError, xmlrpc.client.Error) as e:
+            self._record(failures=1)
+            self._restart(worker, quiet=True)
+            raise OfficeConversionError(f"Conversion of {input_path} failed: {e}") from e
+        except OfficeConversionError:
+            self._record(failures=1)
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def _restart(self, worker: OfficeWorker, quiet: bool = False) -> None:
+        """Restart a worker; with quiet, a failed restart is left for the next health check."""
+        self._record(restarts=1)
+        try:
+            worker.restart()
+        except OfficeConversionError as e:
+            if not quiet:
+                raise
+            log_error(f"Office worker {worker.index} could not be restarted", e)
+
+    def stats(self) -> Dict[str, float]:
+        """Conversion counts, mean latencies and throughput since the pool started."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        conversions = stats['conversions']
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            'workers': len(self.workers),
+            'healthy_workers': sum(1 for w in self.workers if w.healthy()),
+            'idle_workers': self._idle.qsize(),
+            'waiting': stats['waiting'],
+            'conversions': conversions,
+            'failures': stats['failures'],
+            'timeouts': stats['timeouts'],
+            'restarts': stats['restarts'],
+            'mean_convert_ms': round(stats['convert_seconds'] / conversions * 1000, 1) if conversions else None,
+            'mean_wait_ms': round(stats['wait_seconds'] / (conversions + stats['failures']) * 1000, 1)
+                            if conversions + stats['failures'] else None,
+            'conversions_per_minute': round(conversions / elapsed * 60, 2)
+        }
+
+    def shutdown(self) -> None:
+        """Stop every worker."""
+        for worker in self.workers:
+            worker.stop()
+        self._started = False
+
+_office_pool: Optional[OfficePool] = None
+_office_pool_lock = threading.Lock()
+
+def get_office_pool() -> OfficePool:
+    """Return the process-wide converter pool, creating it on first use."""
+    global _office_pool
+    if _office_pool is None:
+        with _office_pool_lock:
+            if _office_pool is None:
+                _office_pool = OfficePool()
+    return _office_pool
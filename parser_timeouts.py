@@ -0,0 +1,274 @@
+"""
+Per-document parser timeouts learned from recent parse latencies.
+
+Every parser call records how long it took, keyed by file type, document kind
+(from pdf_preflight), a page-count bucket and a file-size bucket. A timeout is
+the PARSER_TIMEOUT_QUANTILE latency of the most specific key with enough
+samples, times PARSER_TIMEOUT_MARGIN, clamped to the bounds in pdf_preflight.
+Small text PDFs then fail fast and large scanned ones get the time they need.
+
+Until a document's own key has PARSER_LATENCY_MIN_SAMPLES samples, its timeout
+is the pre-flight heuristic (or CVPARSER_TIMEOUT without one), raised to the
+estimate from broader keys if that is longer. Latencies pooled from other kinds
+of document can only lengthen the prior, never shorten it, so the first scanned
+PDFs after a run of text PDFs still get the time they need.
+
+A timed-out call is recorded at its timeout. That is a lower bound on the real
+latency, so once more than 1 - PARSER_TIMEOUT_QUANTILE of a key's calls time
+out, its timeout grows by the margin until calls start finishing. Samples are
+kept in SQLite so all worker processes learn from each other.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import zipfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from eta_estimator import file_type_of, percentile, size_bucket
+from pdf_preflight import PARSER_TIMEOUT_MAX, PARSER_TIMEOUT_MIN, PreflightReport, suggested_timeout
+
+# Load environment variables
+load_dotenv('config.env')
+
+PARSER_LATENCY_STORE_PATH = os.environ.get("PARSER_LATENCY_STORE_PATH", "data/parser_latencies.db")
+PARSER_TIMEOUT_QUANTILE = float(os.getenv("PARSER_TIMEOUT_QUANTILE", "0.95"))
+PARSER_TIMEOUT_MARGIN = float(os.getenv("PARSER_TIMEOUT_MARGIN", "1.5"))
+PARSER_LATENCY_SAMPLES_PER_KEY = int(os.getenv("PARSER_LATENCY_SAMPLES_PER_KEY", "200"))
+PARSER_LATENCY_MIN_SAMPLES = int(os.getenv("PARSER_LATENCY_MIN_SAMPLES", "10"))
+ADAPTIVE_PARSER_TIMEOUTS = os.getenv("ADAPTIVE_PARSER_TIMEOUTS", "true").lower() == "true"
+
+# Seconds between reloads of the sample cache from the shared database
+REFRESH_INTERVAL_SECONDS = 30
+
+# Upper bounds of the page-count buckets
+PAGE_BUCKETS = (1, 2, 4, 8)
+
+_DOCX_PAGES_RE = re.compile(rb'<Pages>(\d+)</Pages>')
+
+def page_bucket(page_count: Optional[int]) -> str:
+    """Map a page count to a coarse bucket label."""
+    if not page_count:
+        return 'unknown'
+    for i, limit in enumerate(PAGE_BUCKETS):
+        if page_count <= limit:
+            return f"p{i}"
+    return f"p{len(PAGE_BUCKETS)}"
+
+@dataclass
+class ParseFeatures:
+    """The document characteristics parser latency is conditioned on."""
+    file_type: str = 'unknown'
+    byte_size: Optional[int] = None
+    page_count: Optional[int] = None
+    kind: str = 'unknown'  # text, mixed or scanned for analysed PDFs
+    fallback_timeout: Optional[float] = None  # heuristic used until the key has history
+
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.file_type, self.kind, page_bucket(self.page_count), size_bucket(self.byte_size))
+
+def _docx_page_count(file_path: str) -> Optional[int]:
+    """Page count Word saved in docProps/app.xml, if any."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            match = _DOCX_PAGES_RE.search(archive.read('docProps/app.xml'))
+    except (zipfile.BadZipFile, KeyError, OSError):
+        return None
+    return int(match.group(1)) if match else None
+
+def document_features(file_path: str, filename: str, report: Optional[PreflightReport] = None) -> ParseFeatures:
+    """
+    Describe a document about to be parsed.
+
+    Args:
+        file_path: Local copy of the document
+        filename: Name sent to the parser
+        report: Pre-flight report, for PDFs
+
+    Returns:
+        ParseFeatures for the latency model
+    """
+    file_type = file_type_of(filename)
+    if report is not None and report.kind != 'unknown':
+        return ParseFeatures(file_type, report.byte_size, report.page_count, report.kind, suggested_timeout(report))
+    page_count = _docx_page_count(file_path) if file_type == 'docx' else None
+    return ParseFeatures(file_type, os.path.getsize(file_path), page_count)
+
+class ParserLatencyModel:
+    """Online model of parser latency conditioned on document characteristics."""
+
+    def __init__(self, db_path: str = PARSER_LATENCY_STORE_PATH, samples_per_key: int = PARSER_LATENCY_SAMPLES_PER_KEY,
+                 min_samples: int = PARSER_LATENCY_MIN_SAMPLES, quantile: float = PARSER_TIMEOUT_QUANTILE,
+                 margin: float = PARSER_TIMEOUT_MARGIN):
+        """
+        Args:
+            db_path: SQLite file shared by all worker processes
+            samples_per_key: Recent samples kept for each key
+            min_samples: Samples needed before a key's latencies are trusted
+            quantile: Latency quantile the timeout is based on
+            margin: Multiplier applied to that quantile
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.samples_per_key = samples_per_key
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.margin = margin
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # key -> [(latency, timed_out)], oldest first
+        self._samples: Dict[Tuple[str, str, str, str], List[Tuple[float, bool]]] = {}
+        self._loaded_at = 0.0
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS parser_latencies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_type TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                page_bucket TEXT NOT NULL,
+                size_bucket TEXT NOT NULL,
+                latency REAL NOT NULL,
+                timed_out INTEGER NOT NULL,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_parser_latencies_key "
+            "ON parser_latencies (file_type, kind, page_bucket, size_bucket, id)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the sample database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, features: ParseFeatures, latency: float, timed_out: bool = False) -> None:
+        """
+        Record a parser call.
+
+        Args:
+            features: The document that was parsed
+            latency: Seconds the call took; for a timeout, the timeout
+            timed_out: True if the call was cut off
+        """
+        key = features.key()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO parser_latencies (file_type, kind, page_bucket, size_bucket, latency, timed_out, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*key, latency, int(timed_out), time.time())
+        )
+        conn.execute(
+            "DELETE FROM parser_latencies WHERE file_type = ? AND kind = ? AND page_bucket = ? AND size_bucket = ? "
+            "AND id NOT IN (SELECT id FROM parser_latencies WHERE file_type = ? AND kind = ? AND page_bucket = ? "
+            "AND size_bucket = ? ORDER BY id DESC LIMIT ?)",
+            (*key, *key, self.samples_per_key)
+        )
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append((latency, timed_out))
+            del samples[:-self.samples_per_key]
+
+    def _refresh(self) -> None:
+        """Reload samples from the shared database if the cache is stale."""
+        if time.time() - self._loaded_at < REFRESH_INTERVAL_SECONDS:
+            return
+        rows = self._connect().execute(
+            "SELECT file_type, kind, page_bucket, size_bucket, latency, timed_out FROM parser_latencies ORDER BY id"
+        ).fetchall()
+        samples: Dict[Tuple[str, str, str, str], List[Tuple[float, bool]]] = {}
+        for file_type, kind, pages, size, latency, timed_out in rows:
+            samples.setdefault((file_type, kind, pages, size), []).append((latency, bool(timed_out)))
+        with self._lock:
+            self._samples = samples
+            self._loaded_at = time.time()
+
+    def _samples_for(self, key: Tuple[str, str, str, str]) -> Tuple[str, List[Tuple[float, bool]]]:
+        """
+        Samples for the most specific prefix of key with enough of them.
+
+        Returns:
+            (level, samples): level names the key fields matched, samples is empty if none qualified
+        """
+        self._refresh()
+        levels = (('type/kind/pages/size', 4), ('type/kind/pages', 3), ('type/kind', 2), ('type', 1))
+        with self._lock:
+            for level, width in levels:
+                prefix = key[:width]
+                samples = [s for k, values in self._samples.items() if k[:width] == prefix for s in values]
+                if len(samples) >= self.min_samples:
+                    return level, samples
+        return 'none', []
+
+    def _timeout_from(self, samples: List[Tuple[float, bool]]) -> float:
+        latencies = sorted(latency for latency, _ in samples)
+        timeout = percentile(latencies, self.quantile) * self.margin
+        return max(PARSER_TIMEOUT_MIN, min(PARSER_TIMEOUT_MAX, timeout))
+
+    def timeout_for(self, features: ParseFeatures, default: float) -> Tuple[float, str]:
+        """
+        Pick the parser timeout for a document.
+
+        Args:
+            features: The document about to be parsed
+            default: Timeout when neither history nor a heuristic is available
+
+        Returns:
+            (timeout in seconds, where it came from: 'learned', 'heuristic', 'default',
+            or the broader key level whose estimate was longer than the prior)
+        """
+        level, samples = self._samples_for(features.key())
+        if level == 'type/kind/pages/size':
+            return self._timeout_from(samples), 'learned'
+        prior, source = (features.fallback_timeout, 'heuristic') if features.fallback_timeout else (default, 'default')
+        if samples:
+            pooled = self._timeout_from(samples)
+            if pooled > prior:
+                return pooled, level
+        return prior, source
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-key sample counts, latency percentiles, timeout rates and the timeout currently chosen."""
+        self._refresh()
+        with self._lock:
+            snapshot = {key: list(values) for key, values in self._samples.items()}
+        keys = []
+        for key, samples in sorted(snapshot.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            completed = sorted(latency for latency, timed_out in samples if not timed_out)
+            keys.append({
+                'file_type': key[0], 'kind': key[1], 'page_bucket': key[2], 'size_bucket': key[3],
+                'samples': len(samples),
+                'timeouts': len(samples) - len(completed),
+                'p50': round(percentile(completed, 0.5), 2) if completed else None,
+                'p95': round(percentile(completed, 0.95), 2) if completed else None,
+                'timeout': round(self._timeout_from(samples), 1) if len(samples) >= self.min_samples else None,
+            })
+        return {
+            'quantile': self.quantile,
+            'margin': self.margin,
+            'min_samples': self.min_samples,
+            'bounds': [PARSER_TIMEOUT_MIN, PARSER_TIMEOUT_MAX],
+            'samples': sum(k['samples'] for k in keys),
+            'keys': keys
+        }
+
+_latency_model: Optional[ParserLatencyModel] = None
+_latency_model_lock = threading.Lock()
+
+def get_parser_latency_model() -> ParserLatencyModel:
+    """Return the process-wide parser latency model, creating it on first use."""
+    global _latency_model
+    if _latency_model is None:
+        with _latency_model_lock:
+            if _latency_model is None:
+                _latency_model = ParserLatencyModel()
+    return _latency_model
@@ -0,0 +1,209 @@
+"""
+Cheap local pre-flight analysis of uploaded PDFs.
+
+Before a PDF goes to the remote parser, its raw bytes are scanned for page count,
+text layer, embedded images and encryption. Flate streams, including
+compressed object streams, are inflated within a fixed budget. No PDF library
+is needed, and a CV-sized file takes a few milliseconds.
+
+route_pdf turns the report into a routing decision:
+- reject early with a helpful message (too many pages, nothing to read);
+- send slow documents (scanned, long or image-heavy) to their own parser lane,
+  so they don't hold the slots fast documents need.
+
+suggested_timeout gives a parser timeout from the report, which parser_timeouts
+uses until it has seen enough documents like this one.
+"""
+
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config.env')
+
+PREFLIGHT_MAX_PAGES = int(os.getenv("PREFLIGHT_MAX_PAGES", "20"))
+PREFLIGHT_MAX_SCANNED_PAGES = int(os.getenv("PREFLIGHT_MAX_SCANNED_PAGES", "10"))
+PREFLIGHT_SLOW_PAGES = int(os.getenv("PREFLIGHT_SLOW_PAGES", "5"))
+PREFLIGHT_SLOW_BYTES = int(os.getenv("PREFLIGHT_SLOW_SIZE_MB", "5")) * 1024 * 1024
+
+# Per-document parser timeout bounds, in seconds
+PARSER_TIMEOUT_MIN = float(os.getenv("PARSER_TIMEOUT_MIN_SECONDS", "10"))
+PARSER_TIMEOUT_MAX = float(os.getenv("PARSER_TIMEOUT_MAX_SECONDS", "90"))
+
+# Bytes of stream data inflated per document; content streams beyond this are not scanned
+DECOMPRESS_BUDGET = 8 * 1024 * 1024
+MAX_STREAM_OUTPUT = 1024 * 1024
+
+_OBJ_RE = re.compile(rb'\d+\s+\d+\s+obj\b')
+_STREAM_RE = re.compile(rb'(?<!end)stream\r?\n')
+_PAGE_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_PAGES_COUNT_RE = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.DOTALL)
+_IMAGE_RE = re.compile(rb'/Subtype\s*/Image\b')
+_OBJSTM_RE = re.compile(rb'/Type\s*/ObjStm\b')
+_SKIP_STREAM_RE = re.compile(rb'/Type\s*/(?:XRef|Metadata|EmbeddedFile)\b|/Length[123]\b|/Subtype\s*/(?:Type1C|CIDFontType0C|OpenType|XML)\b')
+_FLATE_RE = re.compile(rb'/FlateDecode\b|/Fl\b')
+_WIDTH_RE = re.compile(rb'/Width\s+(\d+)')
+_HEIGHT_RE = re.compile(rb'/Height\s+(\d+)')
+_TEXT_SHOW_RE = re.compile(rb'(?:\)|>)\s*(?:Tj|\'|")|\]\s*TJ')
+_ENCRYPT_RE = re.compile(rb'/Encrypt\s+\d+\s+\d+\s+R|/Encrypt\s*<<')
+
+@dataclass
+class PreflightReport:
+    """What a quick look at a PDF found."""
+    byte_size: int
+    page_count: int = 0
+    has_text_layer: bool = False
+    text_operators: int = 0
+    image_count: int = 0
+    image_bytes: int = 0
+    image_pixels: int = 0
+    encrypted: bool = False
+    kind: str = 'unknown'  # text, mixed, scanned, empty or unknown
+    complete: bool = True  # False if the decompression budget ran out before every stream was scanned
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class PreflightDecision:
+    """How a PDF should be handled."""
+    accept: bool
+    lane: str = 'parser'
+    message: Optional[str] = None
+    reasons: List[str] = field(default_factory=list)
+
+def _inflate(raw: bytes, budget: int) -> bytes:
+    """Inflate a Flate stream, stopping at MAX_STREAM_OUTPUT or budget bytes; b'' if it is corrupt."""
+    try:
+        return zlib.decompressobj().decompress(raw, min(MAX_STREAM_OUTPUT, budget))
+    except zlib.error:
+        return b''
+
+def preflight_pdf(file_path: str) -> PreflightReport:
+    """
+    Scan a PDF without fully parsing it.
+
+    Args:
+        file_path: Path to the PDF
+
+    Returns:
+        PreflightReport; kind is 'unknown' if the file doesn't look like a PDF
+    """
+    start = time.perf_counter()
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    report = PreflightReport(byte_size=len(data))
+    if not data.startswith(b'%PDF-'):
+        report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        return report
+
+    report.encrypted = bool(_ENCRYPT_RE.search(data))
+    budget = DECOMPRESS_BUDGET
+    object_text = [data]
+
+    for match in _STREAM_RE.finditer(data):
+        # The stream dictionary runs from the enclosing "N G obj" to the stream keyword
+        head_start = max(0, match.start() - 4096)
+        obj_matches = list(_OBJ_RE.finditer(data, head_start, match.start()))
+        if not obj_matches:
+            continue
+        head = data[obj_matches[-1].end():match.start()]
+        body_end = data.find(b'endstream', match.end())
+        if body_end < 0:
+            break
+        # The end-of-line before endstream isn't stream data
+        raw = data[match.end():body_end]
+        raw = raw[:-2] if raw.endswith(b'\r\n') else raw[:-1] if raw.endswith((b'\n', b'\r')) else raw
+
+        if _IMAGE_RE.search(head):
+            report.image_count += 1
+            report.image_bytes += len(raw)
+            width, height = _WIDTH_RE.search(head), _HEIGHT_RE.search(head)
+            if width and height:
+                report.image_pixels += int(width.group(1)) * int(height.group(1))
+            continue
+        if _SKIP_STREAM_RE.search(head):
+            continue
+        if budget <= 0:
+            report.complete = False
+            continue
+
+        content = _inflate(raw, budget) if _FLATE_RE.search(head) else raw
+        budget -= len(content)
+        if _OBJSTM_RE.search(head):
+            # Compressed objects: page dictionaries and image XObjects' dictionaries live here
+            object_text.append(content)
+        else:
+            report.text_operators += len(_TEXT_SHOW_RE.findall(content))
+
+    report.page_count = sum(len(_PAGE_RE.findall(text)) for text in object_text)
+    if report.page_count == 0:
+        counts = [int(a or b) for text in object_text for a, b in _PAGES_COUNT_RE.findall(text)]
+        report.page_count = max(counts, default=0)
+
+    report.has_text_layer = report.text_operators > 0
+    if report.has_text_layer:
+        report.kind = 'text' if report.image_bytes < report.byte_size / 2 else 'mixed'
+    else:
+        report.kind = 'scanned' if report.image_count else 'empty'
+    report.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    return report
+
+def suggested_timeout(report: PreflightReport) -> float:
+    """
+    Parser timeout from document characteristics: text PDFs parse in a few seconds,
+    while scanned pages need OCR.
+    """
+    if not report.complete:
+        return PARSER_TIMEOUT_MAX
+    if report.kind == 'scanned':
+        timeout = 20 + 8 * report.page_count
+    else:
+        timeout = 8 + 2 * report.page_count + 4 * report.image_bytes / (1024 * 1024)
+    return float(max(PARSER_TIMEOUT_MIN, min(PARSER_TIMEOUT_MAX, timeout)))
+
+def route_pdf(report: PreflightReport) -> PreflightDecision:
+    """
+    Decide whether and how to send a PDF to the parser.
+
+    Returns:
+        PreflightDecision; if accept is False, message explains what the user should do
+    """
+    if report.kind == 'unknown':
+        # Not something we can analyse; let the parser have its usual attempt
+        return PreflightDecision(True, reasons=["not analysed"])
+    if report.encrypted:
+        # Usually just an owner password restricting printing, which the parser reads through,
+        # but the streams can't be inspected here
+        return PreflightDecision(True, reasons=["encrypted, contents not analysed"])
+    if report.page_count > PREFLIGHT_MAX_PAGES:
+        return PreflightDecision(False, message=f"This PDF has {report.page_count} pages, which is more than a CV should have "
+                                                f"(maximum {PREFLIGHT_MAX_PAGES}). Please upload just the CV.",
+                                 reasons=[f"{report.page_count} pages"])
+    if not report.complete:
+        # Text may be in the streams that weren't scanned, so don't judge the content
+        return PreflightDecision(True, lane='parser_slow', reasons=["too large to scan fully"])
+    if report.kind == 'empty':
+        return PreflightDecision(False, message="This PDF has no readable text or images. Please export the CV to PDF again, "
+                                                "or upload the original Word document.",
+                                 reasons=["no text layer or images"])
+    if report.kind == 'scanned' and report.page_count > PREFLIGHT_MAX_SCANNED_PAGES:
+        return PreflightDecision(False, message="This looks like a long scanned document. Please upload the original Word "
+                                                "document or a PDF exported from it.",
+                                 reasons=[f"scanned, {report.page_count} pages"])
+
+    reasons = []
+    if report.kind == 'scanned':
+        reasons.append("scanned")
+    if report.page_count > PREFLIGHT_SLOW_PAGES:
+        reasons.append(f"{report.page_count} pages")
+    if report.byte_size > PREFLIGHT_SLOW_BYTES:
+        reasons.append(f"{report.byte_size // (1024 * 1024)} MB")
+    lane = 'parser_slow' if reasons else 'parser'
+    return PreflightDecision(True, lane=lane, reasons=reasons or [report.kind])
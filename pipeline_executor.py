@@ -0,0 +1,135 @@
+"""
+Bounded-concurrency execution of CV pipelines.
+
+Pipelines run on a fixed pool of threads, and each external dependency a pipeline
+touches (storage, the CV parser, Claude, document rendering) has its own limit,
+so a large batch can't flood one service even when the pool has spare threads.
+Batch work may only fill a dependency's slots up to INTERACTIVE_RESERVED_SLOTS
+short of its limit, so single uploads never queue behind a whole batch.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from dotenv import load_dotenv
+from logger import log_info
+
+# Load environment variables
+load_dotenv('config.env')
+
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+
+# Concurrent calls allowed into each dependency, across all pipelines in this process
+DEPENDENCY_LIMITS = {
+    'storage': int(os.getenv("STORAGE_CONCURRENCY", "4")),
+    'parser': int(os.getenv("PARSER_CONCURRENCY", "2")),
+    # Scanned and long PDFs (see pdf_preflight) queue here, so they can't hold every parser slot
+    'parser_slow': int(os.getenv("PARSER_SLOW_CONCURRENCY", "1")),
+    'claude': int(os.getenv("CLAUDE_CONCURRENCY", "2")),
+    'render': int(os.getenv("RENDER_CONCURRENCY", "2")),
+}
+
+# Slots of each dependency that batch work can't take; a dependency with no more
+# slots than this still lets one batch call through at a time
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1"))
+
+_dependency_semaphores: Dict[str, threading.BoundedSemaphore] = {
+    name: threading.BoundedSemaphore(limit) for name, limit in DEPENDENCY_LIMITS.items()
+}
+_batch_semaphores: Dict[str, threading.BoundedSemaphore] = {
+    name: threading.BoundedSemaphore(max(1, limit - INTERACTIVE_RESERVED_SLOTS))
+    for name, limit in DEPENDENCY_LIMITS.items()
+}
+_priority = threading.local()
+
+@contextmanager
+def batch_priority():
+    """Mark the dependency calls made by this thread while the block runs as batch work."""
+    previous = getattr(_priority, 'batch', False)
+    _priority.batch = True
+    try:
+        yield
+    finally:
+        _priority.batch = previous
+
+@contextmanager
+def dependency_slot(name: str):
+    """
+    Hold one of the concurrency slots for a dependency while the block runs.
+    Batch work (see batch_priority) first takes one of the dependency's batch slots.
+
+    Args:
+        name: Dependency name, one of DEPENDENCY_LIMITS
+    """
+    semaphore = _dependency_semaphores[name]
+    batch_semaphore = _batch_semaphores[name] if getattr(_priority, 'batch', False) else None
+    if batch_semaphore is not None:
+        batch_semaphore.acquire()
+    try:
+        with semaphore:
+            yield
+    finally:
+        if batch_semaphore is not None:
+            batch_semaphore.release()
+
+class PipelineExecutor:
+    """
+    Thread pool that runs at most max_workers pipelines at once and queues the rest.
+    Pipelines run here count as batch work for dependency slots.
+    """
+
+    def __init__(self, max_workers: int = PIPELINE_CONCURRENCY):
+        """
+        Args:
+            max_workers: Number of pipelines that may run concurrently
+        """
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) to run when a worker is free."""
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                with batch_priority():
+                    return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        def on_done(future: Future):
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+
+        future = self._pool.submit(run)
+        future.add_done_callback(on_done)
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of queued and running pipelines."""
+        with self._lock:
+            return {'queued': self._queued, 'running': self._running, 'max_workers': self.max_workers}
+
+_pipeline_executor: Optional[PipelineExecutor] = None
+_pipeline_executor_lock = threading.Lock()
+
+def get_pipeline_executor() -> PipelineExecutor:
+    """Return the process-wide pipeline executor, creating it on first use."""
+    global _pipeline_executor
+    if _pipeline_executor is None:
+        with _pipeline_executor_lock:
+            if _pipeline_executor is None:
+                _pipeline_executor = PipelineExecutor()
+                log_info(f"Pipeline executor started with {PIPELINE_CONCURRENCY} workers, limits {DEPENDENCY_LIMITS}")
+    return _pipeline_executor
@@ -1,14 +1,14 @@
 import json
 import re
 from pathlib import Path
-from firebase_utils import download_file, upload_file
+from storage import get_storage_backend
 
 def extract_projects_from_json(json_path: str) -> dict:
     try:
         filename = Path(json_path).name
-        file_data = download_file(filename)
+        file_data = get_storage_backend().download(filename)
         if not file_data:
-            raise FileNotFoundError(f"File not found in Firebase Storage: {json_path}")
+            raise FileNotFoundError(f"File not found in storage: {json_path}")
 
         # Decode the downloaded bytes and load JSON.
         json_str = file_data.decode("utf-8")
@@ -110,14 +110,14 @@ def extract_projects_from_json(json_path: str) -> dict:
 
 def extract_project_summary() -> str:
     """
-    Create a summary for project extraction and upload it to Firebase Storage.
+    Create a summary for project extraction and store it.
     
     Instead of saving the summary locally, this function encodes the summary,
-    uploads it to Firebase Storage, and returns the public URL.
+    stores it with the configured storage backend, and returns its URL.
     """
     summary = "Project extraction completed successfully."
     data = summary.encode("utf-8")
-    public_url = upload_file("project_summary.txt", data)
+    public_url = get_storage_backend().upload("project_summary.txt", data=data)
     return public_url
 
 # Example usage:
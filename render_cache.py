@@ -0,0 +1,294 @@
+"""
+Disk cache of rendered CV documents.
+
+A rendered document is fully determined by the prepared context and the template,
+so it is cached under a hash of the two. Rendering the same context with the same
+template again becomes a file lookup. Entries are evicted least recently used
+once the cache exceeds RENDER_CACHE_MAX_MB.
+
+The cache also remembers which entry each output filename was last rendered
+from, so downloads can be served straight from it with a content-hash ETag.
+
+outputs/ holds hard links to cache entries, which would keep evicted entries'
+disk space in use, so sweep_outputs bounds it too: files are removed once older
+than OUTPUTS_RETENTION_HOURS, and oldest first while it exceeds OUTPUTS_MAX_MB.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from logger import log_info, log_warning
+
+# Load environment variables
+load_dotenv('config.env')
+
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", "data/render_cache")
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+OUTPUTS_RETENTION_SECONDS = int(os.getenv("OUTPUTS_RETENTION_HOURS", "24")) * 3600
+OUTPUTS_MAX_BYTES = int(os.getenv("OUTPUTS_MAX_MB", "512")) * 1024 * 1024
+# Outputs younger than this are not evicted for size, so a job can still read what it just rendered
+OUTPUTS_MIN_AGE_SECONDS = 15 * 60
+OUTPUTS_SWEEP_INTERVAL_SECONDS = 300
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Template path -> (mtime_ns, size, sha256), so templates are only re-hashed when they change
+_template_hashes: Dict[str, Tuple[int, int, str]] = {}
+_template_hashes_lock = threading.Lock()
+
+def context_hash(context: Dict[str, Any]) -> str:
+    """Stable hash of a render context."""
+    encoded = json.dumps(context, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def template_hash(template_path: str) -> str:
+    """SHA-256 of a template's content, recomputed only when the file changes."""
+    stat = os.stat(template_path)
+    with _template_hashes_lock:
+        cached = _template_hashes.get(template_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+    digest = hashlib.sha256()
+    with open(template_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    with _template_hashes_lock:
+        _template_hashes[template_path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+def render_key(context: Dict[str, Any], template_path: str, output_format: str = 'docx') -> str:
+    """Cache key for rendering context with the template at template_path into output_format."""
+    return hashlib.sha256(f"{template_hash(template_path)}:{output_format}:{context_hash(context)}".encode()).hexdigest()
+
+def export_key(source_path: str, output_format: str) -> str:
+    """Cache key for converting the document at source_path into output_format."""
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return hashlib.sha256(f"export:{output_format}:{digest.hexdigest()}".encode()).hexdigest()
+
+def link_or_copy(source: str, destination: str) -> None:
+    """
+    Make destination a hard link to source, copying if linking isn't possible.
+    An existing destination is unlinked first so a shared inode is never written through.
+    """
+    try:
+        os.unlink(destination)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+class RenderCache:
+    """Size-bounded, content-addressed store of rendered documents shared by all workers."""
+
+    def __init__(self, cache_dir: str = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Directory holding cached documents and the index database
+            max_bytes: Total size above which least recently used entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                etag TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS names (filename TEXT PRIMARY KEY, key TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection to the cache index."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.cache_dir / 'index.db'), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def path_for(self, key: str) -> Path:
+        # Keys already encode the output format, so entries carry no extension
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached document for key, or None on a miss."""
+        path = self.path_for(key)
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is None:
+            return None
+        if not path.exists():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return path
+
+    def new_temp_path(self) -> str:
+        """A fresh path inside the cache directory for rendering into before put()."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        return tmp_path
+
+    def put(self, key: str, rendered_path: str) -> Path:
+        """
+        Move a freshly rendered document (from new_temp_path) into the cache.
+
+        Returns:
+            Path of the cached document
+        """
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        digest = hashlib.sha256()
+        with open(rendered_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        size = os.path.getsize(rendered_path)
+        os.replace(rendered_path, path)
+        self._record(key, size, digest.hexdigest())
+        return path
+
+    def _record(self, key: str, size: int, etag: str) -> None:
+        """Index a stored entry and evict if the cache is now over its limit."""
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, size, etag, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, size, etag, now, now)
+        )
+        self.evict()
+
+    def bind_name(self, filename: str, key: str) -> None:
+        """Record that the output called filename was rendered from entry key."""
+        self._connect().execute("INSERT OR REPLACE INTO names (filename, key) VALUES (?, ?)", (filename, key))
+
+    def lookup_name(self, filename: str) -> Optional[Tuple[Path, str]]:
+        """
+        Find the cached document last rendered under filename.
+
+        Returns:
+            Tuple of (path, etag) or None if it is not cached
+        """
+        row = self._connect().execute(
+            "SELECT e.key, e.etag FROM names n JOIN entries e ON e.key = n.key WHERE n.filename = ?",
+            (filename,)
+        ).fetchone()
+        if row is None:
+            return None
+        path = self.get(row[0])
+        return (path, row[1]) if path else None
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits max_bytes. Returns entries removed."""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("DELETE FROM names WHERE key = ?", (key,))
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log_warning(f"Could not remove cached render {key}: {e}")
+            total -= size
+            removed += 1
+        log_info(f"Render cache evicted {removed} entries, now {total // 1024} KB")
+        return removed
+
+_last_outputs_sweep = 0.0
+_outputs_sweep_lock = threading.Lock()
+
+def sweep_outputs(outputs_dir: str, max_age: float = OUTPUTS_RETENTION_SECONDS,
+                  max_bytes: int = OUTPUTS_MAX_BYTES, min_age: float = OUTPUTS_MIN_AGE_SECONDS) -> int:
+    """
+    Remove old files from outputs_dir, then the oldest ones while it holds more than max_bytes.
+
+    Age is taken from the inode change time, which linking a cache entry into
+    outputs/ updates, so an output linked from an old cache entry counts as new.
+
+    Args:
+        outputs_dir: Directory of generated documents
+        max_age: Seconds after which a file is removed
+        max_bytes: Total size above which the oldest files are removed
+        min_age: Files younger than this are kept even over max_bytes
+
+    Returns:
+        int: Number of files removed
+    """
+    now = time.time()
+    files = []
+    with os.scandir(outputs_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((stat.st_ctime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                continue
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for changed_at, size, path in files:
+        age = now - changed_at
+        if age <= max_age and (total <= max_bytes or age < min_age):
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log_warning(f"Could not remove old output {path}: {e}")
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        log_info(f"Removed {removed} old files from {outputs_dir}, now {total // 1024} KB")
+    return removed
+
+def maybe_sweep_outputs(outputs_dir: str) -> None:
+    """Run sweep_outputs at most once every OUTPUTS_SWEEP_INTERVAL_SECONDS per process."""
+    global _last_outputs_sweep
+    with _outputs_sweep_lock:
+        if time.time() - _last_outputs_sweep < OUTPUTS_SWEEP_INTERVAL_SECONDS:
+            return
+        _last_outputs_sweep = time.time()
+    try:
+        sweep_outputs(outputs_dir)
+    except OSError as e:
+        log_warning(f"Could not sweep {outputs_dir}: {e}")
+
+_render_cache: Optional[RenderCache] = None
+_render_cache_lock = threading.Lock()
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide render cache, creating it on first use."""
+    global _render_cache
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                _render_cache = RenderCache()
+    return _render_cache
@@ -8,10 +8,32 @@ from logger import log_warning, log_error
 # Load environment variables
 load_dotenv('config.env')
 
+class SecurityError(Exception):
+    """Raised when an upload or input fails a security check"""
+    pass
+
 class SecurityConfig:
     # Maximum file size (16MB)
     MAX_FILE_SIZE = 16 * 1024 * 1024
     
+    # Number of leading bytes inspected to identify an upload's real type
+    SNIFF_BYTES = 8 * 1024
+    
+    # Leading-byte signatures for binary formats
+    MAGIC_SIGNATURES = {
+        'pdf': b'%PDF-',
+        'zip': b'PK\x03\x04',  # DOCX is a zip container
+        'ole': b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',  # Legacy .doc is an OLE compound file
+    }
+    
+    # Detected content types each extension may contain (Word happily saves DOCX content as .doc)
+    EXTENSION_CONTENT_TYPES = {
+        'pdf': {'pdf'},
+        'docx': {'zip'},
+        'doc': {'ole', 'zip'},
+        'txt': {'text'}
+    }
+    
     # Allowed file extensions and their corresponding MIME types
     ALLOWED_EXTENSIONS = {
         'pdf': 'application/pdf',
@@ -80,6 +102,70 @@ class SecurityConfig:
             
         return result
     
+    @classmethod
+    def detect_content_type(cls, head: bytes) -> Optional[str]:
+        """
+        Identify a file's real type from its leading bytes.
+        
+        Args:
+            head: The first bytes of the file (up to SNIFF_BYTES)
+            
+        Returns:
+            'pdf', 'zip', 'ole' or 'text', or None if the content is not recognised
+        """
+        # PDF readers accept the header anywhere in the first 1KB
+        if cls.MAGIC_SIGNATURES['pdf'] in head[:1024]:
+            return 'pdf'
+        if head.startswith(cls.MAGIC_SIGNATURES['zip']):
+            return 'zip'
+        if head.startswith(cls.MAGIC_SIGNATURES['ole']):
+            return 'ole'
+        if cls._looks_like_text(head):
+            return 'text'
+        return None
+    
+    @staticmethod
+    def _looks_like_text(head: bytes) -> bool:
+        """Return True if the bytes look like plain text (UTF-8/16 or a single-byte encoding)."""
+        if not head:
+            return False
+        if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+            return True
+        if b'\x00' in head:
+            return False
+        control = sum(1 for b in head if b < 32 and b not in (9, 10, 12, 13))
+        return control / len(head) < 0.01
+    
+    @classmethod
+    def validate_file_head(cls, filename: str, head: bytes) -> Dict[str, bool | str]:
+        """
+        Check that a file's leading bytes match its extension.
+        
+        Args:
+            filename: Name of the uploaded file
+            head: The first bytes of the file (up to SNIFF_BYTES)
+            
+        Returns:
+            Dictionary containing validation results and any error message
+        """
+        result = {"valid": True, "message": ""}
+        
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        allowed_types = cls.EXTENSION_CONTENT_TYPES.get(extension)
+        if not allowed_types:
+            result["valid"] = False
+            result["message"] = f"File type not allowed. Allowed types: {', '.join(cls.ALLOWED_EXTENSIONS.keys())}"
+            return result
+        
+        detected = cls.detect_content_type(head)
+        if detected not in allowed_types:
+            log_warning(f"Rejected upload {filename}: content looks like {detected or 'unknown'}, not .{extension}")
+            result["valid"] = False
+            result["message"] = f"The file does not appear to be a valid .{extension} file. Please check the file and try again."
+            return result
+        
+        return result
+    
     @classmethod
     def sanitize_filename(cls, filename: str) -> str:
         """
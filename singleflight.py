@@ -0,0 +1,87 @@
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from logger import log_info
+
+class _InFlightCall:
+    """A single in-flight call whose result is shared by every caller with the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function. Any caller that
+    arrives with the same key while the leader is still running blocks until it
+    finishes and receives the same result (or exception). Once the call
+    completes the key is forgotten, so later calls run again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        Run fn(*args, **kwargs) unless an identical call is already in flight.
+
+        Args:
+            key: Key identifying identical calls
+            fn: The function to run
+            *args, **kwargs: Arguments passed to fn by the leader
+
+        Returns:
+            Tuple of (result, is_leader) where is_leader is True if this caller
+            ran fn, and False if it received the result of another caller's run
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+
+        if not is_leader:
+            log_info(f"Joining in-flight call for key {key[:12]}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, True
+
+    def in_flight(self, key: str) -> bool:
+        """Return True if a call for key is currently running."""
+        with self._lock:
+            return key in self._calls
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's contents.
+
+    Args:
+        file_path: Path to the file to hash
+        chunk_size: Number of bytes to read at a time
+
+    Returns:
+        str: The hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,217 @@
+"""
+Precomputed symmetric-delete spelling index.
+
+Each dictionary word is indexed under every string reachable from its first
+SPELL_PREFIX_LENGTH characters by deleting up to SPELL_MAX_EDIT_DISTANCE characters.
+To correct a word, the same deletes are generated for it, and only the dictionary
+words sharing one of them are compared with a real edit distance. That replaces
+pyspellchecker's enumeration of every edit-distance-2 string, which is what made
+spell checking too slow to leave on.
+
+The index is built once from pyspellchecker's English dictionary plus our
+industry terms, stored in SQLite so every worker process shares one copy on
+disk, and rebuilt automatically when the term list changes. Corrections are
+memoized.
+"""
+
+import os
+import fcntl
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from logger import log_info
+
+# Load environment variables
+load_dotenv('config.env')
+
+SPELL_INDEX_PATH = os.environ.get("SPELL_INDEX_PATH", "data/spell_index.db")
+SPELL_MAX_EDIT_DISTANCE = 2
+SPELL_PREFIX_LENGTH = 7
+SPELL_CORRECTION_CACHE_SIZE = 65536
+
+# Bump when the index layout or build rules change
+INDEX_FORMAT_VERSION = 1
+
+def _deletes(word: str, max_distance: int = SPELL_MAX_EDIT_DISTANCE, prefix_length: int = SPELL_PREFIX_LENGTH) -> Set[str]:
+    """All strings formed by deleting up to max_distance characters from the word's prefix."""
+    prefix = word[:prefix_length]
+    result = {prefix}
+    for distance in range(1, min(max_distance, len(prefix)) + 1):
+        for positions in combinations(range(len(prefix)), distance):
+            result.add(''.join(c for i, c in enumerate(prefix) if i not in positions))
+    return result
+
+def edit_distance(a: str, b: str, max_distance: int = SPELL_MAX_EDIT_DISTANCE) -> int:
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions and
+    adjacent transpositions), the edit model pyspellchecker uses.
+
+    Returns max_distance + 1 as soon as the distance is known to exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[len(b)]
+
+def _fingerprint(extra_words: Iterable[str]) -> str:
+    """Identify an index build by its format version and extra word list."""
+    digest = hashlib.sha256(str(INDEX_FORMAT_VERSION).encode())
+    for word in sorted(set(w.lower() for w in extra_words)):
+        digest.update(word.encode('utf-8') + b'\n')
+    return digest.hexdigest()
+
+def load_base_dictionary() -> Dict[str, int]:
+    """Word frequencies from pyspellchecker's English dictionary."""
+    from spellchecker import SpellChecker
+    return dict(SpellChecker().word_frequency.dictionary)
+
+def build_index(db_path: str, extra_words: Iterable[str], base_words: Optional[Dict[str, int]] = None) -> None:
+    """
+    Build the index at db_path, replacing any existing file atomically.
+
+    Args:
+        db_path: Destination SQLite file
+        extra_words: Domain terms added to the dictionary (each adds one to its frequency, like load_words)
+        base_words: Word frequencies to index; defaults to pyspellchecker's dictionary
+    """
+    extra_words = list(extra_words)
+    frequencies = dict(base_words if base_words is not None else load_base_dictionary())
+    for word in extra_words:
+        word = word.lower()
+        frequencies[word] = frequencies.get(word, 0) + 1
+
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=db_path.parent, suffix='.tmp')
+    os.close(fd)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE words (id INTEGER PRIMARY KEY, word TEXT UNIQUE NOT NULL, freq INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE deletes (del TEXT NOT NULL, word_id INTEGER NOT NULL, PRIMARY KEY (del, word_id)) WITHOUT ROWID")
+        rows = []
+        for word_id, (word, freq) in enumerate(sorted(frequencies.items()), start=1):
+            conn.execute("INSERT INTO words (id, word, freq) VALUES (?, ?, ?)", (word_id, word, freq))
+            rows.extend((delete, word_id) for delete in _deletes(word))
+            if len(rows) >= 100_000:
+                conn.executemany("INSERT OR IGNORE INTO deletes (del, word_id) VALUES (?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT OR IGNORE INTO deletes (del, word_id) VALUES (?, ?)", rows)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (_fingerprint(extra_words),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    log_info(f"Built spelling index with {len(frequencies)} words at {db_path}")
+
+class SpellIndex:
+    """
+    Read-only view of a built index, with the known()/correction() interface of
+    pyspellchecker's SpellChecker so auto_correct_text can use either.
+    """
+
+    def __init__(self, db_path: str = SPELL_INDEX_PATH):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self.correction = lru_cache(maxsize=SPELL_CORRECTION_CACHE_SIZE)(self._correction)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's read-only connection to the index."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def fingerprint(self) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        return row[0] if row else None
+
+    def known(self, words: Iterable[str]) -> Set[str]:
+        """Return the subset of words that are in the dictionary."""
+        words = list(set(w.lower() for w in words))
+        if not words:
+            return set()
+        placeholders = ','.join('?' * len(words))
+        rows = self._connect().execute(f"SELECT word FROM words WHERE word IN ({placeholders})", words).fetchall()
+        return {row[0] for row in rows}
+
+    def candidates(self, word: str) -> List[tuple]:
+        """
+        Dictionary words within the maximum edit distance of word.
+
+        Returns:
+            List of (distance, -frequency, word), best first
+        """
+        word = word.lower()
+        deletes = list(_deletes(word))
+        placeholders = ','.join('?' * len(deletes))
+        rows = self._connect().execute(
+            f"SELECT DISTINCT w.word, w.freq FROM deletes d JOIN words w ON w.id = d.word_id "
+            f"WHERE d.del IN ({placeholders})", deletes
+        ).fetchall()
+        results = []
+        for candidate, freq in rows:
+            distance = edit_distance(word, candidate)
+            if distance <= SPELL_MAX_EDIT_DISTANCE:
+                results.append((distance, -freq, candidate))
+        results.sort()
+        return results
+
+    def _correction(self, word: str) -> Optional[str]:
+        """Closest dictionary word, preferring smaller edit distance then higher frequency; the word itself if none."""
+        word = word.lower()
+        if self.known([word]):
+            return word
+        results = self.candidates(word)
+        return results[0][2] if results else word
+
+_spell_index: Optional[SpellIndex] = None
+_spell_index_lock = threading.Lock()
+
+def get_spell_index(extra_words: Iterable[str], db_path: str = SPELL_INDEX_PATH) -> SpellIndex:
+    """
+    Return the process-wide spelling index, building it on disk first if it is
+    missing or was built from a different term list.
+
+    Building is serialised across processes with a lock file, so concurrent
+    workers wait for one build instead of each running their own.
+    """
+    global _spell_index
+    if _spell_index is not None:
+        return _spell_index
+    extra_words = list(extra_words)
+    with _spell_index_lock:
+        if _spell_index is not None:
+            return _spell_index
+        expected = _fingerprint(extra_words)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{db_path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = SpellIndex(db_path).fingerprint() if os.path.exists(db_path) else None
+            except sqlite3.DatabaseError:
+                current = None
+            if current != expected:
+                build_index(db_path, extra_words)
+        _spell_index = SpellIndex(db_path)
+    return _spell_index
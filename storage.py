@@ -0,0 +1,298 @@
+"""
+Storage backends for uploaded CVs and generated artefacts.
+
+The backend is selected with the STORAGE_BACKEND setting in config.env:
+  firebase (default) - Firebase Storage, returning signed URLs
+  local              - files under STORAGE_LOCAL_ROOT, returning file:// URLs
+  memory             - process-local dict, returning memory:// URLs (load tests)
+"""
+
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Dict
+from urllib.parse import urlparse, unquote
+import requests
+from dotenv import load_dotenv
+from blob_index import BlobIndex, BLOB_INDEX_PATH, content_addressed_name
+from singleflight import hash_file
+from logger import log_info, log_error
+
+# Load environment variables
+load_dotenv('config.env')
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firebase").lower()
+STORAGE_LOCAL_ROOT = os.environ.get("STORAGE_LOCAL_ROOT", "storage")
+
+CONTENT_HASH_RE = re.compile(r'[0-9a-f]{64}')
+
+class StorageBackend(ABC):
+    """Interface for blob storage used by the CV pipeline."""
+
+    name = "base"
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.blob_index = BlobIndex(index_path)
+
+    @abstractmethod
+    def upload(self, blob_name: str, file_path: Optional[str] = None, data: Optional[bytes] = None) -> Optional[str]:
+        """
+        Store a file or in-memory bytes under blob_name.
+
+        Args:
+            blob_name: The key to store the content under
+            file_path: Local path to the file to upload (ignored if data is provided)
+            data: Binary data to upload (takes precedence over file_path)
+
+        Returns:
+            str or None: A URL the parser can fetch the content from, or None on failure
+        """
+
+    @abstractmethod
+    def download(self, blob_name: str) -> Optional[bytes]:
+        """Return the content stored under blob_name, or None if missing."""
+
+    @abstractmethod
+    def exists(self, blob_name: str) -> bool:
+        """Return True if blob_name is present in storage."""
+
+    @abstractmethod
+    def get_url(self, blob_name: str) -> Optional[str]:
+        """Return a fetchable URL for an existing blob."""
+
+    def upload_content_addressed(self, file_path: str, filename: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """
+        Upload a file under a key derived from its content hash, skipping the upload
+        when storage already holds the same bytes.
+
+        The backend's blob index is consulted first; a hit that hasn't been confirmed
+        recently is checked with storage, and forgotten if the blob has gone. On a miss
+        storage is checked once before uploading. The filename is then mapped to the
+        content hash, for hash_for_name.
+
+        Args:
+            file_path: Local path to the file to upload
+            filename: Original filename, used for its extension and the name -> hash mapping
+            content_hash: SHA-256 of the file contents, computed if not provided
+
+        Returns:
+            str or None: A URL for the stored blob, or None on failure
+        """
+        try:
+            content_hash = content_hash or hash_file(file_path)
+            url = self._store_content_addressed(file_path, filename, content_hash)
+            if url:
+                self.blob_index.record_name(filename, content_hash)
+            return url
+
+        except Exception as e:
+            log_error("Content-addressed upload error", e)
+            return None
+
+    def _store_content_addressed(self, file_path: str, filename: str, content_hash: str) -> Optional[str]:
+        """Return a URL for the blob holding content_hash, uploading file_path only if storage lacks it."""
+        blob_name = content_addressed_name(content_hash, filename)
+        size = os.path.getsize(file_path)
+
+        record = self.blob_index.lookup(content_hash)
+        if record and record['blob_name'] == blob_name:
+            if not record['stale']:
+                url = self.get_url(blob_name)
+                if url:
+                    log_info(f"Skipping upload, {filename} already stored as {blob_name}")
+                    return url
+            elif self.exists(blob_name):
+                log_info(f"Skipping upload, {filename} already stored as {blob_name}")
+                self.blob_index.record(content_hash, blob_name, size)
+                return self.get_url(blob_name)
+            log_info(f"Indexed blob {blob_name} is missing from storage, uploading again")
+            self.blob_index.forget(content_hash)
+
+        elif self.exists(blob_name):
+            log_info(f"Skipping upload, {blob_name} already exists in storage")
+            self.blob_index.record(content_hash, blob_name, size)
+            return self.get_url(blob_name)
+
+        url = self.upload(blob_name, file_path=file_path)
+        if url:
+            self.blob_index.record(content_hash, blob_name, size)
+        return url
+
+class FirebaseStorageBackend(StorageBackend):
+    """Firebase Storage, via FirebaseConfig."""
+
+    name = "firebase"
+
+    def __init__(self):
+        super().__init__(BLOB_INDEX_PATH)
+        # Imported here so local and memory deployments don't need firebase_admin
+        from firebase_utils import FirebaseConfig
+        self.config = FirebaseConfig()
+
+    def upload(self, blob_name: str, file_path: Optional[str] = None, data: Optional[bytes] = None) -> Optional[str]:
+        return self.config.upload_file(file_path, blob_name, data)
+
+    def download(self, blob_name: str) -> Optional[bytes]:
+        from firebase_utils import download_file
+        return download_file(blob_name)
+
+    def exists(self, blob_name: str) -> bool:
+        return self.config.blob_exists(blob_name)
+
+    def get_url(self, blob_name: str) -> Optional[str]:
+        return self.config.get_signed_url(blob_name)
+
+class LocalStorageBackend(StorageBackend):
+    """Files on local disk, for single-node deployments."""
+
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_ROOT):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(self.root / '.blob_index.db'))
+
+    def _path(self, blob_name: str) -> Path:
+        """Resolve blob_name inside the storage root, rejecting traversal."""
+        path = (self.root / blob_name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid blob name: {blob_name}")
+        return path
+
+    def upload(self, blob_name: str, file_path: Optional[str] = None, data: Optional[bytes] = None) -> Optional[str]:
+        try:
+            path = self._path(blob_name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            if data is not None:
+                tmp_path.write_bytes(data)
+            elif file_path is not None:
+                try:
+                    # Hard link when on the same filesystem, so no bytes are copied
+                    os.link(file_path, tmp_path)
+                except OSError:
+                    with open(file_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                        for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                            dst.write(chunk)
+            else:
+                print("Either file_path or data must be provided.")
+                return None
+            os.replace(tmp_path, path)
+            return path.as_uri()
+        except Exception as e:
+            print(f"Local storage upload error: {e}")
+            return None
+
+    def download(self, blob_name: str) -> Optional[bytes]:
+        try:
+            return self._path(blob_name).read_bytes()
+        except FileNotFoundError:
+            print(f"File {blob_name} not found in local storage")
+            return None
+        except Exception as e:
+            print(f"Local storage download error: {e}")
+            return None
+
+    def exists(self, blob_name: str) -> bool:
+        try:
+            return self._path(blob_name).exists()
+        except ValueError:
+            return False
+
+    def get_url(self, blob_name: str) -> Optional[str]:
+        path = self._path(blob_name)
+        return path.as_uri() if path.exists() else None
+
+class MemoryStorageBackend(StorageBackend):
+    """Process-local storage with no I/O, for tests and load tests."""
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__(None)
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def upload(self, blob_name: str, file_path: Optional[str] = None, data: Optional[bytes] = None) -> Optional[str]:
+        if data is None:
+            if file_path is None:
+                print("Either file_path or data must be provided.")
+                return None
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        with self._lock:
+            self._blobs[blob_name] = bytes(data)
+        return f"memory://{blob_name}"
+
+    def download(self, blob_name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._blobs.get(blob_name)
+
+    def exists(self, blob_name: str) -> bool:
+        with self._lock:
+            return blob_name in self._blobs
+
+    def get_url(self, blob_name: str) -> Optional[str]:
+        return f"memory://{blob_name}" if self.exists(blob_name) else None
+
+_BACKENDS = {
+    'firebase': FirebaseStorageBackend,
+    'local': LocalStorageBackend,
+    'memory': MemoryStorageBackend,
+}
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+def get_storage_backend() -> StorageBackend:
+    """Return the configured storage backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = _BACKENDS.get(STORAGE_BACKEND)
+                if backend_class is None:
+                    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Choose from: {', '.join(_BACKENDS)}")
+                _backend = backend_class()
+    return _backend
+
+def fetch_url(url: str) -> Optional[bytes]:
+    """
+    Fetch the content behind a URL returned by any storage backend.
+
+    Args:
+        url: A signed https URL, a file:// URL or a memory:// URL
+
+    Returns:
+        bytes or None: The content, or None if it could not be fetched
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        try:
+            with open(unquote(parsed.path), 'rb') as f:
+                return f.read()
+        except Exception as e:
+            print(f"Error reading {url}: {e}")
+            _forget_blob_at(parsed.path)
+            return None
+    if parsed.scheme == 'memory':
+        content = get_storage_backend().download(url[len('memory://'):])
+        if content is None:
+            _forget_blob_at(parsed.path)
+        return content
+
+    response = requests.get(url)
+    if response.status_code != 200:
+        print(f"Error downloading file: {response.status_code}")
+        if response.status_code == 404:
+            _forget_blob_at(parsed.path)
+        return None
+    return response.content
+
+def _forget_blob_at(url_path: str) -> None:
+    """Drop the blob index entry for a content-addressed blob that turned out to be missing."""
+    content_hash = Path(unquote(url_path)).stem
+    if CONTENT_HASH_RE.fullmatch(content_hash):
+        get_storage_backend().blob_index.forget(content_hash)
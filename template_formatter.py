@@ -1,7 +1,4 @@
-from firebase_utils import FirebaseConfig
-
-# Instantiate FirebaseConfig so we can call its methods.
-firebase_config = FirebaseConfig()
+from storage import get_storage_backend
 
 def format_company_and_position_placeholders(placeholder_mapping: dict) -> dict:
     """
@@ -150,14 +147,14 @@ def format_name(name_str):
 
 def format_template(template_data: str) -> str:
     """
-    Format the template data and upload the formatted result to Firebase Storage.
+    Format the template data and upload the formatted result to storage.
     
     In this example, we simply transform the text to uppercase,
     encode it as bytes, and upload it with the filename 'formatted_template.txt'.
     The function returns the public URL of the uploaded file.
     """
     formatted_data = template_data.upper().encode("utf-8")
-    public_url = firebase_config.upload_file(destination_blob_name="formatted_template.txt", data=formatted_data)
+    public_url = get_storage_backend().upload("formatted_template.txt", data=formatted_data)
     return public_url
 
 
@@ -0,0 +1,39 @@
+import os
+import threading
+import archive_queue
+from archive_queue import ArchiveQueue
+
+def _queue(tmp_path, upload_fn, **kwargs) -> ArchiveQueue:
+    return ArchiveQueue(str(tmp_path / 'queue.db'), upload_fn=upload_fn, workers=1, **kwargs)
+
+def test_resume_drains_items_left_by_an_earlier_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_queue, 'ARCHIVE_SPOOL_DIR', str(tmp_path / 'spool'))
+    earlier = _queue(tmp_path, lambda *args, **kwargs: None)
+    earlier._connect().execute(
+        "INSERT INTO archive_items (blob_name, data, next_attempt_at, created_at) VALUES ('a.json', x'7b7d', 0, 0)"
+    )
+
+    uploaded = threading.Event()
+    def upload(blob_name, data=None, file_path=None):
+        uploaded.set()
+        return 'url'
+
+    queue = _queue(tmp_path, upload)
+    assert queue.resume() == 1
+    assert uploaded.wait(5)
+    queue.stop()
+
+def test_parked_items_release_their_spool_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_queue, 'ARCHIVE_SPOOL_DIR', str(tmp_path / 'spool'))
+    monkeypatch.setattr(archive_queue, 'ARCHIVE_INLINE_MAX_BYTES', 10)
+    source = tmp_path / 'cv.docx'
+    source.write_bytes(b'x' * 100)
+
+    queue = _queue(tmp_path, lambda *args, **kwargs: None, max_attempts=1)
+    queue.start = lambda: None  # process the batch by hand
+    assert queue.enqueue('outputs/cv.docx', file_path=str(source))
+    assert len(os.listdir(tmp_path / 'spool')) == 1
+
+    queue._process_batch(queue._claim_batch())
+    assert queue.stats() == {'failed': 1}
+    assert os.listdir(tmp_path / 'spool') == []
@@ -0,0 +1,21 @@
+from singleflight import hash_file
+from storage import LocalStorageBackend
+
+def test_upload_maps_filename_to_latest_content(tmp_path):
+    backend = LocalStorageBackend(str(tmp_path / 'storage'))
+    cv = tmp_path / 'cv.pdf'
+    cv.write_bytes(b'%PDF-1.4 first')
+    first = hash_file(str(cv))
+    assert backend.upload_content_addressed(str(cv), 'cv.pdf')
+    assert backend.blob_index.hash_for_name('cv.pdf') == first
+
+    cv.write_bytes(b'%PDF-1.4 second')
+    second = hash_file(str(cv))
+    assert backend.upload_content_addressed(str(cv), 'cv.pdf')
+    assert backend.blob_index.hash_for_name('cv.pdf') == second
+
+    # A skipped re-upload of the first version points the name back at it
+    cv.write_bytes(b'%PDF-1.4 first')
+    assert backend.upload_content_addressed(str(cv), 'cv.pdf')
+    assert backend.blob_index.hash_for_name('cv.pdf') == first
+    assert backend.blob_index.hash_for_name('other.pdf') is None
@@ -0,0 +1,21 @@
+from datetime import date
+
+from local_parser import _parse_trainings, parse_lines
+
+def test_phone_does_not_run_into_next_line():
+    lines = ["Jane Smith", "021 555 1234", "12 Queen Street Auckland", "", "Experience",
+             "Site Manager - Fletcher Construction", "Jan 2018 - Present", "• Ran sites"]
+    result = parse_lines(lines, today=date(2024, 1, 1))
+    assert result.profile['basics']['phone'] == "021 555 1234"
+
+def test_training_year_in_brackets_is_removed_with_brackets():
+    trainings = _parse_trainings(["Site Safe Passport (2019)", "First Aid Certificate - St John [2021]"])
+    assert trainings[0]['description'] == "Site Safe Passport"
+    assert trainings[0]['year'] == 2019
+    assert trainings[1]['description'] == "First Aid Certificate"
+    assert trainings[1]['issuing_organization'] == "St John"
+    assert trainings[1]['year'] == 2021
+
+def test_training_parenthesised_organisation_is_kept():
+    trainings = _parse_trainings(["Bachelor of Engineering (Civil) 2012"])
+    assert trainings[0]['description'] == "Bachelor of Engineering (Civil)"
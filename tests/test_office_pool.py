@@ -0,0 +1,22 @@
+from office_pool import OfficeConversionError, OfficePool
+
+def test_failed_recycle_still_returns_the_converted_document(tmp_path):
+    pool = OfficePool(size=1, base_port=0, recycle_after=1)
+    worker = pool.workers[0]
+
+    def convert(input_path, output_path, output_format):
+        with open(output_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        worker.conversions += 1
+
+    def restart():
+        raise OfficeConversionError("unoserver not installed")
+
+    worker.start = lambda: None
+    worker.healthy = lambda: True
+    worker.convert = convert
+    worker.restart = restart
+
+    output_path = str(tmp_path / 'cv.pdf')
+    assert pool.convert(str(tmp_path / 'cv.docx'), output_path) == output_path
+    assert pool.stats()['conversions'] == 1
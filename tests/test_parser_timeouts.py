@@ -0,0 +1,22 @@
+from parser_timeouts import ParseFeatures, ParserLatencyModel
+
+def _model(tmp_path) -> ParserLatencyModel:
+    return ParserLatencyModel(str(tmp_path / 'latencies.db'), min_samples=10)
+
+def test_unseen_kind_keeps_heuristic_despite_pooled_history(tmp_path):
+    model = _model(tmp_path)
+    text = ParseFeatures('pdf', 200_000, 1, 'text', 10.0)
+    for _ in range(50):
+        model.record(text, 3.0)
+
+    scanned = ParseFeatures('pdf', 3_000_000, 8, 'scanned', 84.0)
+    assert model.timeout_for(scanned, 30) == (84.0, 'heuristic')
+    assert model.timeout_for(text, 30) == (10.0, 'learned')
+
+def test_pooled_estimate_only_raises_the_prior(tmp_path):
+    model = _model(tmp_path)
+    for _ in range(20):
+        model.record(ParseFeatures('docx', 50_000, 2), 40.0)
+
+    timeout, source = model.timeout_for(ParseFeatures('docx', 50_000, 6), 30)
+    assert timeout == 60.0 and source == 'type/kind'
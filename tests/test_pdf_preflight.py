@@ -0,0 +1,56 @@
+import zlib
+
+import pdf_preflight
+from pdf_preflight import preflight_pdf, route_pdf
+
+def _pdf(*objects: bytes) -> bytes:
+    out = b'%PDF-1.7\n'
+    for number, obj in enumerate(objects, 1):
+        out += b'%d 0 obj\n' % number + obj + b'\nendobj\n'
+    return out + b'trailer\n<< /Root 1 0 R >>\n%%EOF\n'
+
+def _stream(dictionary: bytes, data: bytes) -> bytes:
+    return b'<< ' + dictionary + b' /Length %d >>\nstream\n' % len(data) + data + b'\nendstream'
+
+def _text_pdf(*extra: bytes) -> bytes:
+    content = zlib.compress(b'BT /F1 12 Tf 72 700 Td (Jane Smith) Tj ET')
+    return _pdf(b'<< /Type /Catalog /Pages 2 0 R >>',
+                b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+                b'<< /Type /Page /Parent 2 0 R /Contents 5 0 R >>',
+                *extra,
+                _stream(b'/Filter /FlateDecode', content))
+
+def test_image_followed_by_stream_is_counted_once(tmp_path):
+    image = _stream(b'/Type /XObject /Subtype /Image /Width 32 /Height 32 /Filter /DCTDecode', b'\xff' * 100)
+    path = tmp_path / 'cv.pdf'
+    path.write_bytes(_text_pdf(image))
+
+    report = preflight_pdf(str(path))
+    assert report.image_count == 1
+    assert report.image_pixels == 32 * 32
+    assert report.image_bytes == 100
+    assert report.page_count == 1
+    assert report.kind == 'text'
+
+def test_unscanned_streams_are_not_rejected(tmp_path, monkeypatch):
+    # A budget too small to reach the text layer must not make the PDF look empty
+    padding = _stream(b'/Filter /FlateDecode', zlib.compress(b'q Q ' * 1000))
+    path = tmp_path / 'cv.pdf'
+    path.write_bytes(_text_pdf(padding))
+    monkeypatch.setattr(pdf_preflight, 'DECOMPRESS_BUDGET', 100)
+
+    report = preflight_pdf(str(path))
+    assert not report.complete
+    decision = route_pdf(report)
+    assert decision.accept
+    assert decision.lane == 'parser_slow'
+
+def test_empty_pdf_is_rejected(tmp_path):
+    path = tmp_path / 'cv.pdf'
+    path.write_bytes(_pdf(b'<< /Type /Catalog /Pages 2 0 R >>', b'<< /Type /Pages /Count 1 >>', b'<< /Type /Page >>'))
+
+    report = preflight_pdf(str(path))
+    assert report.complete and report.kind == 'empty'
+    decision = route_pdf(report)
+    assert not decision.accept
+    assert decision.message
@@ -0,0 +1,23 @@
+import os
+import time
+from render_cache import sweep_outputs
+
+def test_sweep_removes_expired_then_oldest_over_size(tmp_path, monkeypatch):
+    for name in ('old.docx', 'middle.docx', 'recent.docx'):
+        (tmp_path / name).write_bytes(b'x' * 100)
+        time.sleep(0.01)
+    changed = {p.name: p.stat().st_ctime for p in tmp_path.iterdir()}
+    now = changed['recent.docx']
+
+    # Over the size limit, the oldest file goes first
+    monkeypatch.setattr(time, 'time', lambda: now + 3600)
+    assert sweep_outputs(str(tmp_path), max_age=7200, max_bytes=250, min_age=0) == 1
+    assert sorted(os.listdir(tmp_path)) == ['middle.docx', 'recent.docx']
+
+    # Still over a smaller limit, but too young to evict
+    assert sweep_outputs(str(tmp_path), max_age=7200, max_bytes=100, min_age=7200) == 0
+
+    # Past max_age everything goes, whatever the size
+    monkeypatch.setattr(time, 'time', lambda: now + 10800)
+    assert sweep_outputs(str(tmp_path), max_age=7200, max_bytes=10_000, min_age=0) == 2
+    assert os.listdir(tmp_path) == []
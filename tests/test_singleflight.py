@@ -0,0 +1,39 @@
+import os
+import shutil
+import threading
+import time
+from singleflight import SingleFlight
+
+def test_only_the_waiter_discards_its_copy(tmp_path):
+    flight = SingleFlight()
+    started = threading.Event()
+    job_dirs = {}
+    results = {}
+
+    def process(file_path):
+        started.set()
+        time.sleep(0.2)
+        return os.path.exists(file_path)
+
+    def upload(name):
+        job_dir = tmp_path / name
+        job_dir.mkdir()
+        file_path = job_dir / 'cv.pdf'
+        file_path.write_bytes(b'%PDF-1.4')
+        job_dirs[name] = job_dir
+        response, is_leader = flight.do('same-bytes', process, str(file_path))
+        if not is_leader:
+            shutil.rmtree(job_dir)
+        results[name] = (response, is_leader)
+
+    leader = threading.Thread(target=upload, args=('leader',))
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=upload, args=('waiter',))
+    waiter.start()
+    leader.join()
+    waiter.join()
+
+    assert results == {'leader': (True, True), 'waiter': (True, False)}
+    assert job_dirs['leader'].exists()
+    assert not job_dirs['waiter'].exists()
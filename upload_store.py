@@ -0,0 +1,103 @@
+import os
+import hashlib
+import tempfile
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Tuple
+from dotenv import load_dotenv
+from security import SecurityConfig, SecurityError
+
+# Load environment variables
+load_dotenv('config.env')
+
+UPLOAD_FOLDER = 'uploads'
+
+# Uploads up to this size are buffered in memory while the request is parsed
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 256 * 1024
+
+class ValidatingSpool(tempfile.SpooledTemporaryFile):
+    """
+    Buffer for an incoming upload that only touches disk above UPLOAD_SPOOL_MAX_BYTES.
+    
+    Checks are applied as the body arrives: the size limit on every write, and the
+    content check as soon as the first SNIFF_BYTES are in, so a bad upload is
+    rejected without reading the rest of the request.
+    """
+    
+    def __init__(self, filename: Optional[str] = None, max_bytes: int = SecurityConfig.MAX_FILE_SIZE,
+                 validate_head: Optional[Callable[[str, bytes], None]] = None):
+        super().__init__(max_size=UPLOAD_SPOOL_MAX_BYTES, mode='w+b')
+        self.filename = filename or ''
+        self.max_bytes = max_bytes
+        self.validate_head = validate_head
+        self._received = 0
+        self._head = b''
+    
+    def write(self, s) -> int:
+        self._received += len(s)
+        if self._received > self.max_bytes:
+            raise SecurityError(f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)}MB.")
+        if self.validate_head and len(self._head) < SecurityConfig.SNIFF_BYTES:
+            self._head += bytes(s[:SecurityConfig.SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SecurityConfig.SNIFF_BYTES:
+                self.validate_head(self.filename, self._head)
+        return super().write(s)
+
+def check_upload_head(filename: str, head: bytes) -> None:
+    """Raise SecurityError if an upload's leading bytes don't match its extension."""
+    result = SecurityConfig.validate_file_head(filename, head)
+    if not result["valid"]:
+        raise SecurityError(result["message"])
+
+def spooled_buffer(filename: Optional[str] = None) -> ValidatingSpool:
+    """Validating in-memory buffer for an incoming upload; content is checked when a filename is known."""
+    return ValidatingSpool(filename, validate_head=check_upload_head if filename else None)
+
+def create_job_dir(upload_folder: str = UPLOAD_FOLDER) -> Tuple[str, Path]:
+    """
+    Create a directory that holds one upload and everything derived from it.
+
+    Returns:
+        Tuple of (job_id, job directory path)
+    """
+    job_id = uuid.uuid4().hex
+    job_dir = Path(upload_folder) / job_id
+    job_dir.mkdir(parents=True, exist_ok=False)
+    return job_id, job_dir
+
+def read_upload_head(stream: BinaryIO) -> bytes:
+    """Read the leading bytes used for type detection and rewind the stream."""
+    head = stream.read(SecurityConfig.SNIFF_BYTES)
+    stream.seek(0)
+    return head
+
+def save_upload_stream(stream: BinaryIO, dest_path: str, max_bytes: int = SecurityConfig.MAX_FILE_SIZE) -> Tuple[int, str]:
+    """
+    Write an upload stream to its final location in a single pass, hashing as it goes.
+
+    Args:
+        stream: Readable binary stream positioned at the start of the upload
+        dest_path: Final path for the file
+        max_bytes: Size limit; the partial file is removed if it is exceeded
+
+    Returns:
+        Tuple of (bytes written, SHA-256 hex digest of the content)
+        
+    Raises:
+        SecurityError: If the stream is larger than max_bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise SecurityError(f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+                digest.update(chunk)
+                out.write(chunk)
+    except SecurityError:
+        os.unlink(dest_path)
+        raise
+    return size, digest.hexdigest()